@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, Iterable, List
 
 import mysqlsb.exceptions
 from fastapi.logger import logger
@@ -49,6 +49,20 @@ def db_get_user_safe_with_id(connection: PooledMySQLConnection, user_id: int) ->
     return user
 
 
+def db_get_users_safe_with_ids(connection: PooledMySQLConnection, user_ids: Iterable[int]) -> Dict[int, models.User]:
+    user_ids = [int(user_id) for user_id in user_ids]
+    if len(user_ids) == 0:
+        return {}
+
+    mysql_statement = MySQLStatementBuilder(connection)
+    results = mysql_statement\
+        .select(USERS_TABLE, USERS_COLUMNS_SAFE)\
+        .where(f'id IN ({",".join(["%s" for _ in user_ids])})', user_ids)\
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+
+    return {user_data['id']: models.User(**user_data) for user_data in results}
+
+
 def db_get_user_list(connection: PooledMySQLConnection, segment_length: int, index: int,
                      order_by: str = 'username', order_direction: str = 'asc') -> List[models.User]:
     try:
@@ -1,5 +1,6 @@
 from typing import Optional, List, Any
 from pydantic import BaseModel
+from sedbackend.apps.cvs.distributions.models import Uncertainty
 from sedbackend.apps.cvs.vcs.models import ValueDriver
 
 
@@ -31,6 +32,7 @@ class DesignGroupPost(BaseModel):
 class ValueDriverDesignValue(BaseModel):
     vd_id: int
     value: float
+    uncertainty: Optional[Uncertainty] = None
 
     def __eq__(self, other: Any) -> bool:
         return self.vd_id == other.vd_id
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from mysql.connector import Error
 from fastapi.logger import logger
 from mysql.connector.pooling import PooledMySQLConnection
@@ -8,6 +8,9 @@ from sedbackend.apps.cvs.vcs import storage as vcs_storage
 from sedbackend.apps.cvs.vcs.storage import CVS_VALUE_DRIVER_COLUMNS, CVS_VALUE_DRIVER_TABLE, populate_value_driver
 from mysqlsb import MySQLStatementBuilder, FetchType, Sort
 from sedbackend.apps.cvs.design import models, exceptions
+from sedbackend.apps.cvs.distributions.models import Uncertainty
+from sedbackend.apps.cvs.distributions.storage import UNCERTAINTY_COLUMNS, populate_uncertainty, \
+    populate_uncertainty_columns
 
 DESIGN_GROUPS_TABLE = 'cvs_design_groups'
 DESIGN_GROUPS_COLUMNS = ['id', 'project', 'name']
@@ -19,7 +22,7 @@ DESIGNS_TABLE = 'cvs_designs'
 DESIGNS_COLUMNS = ['id', 'design_group', 'name']
 
 VD_DESIGN_VALUES_TABLE = 'cvs_vd_design_values'
-VD_DESIGN_VALUES_COLUMNS = ['value_driver', 'design', 'value']
+VD_DESIGN_VALUES_COLUMNS = ['value_driver', 'design', 'value'] + UNCERTAINTY_COLUMNS
 
 
 def create_design_group(db_connection: PooledMySQLConnection, project_id: int,
@@ -233,6 +236,28 @@ def get_all_designs(db_connection: PooledMySQLConnection, design_group_ids: List
     return [populate_design(result) for result in res]
 
 
+def get_designs_by_id(db_connection: PooledMySQLConnection, design_ids: List[int]) -> List[models.Design]:
+    logger.debug(f'Get designs with ids = {design_ids}')
+
+    try:
+        query = f'SELECT cvs_designs.id, cvs_designs.design_group, cvs_designs.name \
+                    FROM cvs_designs \
+                    WHERE cvs_designs.id IN ({",".join(["%s" for _ in range(len(design_ids))])})'
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(query, design_ids)
+            res = cursor.fetchall()
+            res = [dict(zip(cursor.column_names, row)) for row in res]
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise exceptions.DesignNotFoundException
+
+    if len(res) != len(set(design_ids)):
+        raise exceptions.DesignNotFoundException
+
+    designs = {result['id']: populate_design(result) for result in res}
+    return [designs[design_id] for design_id in design_ids]
+
+
 def create_design(db_connection: PooledMySQLConnection, design_group_id: int,
                   design: models.DesignPost) -> bool:
     logger.debug(f'Create a design for design group with id = {design_group_id}')
@@ -245,7 +270,7 @@ def create_design(db_connection: PooledMySQLConnection, design_group_id: int,
     design_id = insert_statement.last_insert_id
 
     if design.vd_design_values is not None:
-        [add_value_to_design_vd(db_connection, design_id, d_val.vd_id, d_val.value) for d_val in
+        [add_value_to_design_vd(db_connection, design_id, d_val.vd_id, d_val.value, d_val.uncertainty) for d_val in
          design.vd_design_values]
 
     return True
@@ -278,17 +303,18 @@ def edit_design(db_connection: PooledMySQLConnection, design: models.DesignPut)
                 .execute(fetch_type=FetchType.FETCH_NONE)
 
     for val in design.vd_design_values:
-        add_value_to_design_vd(db_connection, design_id, val.vd_id, val.value)
+        add_value_to_design_vd(db_connection, design_id, val.vd_id, val.value, val.uncertainty)
 
     return True
 
 
-def add_value_to_design_vd(db_connection: PooledMySQLConnection, design_id: int, vd_id: int, value: float) -> bool:
+def add_value_to_design_vd(db_connection: PooledMySQLConnection, design_id: int, vd_id: int, value: float,
+                           uncertainty: Optional[Uncertainty] = None) -> bool:
     try:
         insert_statement = MySQLStatementBuilder(db_connection)
         insert_statement \
             .insert(table=VD_DESIGN_VALUES_TABLE, columns=VD_DESIGN_VALUES_COLUMNS) \
-            .set_values([vd_id, design_id, value]) \
+            .set_values([vd_id, design_id, value, *populate_uncertainty_columns(uncertainty)]) \
             .execute(fetch_type=FetchType.FETCH_NONE)
     except Exception as e:
         logger.debug(f'{e.__class__}, {e}')
@@ -379,7 +405,8 @@ def get_all_vd_design_values(db_connection: PooledMySQLConnection,
     for result in res:
         val = models.ValueDriverDesignValue(
             vd_id=result['value_driver'],
-            value=result['value']
+            value=result['value'],
+            uncertainty=populate_uncertainty(result)
         )
         values.append(val)
 
@@ -1,3 +1,5 @@
+from typing import List
+
 import numpy as np
 from mvm import UniformFunc, GaussianFunc
 from sedbackend.apps.cvs.distributions import models
@@ -36,3 +38,12 @@ def gaussian_distribution(mu: float, sigma: float, n_samples: int) -> models.Dis
         approx_std=std,
         exact_std=sigma
     )
+
+
+# Samples of several 1-dimensional uniform and Gaussian distributions at once, n_samples x distributions
+def sample_distributions(distributions: List[models.DistributionType], centers: np.ndarray, spreads: np.ndarray,
+                         n_samples: int, rng: np.random.Generator) -> np.ndarray:
+    shape = (n_samples, len(distributions))
+    gaussian = np.array([d == models.DistributionType.GAUSSIAN for d in distributions], dtype=bool)
+    deviations = np.where(gaussian, rng.standard_normal(shape), rng.uniform(-1, 1, shape))
+    return np.asarray(centers, dtype=float) + deviations * np.asarray(spreads, dtype=float)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from enum import Enum
+
+from pydantic import BaseModel, confloat
 
 
 class Distribution(BaseModel):
@@ -6,3 +8,17 @@ class Distribution(BaseModel):
     exact_mean: float
     approx_std: float
     exact_std: float
+
+
+class DistributionType(str, Enum):
+    UNIFORM = 'uniform'
+    GAUSSIAN = 'gaussian'
+
+
+class Uncertainty(BaseModel):
+    """
+    A distribution around a value. spread is the half width of a uniform distribution, as x_range in
+    uniform_distribution, or the standard deviation of a gaussian distribution.
+    """
+    distribution: DistributionType
+    spread: confloat(ge=0)
@@ -0,0 +1,21 @@
+from typing import Optional
+
+from sedbackend.apps.cvs.distributions import models
+
+# Columns of the value driver and market input values that hold their distribution
+UNCERTAINTY_COLUMNS = ['distribution', 'spread']
+
+
+def populate_uncertainty(db_result) -> Optional[models.Uncertainty]:
+    if db_result.get('distribution') is None:
+        return None
+    return models.Uncertainty(
+        distribution=db_result['distribution'],
+        spread=db_result['spread']
+    )
+
+
+def populate_uncertainty_columns(uncertainty: Optional[models.Uncertainty]) -> list:
+    if uncertainty is None:
+        return [None, None]
+    return [uncertainty.distribution.value, uncertainty.spread]
@@ -1,3 +1,5 @@
+from typing import List
+
 from fastapi.logger import logger
 from mysql.connector.pooling import PooledMySQLConnection
 
@@ -145,6 +147,63 @@ def create_process_node(db_connection: PooledMySQLConnection, project_id: int, v
     return get_process_node(db_connection, project_id, node_id)
 
 
+def create_multiple_process_nodes(db_connection: PooledMySQLConnection, vcs_id: int, vcs_row_ids: List[int]) -> bool:
+    """
+    Creates a process node at the origin for each of the vcs rows, with one insert per table.
+    """
+    logger.debug(f'Create {len(vcs_row_ids)} process nodes for vcs with id={vcs_id}.')
+
+    if len(vcs_row_ids) == 0:
+        return True
+
+    try:
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(f'INSERT INTO {CVS_NODES_TABLE} (vcs, pos_x, pos_y) VALUES '
+                           f'{",".join(["(%s,%s,%s)" for _ in vcs_row_ids])}',
+                           [value for _ in vcs_row_ids for value in [vcs_id, 0, 0]])
+            node_id = cursor.lastrowid
+
+            # The ids of the rows of a multi-row insert are consecutive
+            cursor.execute(f'INSERT INTO {CVS_PROCESS_NODES_TABLE} (id, vcs_row) VALUES '
+                           f'{",".join(["(%s,%s)" for _ in vcs_row_ids])}',
+                           [value for i, vcs_row_id in enumerate(vcs_row_ids) for value in [node_id + i, vcs_row_id]])
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise vcs_exceptions.VCSNotFoundException
+
+    return True
+
+
+def create_vcs_process_nodes(db_connection: PooledMySQLConnection, vcs_ids: List[int]) -> bool:
+    """
+    Creates a process node at the origin for every row of the vcss, with one INSERT ... SELECT per table.
+    The vcss must not have any nodes yet, so that their k:th node belongs to their k:th row.
+    """
+    logger.debug(f'Create process nodes for the rows of {len(vcs_ids)} vcss.')
+
+    if len(vcs_ids) == 0:
+        return True
+
+    vcss = ",".join(["%s" for _ in vcs_ids])
+    try:
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(f'INSERT INTO {CVS_NODES_TABLE} (vcs, pos_x, pos_y) '
+                           f'SELECT vcs, 0, 0 FROM {vcs_storage.CVS_VCS_ROWS_TABLE} '
+                           f'WHERE vcs IN ({vcss}) ORDER BY vcs, id', vcs_ids)
+            cursor.execute(f'INSERT INTO {CVS_PROCESS_NODES_TABLE} (id, vcs_row) '
+                           f'SELECT nodes.id, vcs_rows.id '
+                           f'FROM (SELECT id, vcs, ROW_NUMBER() OVER (PARTITION BY vcs ORDER BY id) AS seq '
+                           f'FROM {CVS_NODES_TABLE} WHERE vcs IN ({vcss})) AS nodes '
+                           f'INNER JOIN (SELECT id, vcs, ROW_NUMBER() OVER (PARTITION BY vcs ORDER BY id) AS seq '
+                           f'FROM {vcs_storage.CVS_VCS_ROWS_TABLE} WHERE vcs IN ({vcss})) AS vcs_rows '
+                           f'ON vcs_rows.vcs = nodes.vcs AND vcs_rows.seq = nodes.seq', vcs_ids + vcs_ids)
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise vcs_exceptions.VCSNotFoundException
+
+    return True
+
+
 def create_start_stop_node(db_connection: PooledMySQLConnection, node: models.StartStopNodePost,
                            vcs_id: int) -> models.StartStopNodeGet:
     logger.debug(f'Create a process node for vcs with id={vcs_id}.')
@@ -0,0 +1,137 @@
+from typing import Dict, List, Tuple
+
+from fastapi.logger import logger
+from mysql.connector.pooling import PooledMySQLConnection
+
+from sedbackend.apps.cvs.link_design_lifecycle import models
+from sedbackend.libs.formula_parser import expressions as expr
+
+CVS_FORMULAS_VALUE_DRIVERS_TABLE = 'cvs_formulas_value_drivers'
+CVS_FORMULAS_VALUE_DRIVERS_COLUMNS = ['formulas', 'design_group', 'value_driver']
+
+CVS_FORMULAS_MARKET_INPUTS_TABLE = 'cvs_formulas_market_inputs'
+CVS_FORMULAS_MARKET_INPUTS_COLUMNS = ['formulas', 'design_group', 'market_input']
+
+
+def update_formula_references(db_connection: PooledMySQLConnection, project_id: int, vcs_row_id: int,
+                              design_group_id: int, formulas: models.FormulaPost):
+    """
+    Resolves the value drivers, VD(name [unit]), and market inputs, EF(name [unit]), that the formulas refer to
+    and stores their ids. The simulation then only fetches the values of the referenced variables.
+    """
+    resolve_formula_references(db_connection, [(project_id, vcs_row_id, design_group_id,
+                                                ' '.join([formulas.time, formulas.cost, formulas.revenue]))])
+
+
+def refresh_formula_references(db_connection: PooledMySQLConnection, project_ids: List[int]):
+    """
+    Resolves the references of all formulas of the projects again. Called when the value drivers of a project,
+    through the stakeholder needs of its vcs tables, or its market inputs change, so that a variable that is
+    created, linked or renamed after the formulas were saved is still found by the simulation.
+    """
+    project_ids = list(dict.fromkeys(project_ids))
+    if len(project_ids) == 0:
+        return
+
+    logger.debug(f'Refreshing the formula references of projects with ids={project_ids}')
+
+    query = f'SELECT cvs_vcss.project, cvs_design_mi_formulas.vcs_row, cvs_design_mi_formulas.design_group, \
+        cvs_design_mi_formulas.time, cvs_design_mi_formulas.cost, cvs_design_mi_formulas.revenue \
+        FROM cvs_design_mi_formulas \
+        INNER JOIN cvs_vcs_rows ON cvs_vcs_rows.id = cvs_design_mi_formulas.vcs_row \
+        INNER JOIN cvs_vcss ON cvs_vcss.id = cvs_vcs_rows.vcs \
+        WHERE cvs_vcss.project IN ({",".join(["%s" for _ in project_ids])})'
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(query, project_ids)
+        formulas = [(project_id, vcs_row_id, design_group_id, ' '.join([time or '', cost or '', revenue or '']))
+                    for project_id, vcs_row_id, design_group_id, time, cost, revenue in cursor.fetchall()]
+
+    resolve_formula_references(db_connection, formulas)
+
+
+def refresh_value_driver_references(db_connection: PooledMySQLConnection, value_driver_id: int):
+    """
+    Refreshes the formula references of the projects whose vcs tables use the value driver.
+    """
+    query = 'SELECT DISTINCT cvs_vcss.project \
+        FROM cvs_vcs_need_drivers \
+        INNER JOIN cvs_stakeholder_needs ON cvs_stakeholder_needs.id = cvs_vcs_need_drivers.stakeholder_need \
+        INNER JOIN cvs_vcs_rows ON cvs_vcs_rows.id = cvs_stakeholder_needs.vcs_row \
+        INNER JOIN cvs_vcss ON cvs_vcss.id = cvs_vcs_rows.vcs \
+        WHERE cvs_vcs_need_drivers.value_driver = %s'
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(query, [value_driver_id])
+        project_ids = [row[0] for row in cursor.fetchall()]
+
+    refresh_formula_references(db_connection, project_ids)
+
+
+def resolve_formula_references(db_connection: PooledMySQLConnection, formulas: List[Tuple[int, int, int, str]]):
+    """
+    Replaces the stored references of the formulas with the value drivers and market inputs of their projects
+    that the formulas refer to by name.
+
+    :param formulas: The project id, vcs row id, design group id and the text of the formulas
+    """
+    if len(formulas) == 0:
+        return
+
+    keys = [value for _, vcs_row_id, design_group_id, _ in formulas for value in [vcs_row_id, design_group_id]]
+    for table in [CVS_FORMULAS_VALUE_DRIVERS_TABLE, CVS_FORMULAS_MARKET_INPUTS_TABLE]:
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE (formulas, design_group) IN '
+                           f'({",".join(["(%s, %s)" for _ in formulas])})', keys)
+
+    project_ids = list(dict.fromkeys(project_id for project_id, _, _, _ in formulas))
+    value_drivers = get_project_variables(db_connection, f'SELECT DISTINCT cvs_vcss.project, cvs_value_drivers.id, \
+        cvs_value_drivers.name, cvs_value_drivers.unit \
+        FROM cvs_value_drivers \
+        INNER JOIN cvs_vcs_need_drivers ON cvs_vcs_need_drivers.value_driver = cvs_value_drivers.id \
+        INNER JOIN cvs_stakeholder_needs ON cvs_stakeholder_needs.id = cvs_vcs_need_drivers.stakeholder_need \
+        INNER JOIN cvs_vcs_rows ON cvs_vcs_rows.id = cvs_stakeholder_needs.vcs_row \
+        INNER JOIN cvs_vcss ON cvs_vcss.id = cvs_vcs_rows.vcs \
+        WHERE cvs_vcss.project IN ({",".join(["%s" for _ in project_ids])})', project_ids)
+    market_inputs = get_project_variables(db_connection, f'SELECT project, id, name, unit FROM cvs_market_inputs \
+        WHERE project IN ({",".join(["%s" for _ in project_ids])})', project_ids)
+
+    vd_references, mi_references = [], []
+    for project_id, vcs_row_id, design_group_id, formula in formulas:
+        for name in dict.fromkeys(expr.get_prefix_variables('VD', formula)):
+            vd_references += [(vcs_row_id, design_group_id, vd_id)
+                              for vd_id in value_drivers.get((project_id, name), [])]
+        for name in dict.fromkeys(expr.get_prefix_variables('EF', formula)):
+            mi_references += [(vcs_row_id, design_group_id, mi_id)
+                              for mi_id in market_inputs.get((project_id, name), [])]
+
+    insert_formula_references(db_connection, CVS_FORMULAS_VALUE_DRIVERS_TABLE, CVS_FORMULAS_VALUE_DRIVERS_COLUMNS,
+                              vd_references)
+    insert_formula_references(db_connection, CVS_FORMULAS_MARKET_INPUTS_TABLE, CVS_FORMULAS_MARKET_INPUTS_COLUMNS,
+                              mi_references)
+
+
+def get_project_variables(db_connection: PooledMySQLConnection, query: str,
+                          project_ids: List[int]) -> Dict[Tuple[int, str], List[int]]:
+    """
+    The ids of the value drivers or market inputs of the query, keyed on project id and variable name,
+    "name [unit]".
+    """
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(query, project_ids)
+        res = [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+
+    variables = {}
+    for variable in res:
+        unit = variable['unit'] if variable['unit'] is not None and variable['unit'] != '' else 'N/A'
+        variables.setdefault((variable['project'], f'{variable["name"]} [{unit}]'), []).append(variable['id'])
+
+    return variables
+
+
+def insert_formula_references(db_connection: PooledMySQLConnection, table: str, columns: List[str],
+                              references: List[Tuple[int, int, int]]):
+    if len(references) == 0:
+        return
+
+    query = f'INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join(["(%s, %s, %s)" for _ in references])}'
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(query, [value for reference in references for value in reference])
@@ -1,5 +1,9 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
+from sedbackend.apps.cvs.distributions.models import Uncertainty
+
 
 class MarketInputGet(BaseModel):
     id: int
@@ -21,3 +25,4 @@ class MarketInputValue(BaseModel):
     vcs_id: int
     market_input_id: int
     value: float
+    uncertainty: Optional[Uncertainty] = None
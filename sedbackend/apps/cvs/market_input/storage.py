@@ -4,6 +4,9 @@ from fastapi.logger import logger
 from mysql.connector.pooling import PooledMySQLConnection
 
 from mysqlsb import MySQLStatementBuilder, FetchType, Sort
+from sedbackend.apps.cvs.distributions.storage import UNCERTAINTY_COLUMNS, populate_uncertainty, \
+    populate_uncertainty_columns
+from sedbackend.apps.cvs.link_design_lifecycle import references as formula_references
 from sedbackend.apps.cvs.market_input import models, exceptions
 from sedbackend.apps.cvs.vcs import storage as vcs_storage
 from sedbackend.apps.cvs.project import exceptions as project_exceptions
@@ -12,7 +15,7 @@ CVS_MARKET_INPUT_TABLE = 'cvs_market_inputs'
 CVS_MARKET_INPUT_COLUMN = ['id', 'project', 'name', 'unit']
 
 CVS_MARKET_VALUES_TABLE = 'cvs_market_input_values'
-CVS_MARKET_VALUES_COLUMN = ['vcs', 'market_input', 'value']
+CVS_MARKET_VALUES_COLUMN = ['vcs', 'market_input', 'value'] + UNCERTAINTY_COLUMNS
 
 
 ########################################################################################################################
@@ -67,6 +70,7 @@ def create_market_input(db_connection: PooledMySQLConnection, project_id: int,
         .insert(table=CVS_MARKET_INPUT_TABLE, columns=CVS_MARKET_INPUT_COLUMN[1:]) \
         .set_values([project_id, market_input.name, market_input.unit]) \
         .execute(fetch_type=FetchType.FETCH_NONE)
+    formula_references.refresh_formula_references(db_connection, [project_id])
 
     return get_market_input(db_connection, project_id, insert_statement.last_insert_id)
 
@@ -85,6 +89,7 @@ def update_market_input(db_connection: PooledMySQLConnection, project_id: int, m
     )
     update_statement.where('id = %s', [market_input_id])
     _, rows = update_statement.execute(return_affected_rows=True)
+    formula_references.refresh_formula_references(db_connection, [project_id])
 
     return True
 
@@ -131,7 +136,8 @@ def populate_market_input_values(db_result) -> models.MarketInputValue:
     return models.MarketInputValue(
         vcs_id=db_result['vcs'],
         market_input_id=db_result['market_input'],
-        value=db_result['value']
+        value=db_result['value'],
+        uncertainty=populate_uncertainty(db_result)
     )
 
 
@@ -152,12 +158,14 @@ def update_market_input_value(db_connection: PooledMySQLConnection, project_id:
         insert_statement = MySQLStatementBuilder(db_connection)
         insert_statement \
             .insert(table=CVS_MARKET_VALUES_TABLE, columns=CVS_MARKET_VALUES_COLUMN) \
-            .set_values([mi_value.vcs_id, mi_value.market_input_id, mi_value.value]) \
+            .set_values([mi_value.vcs_id, mi_value.market_input_id, mi_value.value,
+                         *populate_uncertainty_columns(mi_value.uncertainty)]) \
             .execute(fetch_type=FetchType.FETCH_NONE)
     else:
         update_statement = MySQLStatementBuilder(db_connection)
         update_statement \
-            .update(table=CVS_MARKET_VALUES_TABLE, set_statement='value = %s', values=[mi_value.value]) \
+            .update(table=CVS_MARKET_VALUES_TABLE, set_statement='value = %s, distribution = %s, spread = %s',
+                    values=[mi_value.value, *populate_uncertainty_columns(mi_value.uncertainty)]) \
             .where('vcs = %s AND market_input = %s', [mi_value.vcs_id, mi_value.market_input_id]) \
             .execute(fetch_type=FetchType.FETCH_NONE)
 
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import HTTPException
 from fastapi.logger import logger
 from starlette import status
@@ -8,9 +10,10 @@ from sedbackend.apps.cvs.project import models, exceptions, storage
 from sedbackend.libs.datastructures.pagination import ListChunk
 
 
-def get_all_cvs_project(user_id: int) -> ListChunk[models.CVSProject]:
+def get_all_cvs_project(user_id: int, limit: Optional[int] = None,
+                        after_id: Optional[int] = None) -> ListChunk[models.CVSProject]:
     with get_connection() as con:
-        return storage.get_all_cvs_project(con, user_id)
+        return storage.get_all_cvs_project(con, user_id, limit, after_id)
 
 
 def get_cvs_project(project_id: int) -> models.CVSProject:
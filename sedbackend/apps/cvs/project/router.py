@@ -1,4 +1,6 @@
-from fastapi import Depends, APIRouter
+from typing import Optional
+
+from fastapi import Depends, APIRouter, Query
 from fastapi.logger import logger
 from sedbackend.apps.core.authentication.utils import get_current_active_user
 from sedbackend.apps.core.projects.dependencies import SubProjectAccessChecker
@@ -16,9 +18,10 @@ CVS_APP_SID = 'MOD.CVS'
     summary='Returns all of the user\'s CVS projects',
     response_model=ListChunk[models.CVSProject],
 )
-async def get_all_cvs_project(user: User = Depends(get_current_active_user)) \
-        -> ListChunk[models.CVSProject]:
-    return implementation.get_all_cvs_project(user.id)
+async def get_all_cvs_project(limit: Optional[int] = Query(default=None, ge=1),
+                              after_id: Optional[int] = Query(default=None, ge=0),
+                              user: User = Depends(get_current_active_user)) -> ListChunk[models.CVSProject]:
+    return implementation.get_all_cvs_project(user.id, limit, after_id)
 
 
 @router.get(
@@ -1,11 +1,15 @@
+from typing import Dict, Iterable, Optional
+
 from fastapi.logger import logger
 from mysql.connector.pooling import PooledMySQLConnection
 
 from sedbackend.apps.core.authentication import exceptions as auth_exceptions
-from sedbackend.apps.core.users.storage import db_get_user_safe_with_id
+from sedbackend.apps.core.users import exceptions as user_exceptions
+from sedbackend.apps.core.users.storage import db_get_users_safe_with_ids
 from sedbackend.apps.cvs.project import models as models, exceptions as exceptions
-from sedbackend.libs.datastructures.pagination import ListChunk
-from mysqlsb import MySQLStatementBuilder, Sort, FetchType
+from sedbackend.libs.datastructures.identity_map import Loader
+from sedbackend.libs.datastructures.pagination import ListChunk, fetch_keyset_page
+from mysqlsb import MySQLStatementBuilder, FetchType
 import sedbackend.apps.core.projects.models as proj_models
 import sedbackend.apps.core.projects.storage as proj_storage
 
@@ -13,45 +17,62 @@ CVS_APPLICATION_SID = "MOD.CVS"
 CVS_PROJECT_TABLE = 'cvs_projects'
 CVS_PROJECT_COLUMNS = ['id', 'name', 'description', 'currency', 'owner_id', 'datetime_created']
 
+# Owners of the projects fetched within a request
+owner_loader = Loader(db_get_users_safe_with_ids)
 
-def get_all_cvs_project(db_connection: PooledMySQLConnection, user_id: int) -> ListChunk[models.CVSProject]:
-    logger.debug(f'Fetching all CVS projects for user with id={user_id}.')
 
-    where_statement = f'owner_id = %s'
-    where_values = [user_id]
+def get_all_cvs_project(db_connection: PooledMySQLConnection, user_id: int, limit: Optional[int] = None,
+                        after_id: Optional[int] = None) -> ListChunk[models.CVSProject]:
+    """
+    Fetches the CVS projects of the user ordered on id, at most limit of them after the project with id after_id,
+    and the number of CVS projects of the user.
+    """
+    logger.debug(f'Fetching all CVS projects for user with id={user_id}.')
 
-    select_statement = MySQLStatementBuilder(db_connection)
-    results = select_statement.select(CVS_PROJECT_TABLE, CVS_PROJECT_COLUMNS) \
-        .where(where_statement, where_values) \
-        .order_by(['id'], Sort.ASCENDING) \
-        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+    results, length_total = fetch_keyset_page(db_connection, CVS_PROJECT_TABLE, CVS_PROJECT_COLUMNS, 'owner_id = %s',
+                                              [user_id], limit, after_id)
 
+    owner_loader.load_many(db_connection, [result['owner_id'] for result in results])
     project_list = []
     for result in results:
-        project_list.append(populate_cvs_project(db_connection, result))
-
-    count_statement = MySQLStatementBuilder(db_connection)
-    result = count_statement.count(CVS_PROJECT_TABLE) \
-        .where(where_statement, where_values) \
-        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
-    chunk = ListChunk[models.CVSProject](chunk=project_list, length_total=result['count'])
+        project = populate_cvs_project(db_connection, result)
+        project_loader.prime(db_connection, project.id, project)
+        project_list.append(project)
 
-    return chunk
+    return ListChunk[models.CVSProject](chunk=project_list, length_total=length_total)
 
 
 def get_cvs_project(db_connection: PooledMySQLConnection, project_id: int) -> models.CVSProject:
     logger.debug(f'Fetching CVS project with id={project_id}.')
 
+    project = project_loader.load(db_connection, project_id)
+    if project is None:
+        raise exceptions.CVSProjectNotFoundException
+
+    return project
+
+
+def get_cvs_projects_by_id(db_connection: PooledMySQLConnection,
+                           project_ids: Iterable[int]) -> Dict[int, models.CVSProject]:
+    """
+    Fetches many projects and their owners, in two queries.
+    """
+    project_ids = list(project_ids)
+    if len(project_ids) == 0:
+        return {}
+
     select_statement = MySQLStatementBuilder(db_connection)
-    result = select_statement \
+    results = select_statement \
         .select(CVS_PROJECT_TABLE, CVS_PROJECT_COLUMNS) \
-        .where('id = %s', [project_id]) \
-        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
+        .where(f'id IN ({",".join(["%s" for _ in project_ids])})', project_ids) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
 
-    if result is None:
-        raise exceptions.CVSProjectNotFoundException
+    owner_loader.load_many(db_connection, [result['owner_id'] for result in results])
+    return {result['id']: populate_cvs_project(db_connection, result) for result in results}
 
-    return populate_cvs_project(db_connection, result)
+
+# Projects fetched within a request, most of all by the project checks of the other storage functions
+project_loader = Loader(get_cvs_projects_by_id)
 
 
 def create_cvs_project(db_connection: PooledMySQLConnection, project: models.CVSProjectPost,
@@ -86,6 +107,7 @@ def edit_cvs_project(db_connection: PooledMySQLConnection, project_id: int,
     )
     update_statement.where('id = %s', [project_id])
     update_statement.execute(return_affected_rows=True)
+    project_loader.clear(db_connection, project_id)
 
     return get_cvs_project(db_connection, project_id)
 
@@ -98,6 +120,7 @@ def delete_cvs_project(db_connection: PooledMySQLConnection, project_id: int, us
         .where('id = %s', [project_id]) \
         .execute(return_affected_rows=True)
 
+    project_loader.clear(db_connection, project_id)
     if rows == 0:
         raise exceptions.CVSProjectFailedDeletionException
 
@@ -106,11 +129,15 @@ def delete_cvs_project(db_connection: PooledMySQLConnection, project_id: int, us
 
 def populate_cvs_project(db_connection: PooledMySQLConnection,
                          db_result) -> models.CVSProject:
+    owner = owner_loader.load(db_connection, db_result['owner_id'])
+    if owner is None:
+        raise user_exceptions.UserNotFoundException
+
     return models.CVSProject(
         id=db_result['id'],
         name=db_result['name'],
         description=db_result['description'],
         currency=db_result['currency'],
-        owner=db_get_user_safe_with_id(db_connection, db_result['owner_id']),
+        owner=owner,
         datetime_created=db_result['datetime_created'],
     )
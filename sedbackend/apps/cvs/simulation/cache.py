@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from fastapi.logger import logger
+
+# Number of simulation results kept in memory
+CACHE_SIZE = int(os.environ.get('SIMULATION_CACHE_SIZE', 128))
+
+# Directory of the on-disk tier. The on-disk tier is disabled if it is not set
+CACHE_DIR = os.environ.get('SIMULATION_CACHE_DIR')
+
+# Bytes that the on-disk tier may use before the least recently used entries are removed, set in megabytes
+CACHE_DISK_SIZE = int(os.environ.get('SIMULATION_CACHE_DISK_SIZE', 1024)) * 1024 * 1024
+
+
+def hash_inputs(*inputs) -> str:
+    """
+    Creates a content hash of the simulation inputs. Pydantic models are hashed on their json representation
+    and database rows on their sorted keys, so equal inputs always give the same key.
+    """
+    def default(obj):
+        if hasattr(obj, 'dict'):
+            return obj.dict()
+        return str(obj)
+
+    data = json.dumps(inputs, default=default, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class SimulationCache(object):
+    """
+    Two tier cache of simulation results. The memory tier is an LRU of max_size entries in each process, the
+    optional disk tier keeps the pickled results in directory, is shared by all processes of the server and
+    survives restarts. The disk tier keeps at most max_disk_size bytes, and removes the least recently used
+    entries when a put goes over it.
+
+    Keys are content hashes of the inputs (see hash_inputs), so an entry can never be returned for edited inputs,
+    and entries of edited inputs are not evicted but left to age out.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, directory: Optional[str] = CACHE_DIR,
+                 max_disk_size: int = CACHE_DISK_SIZE):
+        self.max_size = max_size
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self.directory is None:
+            return None
+
+        try:
+            with open(self._path(key), 'rb') as file:
+                value = pickle.load(file)
+            os.utime(self._path(key))  # The modification time orders the entries for eviction
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            return None
+
+        self._put_memory(key, value)
+        return value
+
+    def put(self, key: str, value: Any):
+        self._put_memory(key, value)
+
+        if self.directory is not None:
+            # Written to a temporary file first, so that the other processes never read a partial entry
+            temp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+            try:
+                with open(temp_path, 'wb') as file:
+                    pickle.dump(value, file)
+                os.replace(temp_path, self._path(key))
+            except OSError as exc:
+                logger.debug(f'Could not write simulation cache entry: {exc}')
+                self._remove_file(temp_path)
+                return
+            self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+        if self.directory is not None:
+            for filename in os.listdir(self.directory):
+                self._remove_file(os.path.join(self.directory, filename))
+
+    def _put_memory(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _evict_disk(self):
+        """
+        Removes the least recently used entries of the disk tier until it is within max_disk_size.
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.pkl'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:  # Removed by another process
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_disk_size:
+                break
+            self._remove_file(path)
+            size -= file_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+simulation_cache = SimulationCache()
@@ -0,0 +1,232 @@
+import heapq
+import itertools
+from typing import Callable, List, Optional
+
+import numpy as np
+from desim.data import NonTechCost, TimeFormat
+from desim.simulation import TIMESTEP, Process
+
+from sedbackend.apps.cvs.simulation import models
+from sedbackend.apps.cvs.simulation.dsm import get_transitions
+import sedbackend.apps.cvs.simulation.exceptions as e
+
+# Priorities of simultaneous events, as in simpy. Urgent events are started processes and the end of the simulation
+URGENT = 0
+NORMAL = 1
+
+
+def is_deterministic(processes: List[Process], flow_process: Optional[str], dsm: dict, runtime: float,
+                     time_unit: TimeFormat, non_tech_add: NonTechCost) -> bool:
+    """
+    Checks if a simulation follows a single path through the processes, so that its cash flows can be computed
+    with run_cash_flow_simulation instead of desim. That is the case if every row of the DSM has at most one
+    possible next process. The rest of the checks rule out inputs that desim fails on.
+    """
+    names = [p.name for p in processes]
+    if len(processes) == 0 or len(set(names)) != len(names) or not set(names) <= set(dsm.keys()):
+        return False
+
+    if flow_process is not None and flow_process not in names:
+        return False
+
+    if runtime / time_unit.value <= 0:
+        return False
+
+    if non_tech_add == NonTechCost.TO_TECHNICAL_PROCESS and sum(p.time for p in processes) == 0:
+        return False
+
+    for row in dsm.values():
+        transitions = get_transitions(row)
+        if len(row) != len(processes) or any(p < 0 for _, p in transitions) or len(transitions) > 1:
+            return False
+
+    return True
+
+
+class Batch(object):
+    """
+    Entities that start at the same time and go through the same processes. They have the same events at the
+    same times, so they are simulated as one entity whose costs and revenues are multiplied by size.
+    """
+
+    def __init__(self, size: int, ent_amount: float, dsm: dict, on_end: Callable = None):
+        self.size = size
+        self.ent_amount = ent_amount
+        self.dsm = dsm
+        self.on_end = on_end
+
+
+class CashFlowSimulation(object):
+    """
+    Computes the cumulative costs and revenues of a deterministic simulation (see is_deterministic) at every
+    timestep, without simulating the entities one by one. It follows the lifecycle of desim.simulation.Simulation,
+    including the order in which simpy processes simultaneous events, so that every cost and revenue is booked on
+    the same timestep as in desim. The number of events grows with the number of batches of entities, that is
+    with the flow time, instead of the number of entities.
+    """
+
+    def __init__(self, flow_time: float, flow_rate: float, flow_process: Optional[str], runtime: float,
+                 processes: List[Process], non_tech_processes, non_tech_add: NonTechCost, dsm: dict,
+                 time_format: TimeFormat):
+        self.flow_time = flow_time
+        self.flow_rate = flow_rate
+        self.interarrival_time = 0 if flow_rate <= 0 else 1 / (flow_rate * time_format.value)
+        self.until = runtime / time_format.value
+        self.processes = processes
+        self.index = {p.name: i for i, p in enumerate(processes)}
+        self.flow_index = self.index.get(flow_process)
+        self.non_tech_costs = sum([p.cost for p in non_tech_processes])
+        self.non_tech_add = non_tech_add
+        self.process_time = sum([p.time for p in processes])
+
+        before = processes if self.flow_index is None else processes[:self.flow_index]
+        self.dsm_before_flow = {p.name: dsm[p.name] for p in before}
+        self.dsm_after_flow = {name: row for name, row in dsm.items() if name not in self.dsm_before_flow}
+
+        # desim runs a process without waiting once any entity has completed it
+        self.completed = [False] * len(processes)
+
+        self.now = 0.0
+        self.cost = 0.0
+        self.revenue = 0.0
+        self.static_costs = 0.0
+        self.time_steps = [0.0]
+        self.total_costs = [0.0]
+        self.total_revenue = [0.0]
+        self.end_flow = None
+        self._queue = []
+        self._eid = itertools.count()
+
+    def run(self):
+        self._schedule(0, URGENT, self._start)
+        self._schedule(0, URGENT, self._start_observing)
+        while len(self._queue) > 0 and self._queue[0][0] < self.until:
+            self.now, _, _, handler, args = heapq.heappop(self._queue)
+            handler(*args)
+
+    def _schedule(self, delay: float, priority: int, handler: Callable, *args):
+        heapq.heappush(self._queue, (self.now + delay, priority, next(self._eid), handler, args))
+
+    def _start(self):
+        first = Batch(1, 1, self.dsm_before_flow, on_end=self._start_flow)
+        self._schedule(0, URGENT, self._run_activity, first, 0)
+
+    def _start_flow(self):
+        self.end_flow = self.now + self.flow_time
+        self._flow()
+
+    def _flow(self):
+        if self.now >= self.end_flow:
+            return
+        if int(self.flow_rate) > 0 and self.flow_index is not None:
+            total_ent_amount = 0 if self.interarrival_time <= 0 else (1 / self.interarrival_time) * self.flow_time
+            batch = Batch(int(self.flow_rate), total_ent_amount, self.dsm_after_flow)
+            self._schedule(0, URGENT, self._run_activity, batch, self.flow_index)
+        self._schedule(1, NORMAL, self._flow)
+
+    def _run_activity(self, batch: Batch, i: int):
+        self._schedule(0, URGENT, self._run_process, batch, i)
+        self._schedule(self.processes[i].time, NORMAL, self._finish_activity, batch, i)
+
+    def _run_process(self, batch: Batch, i: int):
+        self._schedule(0.0 if self.completed[i] else self.processes[i].time, NORMAL, self._book, batch, i)
+
+    def _book(self, batch: Batch, i: int):
+        process = self.processes[i]
+        self.cost += batch.size * process.cost
+        self.revenue += batch.size * process.revenue
+        if process.add_non_tech == NonTechCost.TO_TECHNICAL_PROCESS:
+            self.cost += batch.size * self.non_tech_costs * process.time / (self.process_time * batch.ent_amount)
+        self.completed[i] = True
+
+    def _finish_activity(self, batch: Batch, i: int):
+        row = batch.dsm.get(self.processes[i].name)
+        transitions = get_transitions(row) if row is not None else []
+        if len(transitions) > 0:
+            self._run_activity(batch, transitions[0][0])
+        elif batch.on_end is not None:
+            self._schedule(0, NORMAL, batch.on_end)
+
+    def _start_observing(self):
+        if self.non_tech_add == NonTechCost.LUMP_SUM:
+            self.total_costs[0] += self.non_tech_costs
+        self._observe()
+
+    def _observe(self):
+        if self.non_tech_add == NonTechCost.CONTINOUSLY:
+            self.static_costs += self.non_tech_costs * TIMESTEP / self.until
+        self.time_steps.append(self.now)
+        self.total_costs.append(self.cost + self.static_costs)
+        self.total_revenue.append(self.revenue)
+        self._schedule(TIMESTEP, NORMAL, self._observe)
+
+
+def run_cash_flow_simulation(flow_time: float, flow_rate: float, flow_process: Optional[str],
+                             processes: List[Process], non_tech_processes, non_tech_add: NonTechCost, dsm: dict,
+                             time_unit: TimeFormat, discount_rate: float, runtime: float,
+                             include_cash_flows: bool = False) -> models.Simulation:
+    """
+    Computes the result of a deterministic simulation (see is_deterministic) from its cash flows, the same result
+    as a single run of desim. Takes the arguments of desim.interface.Des.run_simulation.
+    """
+    sim = CashFlowSimulation(flow_time, flow_rate, flow_process, runtime, processes, non_tech_processes,
+                             non_tech_add, dsm, time_unit)
+    sim.run()
+
+    cash_flows = get_cash_flows(sim.total_costs, sim.total_revenue)
+    npv = discount_cash_flows(sim.time_steps, cash_flows, [discount_rate])[0]
+
+    return models.Simulation(
+        time=sim.time_steps,
+        mean_NPV=npv.tolist(),
+        max_NPVs=[npv[-1]],
+        mean_payback_time=get_payback_time(sim.time_steps, npv),
+        all_npvs=[npv.tolist()],
+        cash_flows=cash_flows.tolist() if include_cash_flows else None
+    )
+
+
+def get_cash_flows(total_costs: List[float], total_revenue: List[float]) -> np.ndarray:
+    """
+    The undiscounted net cash flow of every timestep, from the cumulative costs and revenues of a simulation.
+    The first timestep has no cash flow, as in desim.
+    """
+    return np.concatenate([[0.0], np.diff(total_revenue) - np.diff(total_costs)])
+
+
+def discount_cash_flows(time: List[float], cash_flows, discount_rates: List[float]) -> np.ndarray:
+    """
+    The cumulative NPV of the cash flows at every timestep, for each of the discount rates, rates x time.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    cash_flows = np.asarray(cash_flows, dtype=np.float64)
+    discount = (1 + np.asarray(discount_rates, dtype=np.float64))[:, np.newaxis] ** time[1:]
+    npvs = np.cumsum(cash_flows[1:] / discount, axis=1)
+    return np.concatenate([np.zeros((len(discount_rates), 1)), npvs], axis=1)
+
+
+def get_payback_time(time: List[float], npv: np.ndarray) -> float:
+    """
+    The first timestep where the NPV is positive, or -1 if it never is.
+    """
+    payback = np.flatnonzero(npv > 0)
+    return time[payback[0]] if len(payback) > 0 else -1
+
+
+def rediscount(time: List[float], cash_flows: List[float],
+               discount_rates: List[float]) -> List[models.DiscountedSimulation]:
+    """
+    Computes the NPV of the cash flows of a simulation for every discount rate at once, without simulating again.
+
+    :raises CashFlowLengthMismatchException: If there is not one cash flow per timestep
+    """
+    if len(time) != len(cash_flows) or len(time) == 0:
+        raise e.CashFlowLengthMismatchException
+
+    npvs = discount_cash_flows(time, cash_flows, discount_rates)
+    return [models.DiscountedSimulation(
+        discount_rate=discount_rate,
+        mean_NPV=npv.tolist(),
+        max_NPVs=[npv[-1]],
+        mean_payback_time=get_payback_time(time, npv)
+    ) for discount_rate, npv in zip(discount_rates, npvs)]
@@ -0,0 +1,98 @@
+import functools
+from collections.abc import Sequence
+from typing import Dict, FrozenSet, Iterator, List, Tuple
+
+from desim.simulation import Process
+
+
+class SparseRow(Sequence):
+    """
+    A row of a DSM that only stores its non-zero transition probabilities. It reads as the dense list of
+    probabilities that desim expects, so desim can use it as is, but takes memory in the number of transitions
+    instead of the number of processes.
+    """
+
+    def __init__(self, size: int, transitions: Dict[int, float]):
+        self.size = size
+        self.transitions = transitions
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('DSM row index out of range')
+        return self.transitions.get(index, 0)
+
+    def __iter__(self) -> Iterator[float]:
+        for index in range(self.size):
+            yield self.transitions.get(index, 0)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other) if isinstance(other, (Sequence, list)) else NotImplemented
+
+    def __repr__(self) -> str:
+        return f'SparseRow({self.size}, {self.transitions})'
+
+
+def get_transitions(row) -> List[Tuple[int, float]]:
+    """
+    The index and probability of every possible next process of a DSM row, for both sparse and dense rows.
+    """
+    if isinstance(row, SparseRow):
+        return sorted(row.transitions.items())
+    return [(index, p) for index, p in enumerate(row) if p != 0]
+
+
+def create_dsm(processes: List[Process], edges: FrozenSet[Tuple[int, int]] = frozenset()) -> dict:
+    """
+    Creates the DSM of the processes from the edges between the vcs rows in the BPMN of the vcs. An entity goes on
+    from a process to one of the processes that follow it, with equal probability. Rows that are not processes,
+    such as non-technical processes, are passed through. Without edges between the processes the processes follow
+    each other in the order of the vcs.
+
+    DSMs are cached on the vcs rows and names of the processes and the edges, so all designs and runs that have the
+    same processes share the same DSM. It must therefore not be modified.
+    """
+    return _create_dsm(tuple((p.id, p.name) for p in processes), edges)
+
+
+@functools.lru_cache(maxsize=128)
+def _create_dsm(process_rows: Tuple[Tuple[int, str], ...], edges: FrozenSet[Tuple[int, int]]) -> dict:
+    size = len(process_rows)
+    index = {row: i for i, (row, _) in enumerate(process_rows)}
+
+    successors = {}
+    for from_row, to_row in edges:
+        successors.setdefault(from_row, set()).add(to_row)
+
+    if not any(row in successors for row in index):
+        return {name: SparseRow(size, {i + 1: 1} if i + 1 < size else {})
+                for i, (_, name) in enumerate(process_rows)}
+
+    dsm = {}
+    for row, name in process_rows:
+        next_processes = sorted(get_next_processes(row, successors, index), key=index.get)
+        dsm[name] = SparseRow(size, {index[next_row]: 1 / len(next_processes) for next_row in next_processes})
+    return dsm
+
+
+def get_next_processes(row: int, successors: Dict[int, set], index: Dict[int, int]) -> set:
+    """
+    The processes that directly follow the row, going through the rows that are not processes.
+    """
+    found, visited, stack = set(), {row}, list(successors.get(row, ()))
+    while len(stack) > 0:
+        next_row = stack.pop()
+        if next_row in visited:
+            continue
+        visited.add(next_row)
+        if next_row in index:
+            found.add(next_row)
+        else:
+            stack.extend(successors.get(next_row, ()))
+    return found
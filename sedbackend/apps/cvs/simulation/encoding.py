@@ -0,0 +1,46 @@
+import io
+from typing import List, Optional
+
+import numpy as np
+
+from sedbackend.apps.cvs.simulation import models
+
+NPZ_MEDIA_TYPE = 'application/x-npz'
+
+
+def accepts_npz(accept: Optional[str]) -> bool:
+    """
+    Checks if the Accept header asks for the NumPy encoding. JSON stays the default.
+    """
+    if accept is None:
+        return False
+    return NPZ_MEDIA_TYPE in [media_type.split(';')[0].strip() for media_type in accept.split(',')]
+
+
+def encode_npz(results: List[models.Simulation]) -> bytes:
+    """
+    Packs the simulation results as float64 arrays in a NumPy .npz archive. The archive holds mean_payback_time
+    with one value per design, and time_{i}, mean_npv_{i}, max_npvs_{i} and all_npvs_{i} (runs x time) for the
+    i:th design. all_npvs_{i} is left out if the runs were not included, and the statistics of a monte carlo
+    summary are added as {statistic}_{i}, e.g. p50_{i} and std_{i}. cash_flows_{i} is added if the cash flows
+    were included. Load it with numpy.load.
+    """
+    arrays = {'mean_payback_time': np.array([result.mean_payback_time for result in results], dtype=np.float64)}
+    for i, result in enumerate(results):
+        arrays[f'time_{i}'] = np.array(result.time, dtype=np.float64)
+        arrays[f'mean_npv_{i}'] = np.array(result.mean_NPV, dtype=np.float64)
+        arrays[f'max_npvs_{i}'] = np.array(result.max_NPVs, dtype=np.float64)
+        if result.all_npvs is not None:
+            arrays[f'all_npvs_{i}'] = np.array(result.all_npvs, dtype=np.float64).reshape(len(result.all_npvs), -1)
+        if result.cash_flows is not None:
+            arrays[f'cash_flows_{i}'] = np.array(result.cash_flows, dtype=np.float64)
+        if result.statistics is not None:
+            statistics = dict(result.statistics.percentiles, std=result.statistics.std,
+                              negative_npv_probability=result.statistics.negative_npv_probability)
+            for name, values in statistics.items():
+                if values is not None:
+                    arrays[f'{name}_{i}'] = np.array(values, dtype=np.float64)
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
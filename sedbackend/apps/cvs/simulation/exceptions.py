@@ -68,3 +68,19 @@ class CouldNotFetchMarketInputValuesException(Exception):
 
 class CouldNotFetchValueDriverDesignValuesException(Exception):
     pass
+
+
+class SimulationQueueFullException(Exception):
+    pass
+
+
+class CashFlowLengthMismatchException(Exception):
+    pass
+
+
+class InvalidSweepException(Exception):
+    pass
+
+
+class SweepTooLargeException(Exception):
+    pass
@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import functools
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from queue import Empty
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from fastapi.logger import logger
+
+import sedbackend.apps.cvs.simulation.exceptions as e
+
+# Number of server processes, as WEB_CONCURRENCY sets it for gunicorn. Each of them has its own simulation
+# executor, so the defaults below share the CPUs and the queue between them
+SERVER_PROCESSES = max(int(os.environ.get('WEB_CONCURRENCY', 1)), 1)
+
+# Number of worker processes running simulations, in each server process
+MAX_WORKERS = int(os.environ.get('SIMULATION_WORKERS', max((os.cpu_count() or 1) // SERVER_PROCESSES, 1)))
+
+# Number of simulations that may wait for a free worker before new requests are rejected, in all server processes
+# together. Each server process gets an equal share
+MAX_QUEUE_SIZE = math.ceil(int(os.environ.get('SIMULATION_QUEUE_SIZE', 2 * MAX_WORKERS * SERVER_PROCESSES))
+                           / SERVER_PROCESSES)
+
+# Number of processes that the simulation workers of a server process together may use. Each worker gets an equal
+# share for the simulations of its request, see request_pool
+MAX_PROCESSES = int(os.environ.get('SIMULATION_PROCESSES', MAX_WORKERS))
+
+# Seconds between checks of whether the worker of a stream is still running
+STREAM_POLL_INTERVAL = 1.0
+
+
+class SimulationExecutor(object):
+    """
+    Runs CPU-bound simulation work in a pool of worker processes so that the event loop stays responsive.
+    At most max_workers simulations run at the same time and at most max_queue_size more are allowed to wait.
+
+    The workers are started with spawn, so that they open their own database connections instead of sharing
+    the sockets of the connection pool in the server process.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue_size: int = MAX_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.pending = 0
+        self._lock = threading.Lock()  # The callbacks of submitted jobs release their place from another thread
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Runs fn in a worker process and waits for the result. fn, its arguments and its result must be picklable.
+
+        :raises SimulationQueueFullException: If all workers are busy and the queue is full
+        """
+        self.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.get_executor(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self.release()
+
+    async def stream(self, fn: Callable, *args, **kwargs) -> AsyncIterator[tuple]:
+        """
+        Runs fn in a worker process and yields the arguments of every call fn makes to its on_result callback,
+        as soon as they are made. Exceptions raised by fn, or by the pool if the worker dies, are raised after the
+        items that were produced before it.
+
+        :raises SimulationQueueFullException: If all workers are busy and the queue is full
+        """
+        self.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            queue = self.get_manager().Queue()
+            future = loop.run_in_executor(self.get_executor(),
+                                          functools.partial(run_streaming, queue, fn, *args, **kwargs))
+            while True:
+                try:
+                    item = await loop.run_in_executor(None, functools.partial(queue.get,
+                                                                              timeout=STREAM_POLL_INTERVAL))
+                except Empty:
+                    if future.done():  # The worker ended without ending the stream, for example because it died
+                        break
+                    continue
+                if item is None:
+                    break
+                yield item
+            await future
+        finally:
+            self.release()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Starts fn in a worker process without waiting for it. Counts toward the queue like run and stream, until fn
+        has finished.
+
+        :raises SimulationQueueFullException: If all workers are busy and the queue is full
+        """
+        self.acquire()
+        try:
+            future = self.get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self.release()
+            raise
+        future.add_done_callback(log_failure)
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+    def acquire(self):
+        """
+        Takes a place in the queue.
+
+        :raises SimulationQueueFullException: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue_size:
+                raise e.SimulationQueueFullException
+            self.pending += 1
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+
+    def get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context('spawn').Manager()
+        return self._manager
+
+    def shutdown(self):
+        if self._executor is not None:
+            logger.debug('Shutting down simulation executor')
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+def run_streaming(queue, fn: Callable, *args, **kwargs):
+    """
+    Runs in a worker process. Puts the results of fn on the queue and ends the stream with None.
+    """
+    try:
+        return fn(*args, on_result=lambda *item: queue.put(item), **kwargs)
+    finally:
+        queue.put(None)
+
+
+@contextlib.contextmanager
+def request_pool(tasks: int) -> Iterator[Optional[ProcessPoolExecutor]]:
+    """
+    A pool for the tasks of one simulation request, which itself runs in a worker of simulation_executor. The pool
+    gets the share of MAX_PROCESSES of one worker, so the number of processes stays bounded however many workers
+    are busy. Yields None when the share is a single process, and the tasks should then run in the worker itself.
+    """
+    workers = min(tasks, MAX_PROCESSES // simulation_executor.max_workers)
+    if workers <= 1:
+        yield None
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield pool
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def log_failure(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        exc = future.exception()
+        logger.error(f'Simulation worker failed: {exc.__class__}, {exc}')
+
+
+simulation_executor = SimulationExecutor()
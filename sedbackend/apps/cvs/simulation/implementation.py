@@ -1,11 +1,13 @@
 from fastapi import HTTPException, UploadFile, Depends, Form
 from starlette import status
+import json
 import tempfile
+from contextlib import contextmanager
 
-from typing import List, Optional
+from typing import AsyncIterator, Callable, List, Optional
 
 from fastapi.logger import logger
-from sedbackend.apps.cvs.simulation import models, storage
+from sedbackend.apps.cvs.simulation import cashflow, models, storage
 
 from sedbackend.apps.core.authentication import exceptions as auth_ex
 from sedbackend.apps.core.db import get_connection
@@ -15,213 +17,189 @@ from sedbackend.apps.cvs.simulation.exceptions import BadlyFormattedSettingsExce
     DesignIdsNotFoundException, FormulaEvalException, NegativeTimeException, ProcessNotFoundException, \
     RateWrongOrderException, InvalidFlowSettingsException, VcsFailedException, FlowProcessNotFoundException, \
     SimSettingsNotFoundException, CouldNotFetchSimulationDataException, CouldNotFetchMarketInputValuesException, \
-    CouldNotFetchValueDriverDesignValuesException, NoTechnicalProcessException
+    CouldNotFetchValueDriverDesignValuesException, NoTechnicalProcessException, SimulationQueueFullException, \
+    CashFlowLengthMismatchException, InvalidSweepException, SweepTooLargeException
+from sedbackend.apps.cvs.simulation.executor import simulation_executor
+from sedbackend.apps.cvs.simulation.sweep import MAX_SWEEP_SIZE
 
 from sedbackend.apps.cvs.vcs import exceptions as vcs_exceptions
 from sedbackend.apps.cvs.market_input import exceptions as market_input_exceptions
 
 
-def run_simulation(sim_settings: models.EditSimSettings, vcs_ids: List[int],
-                   design_group_ids: List[int]) -> List[models.Simulation]:
+# The status code and detail of the HTTP error of each exception of the simulations. The details are formatted with
+# the exception as exc
+SIMULATION_ERRORS = {
+    SimulationQueueFullException: (status.HTTP_503_SERVICE_UNAVAILABLE,
+                                   'Too many simulations are running. Try again later.'),
+    auth_ex.UnauthorizedOperationException: (status.HTTP_403_FORBIDDEN, 'Unauthorized user.'),
+    vcs_exceptions.VCSNotFoundException: (status.HTTP_400_BAD_REQUEST, 'Could not find vcs.'),
+    vcs_exceptions.GenericDatabaseException: (status.HTTP_404_NOT_FOUND, 'Fel'),
+    project_exceptions.CVSProjectNotFoundException: (status.HTTP_400_BAD_REQUEST, 'Could not find project.'),
+    market_input_exceptions.MarketInputNotFoundException: (status.HTTP_400_BAD_REQUEST, 'Could not find market input'),
+    design_exc.DesignNotFoundException: (status.HTTP_400_BAD_REQUEST, 'Could not find all designs'),
+    ProcessNotFoundException: (status.HTTP_400_BAD_REQUEST, 'Could not find process'),
+    DSMFileNotFoundException: (status.HTTP_400_BAD_REQUEST, 'Could not read uploaded file'),
+    FormulaEvalException: (status.HTTP_500_INTERNAL_SERVER_ERROR,
+                           'Could not evaluate formulas of process with id: {exc.process_id}'),
+    RateWrongOrderException: (status.HTTP_400_BAD_REQUEST,
+                              'Wrong order of rate of entities. Per project assigned after per product'),
+    NegativeTimeException: (status.HTTP_400_BAD_REQUEST,
+                            'Formula at process with id: {exc.process_id} evaluated to negative time'),
+    DesignIdsNotFoundException: (status.HTTP_400_BAD_REQUEST, 'No design ids or empty array supplied'),
+    VcsFailedException: (status.HTTP_400_BAD_REQUEST, 'Invalid vcs ids'),
+    BadlyFormattedSettingsException: (status.HTTP_400_BAD_REQUEST, 'Settings are not correct'),
+    CouldNotFetchSimulationDataException: (status.HTTP_400_BAD_REQUEST, 'Could not fetch simulation data'),
+    CouldNotFetchMarketInputValuesException: (status.HTTP_400_BAD_REQUEST, 'Could not fetch market input values'),
+    CouldNotFetchValueDriverDesignValuesException: (status.HTTP_400_BAD_REQUEST,
+                                                    'Could not fetch value driver design values'),
+    NoTechnicalProcessException: (status.HTTP_400_BAD_REQUEST, 'No technical processes found'),
+    InvalidSweepException: (status.HTTP_400_BAD_REQUEST, 'Invalid ranges of value drivers'),
+    SweepTooLargeException: (status.HTTP_400_BAD_REQUEST,
+                             f'Too many virtual designs. At most {MAX_SWEEP_SIZE} designs can be simulated at once'),
+}
+
+
+@contextmanager
+def simulation_errors():
+    """
+    Raises the HTTP error of SIMULATION_ERRORS for the exceptions of the simulations that are raised in the block.
+    """
     try:
-        with get_connection() as con:
-            result = storage.run_simulation(con, sim_settings, vcs_ids, design_group_ids)
-            return result
-    except auth_ex.UnauthorizedOperationException:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail='Unauthorized user.',
-        )
-    except vcs_exceptions.VCSNotFoundException:  # This exception will probably never fire
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find vcs.',
-        )
-    except project_exceptions.CVSProjectNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find project.',
-        )
-    except market_input_exceptions.MarketInputNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find market input',
-        )
-    except ProcessNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find process',
-        )
-    except FormulaEvalException as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f'Could not evaluate formulas of process with id: {e.process_id}'
-        )
-    except RateWrongOrderException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Wrong order of rate of entities. Per project assigned after per product'
-        )
-    except NegativeTimeException as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Formula at process with id: {e.process_id} evaluated to negative time'
-        )
-    except DesignIdsNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'No design ids or empty array supplied'
-        )
-    except VcsFailedException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Invalid vcs ids'
-        )
-    except BadlyFormattedSettingsException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Settings are not correct'
-        )
-    except CouldNotFetchSimulationDataException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not fetch simulation data'
-        )
-    except CouldNotFetchMarketInputValuesException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not fetch market input values'
-        )
-    except CouldNotFetchValueDriverDesignValuesException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not fetch value driver design values'
-        )
-    except NoTechnicalProcessException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'No technical processes found'
-        )
+        yield
+    except tuple(SIMULATION_ERRORS) as exc:
+        for exception, (status_code, detail) in SIMULATION_ERRORS.items():
+            if isinstance(exc, exception):
+                raise HTTPException(status_code=status_code, detail=detail.format(exc=exc))
+
+
+async def run_simulation(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                         design_group_ids: List[int], parallel: bool = False,
+                         include_cash_flows: bool = False) -> List[models.Simulation]:
+    with simulation_errors():
+        return await simulation_executor.run(run_simulation_worker, sim_settings, vcs_ids, design_group_ids,
+                                             parallel, include_cash_flows)
+
+
+async def run_scenarios(scenarios: List[models.EditSimSettings], vcs_ids: List[int], design_group_ids: List[int],
+                        parallel: bool = False,
+                        include_cash_flows: bool = False) -> List[models.ScenarioSimulation]:
+    with simulation_errors():
+        return await simulation_executor.run(run_scenarios_worker, scenarios, vcs_ids, design_group_ids, parallel,
+                                             include_cash_flows)
+
+
+async def run_design_sweep(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                           sweep: models.DesignSweep, parallel: bool = False) -> List[models.DesignSweepResult]:
+    with simulation_errors():
+        return await simulation_executor.run(run_design_sweep_worker, sim_settings, vcs_ids, sweep, parallel)
 
 
 def run_dsm_file_simulation(user_id: int, project_id: int, sim_params: models.FileParams,
                             dsm_file: UploadFile) -> List[models.Simulation]:
-    try:
+    with simulation_errors():
         with get_connection() as con:
             res = storage.run_sim_with_dsm_file(con, user_id, project_id, sim_params, dsm_file)  # Wtf saknar xlsx file
             return res
-    except auth_ex.UnauthorizedOperationException:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail='Unauthorized user.',
-        )
-    except vcs_exceptions.VCSNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find vcs with id=.',
-        )
-    except project_exceptions.CVSProjectNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find project.',
-        )
-    except market_input_exceptions.MarketInputNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find market input',
-        )
-    except ProcessNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not find process',
-        )
-    except DSMFileNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not read uploaded file'
-        )
-    except FormulaEvalException as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f'Could not evaluate formulas of process with id: {e.process_id}'
-        )
-    except RateWrongOrderException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Wrong order of rate of entities. Per project assigned after per product'
-        )
-    except NegativeTimeException as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Formula at process with id: {e.process_id} evaluated to negative time'
-        )
-    except DesignIdsNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'No design ids or empty array supplied'
-        )
 
 
-def run_sim_monte_carlo(sim_settings: models.EditSimSettings, vcs_ids: List[int], design_group_ids: List[int],
-                        normalized_npv: bool) -> List[models.Simulation]:
+async def run_sim_monte_carlo(sim_settings: models.EditSimSettings, vcs_ids: List[int], design_group_ids: List[int],
+                              normalized_npv: bool,
+                              summary: Optional[models.MonteCarloSummary] = None,
+                              convergence: Optional[models.MonteCarloConvergence] = None,
+                              seed: Optional[int] = None) -> List[models.Simulation]:
+    with simulation_errors():
+        return await simulation_executor.run(run_sim_monte_carlo_worker, sim_settings, vcs_ids, design_group_ids,
+                                             normalized_npv, summary, convergence, seed)
+
+
+def run_simulation_worker(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                          design_group_ids: List[int], parallel: bool, include_cash_flows: bool = False,
+                          on_result: Callable = None) -> List[models.Simulation]:
+    """
+    Runs in a process of the simulation executor. Exceptions are mapped to HTTP errors by run_simulation.
+    """
+    with get_connection() as con:
+        return storage.run_simulation(con, sim_settings, vcs_ids, design_group_ids, parallel, on_result,
+                                      include_cash_flows)
+
+
+def run_scenarios_worker(scenarios: List[models.EditSimSettings], vcs_ids: List[int], design_group_ids: List[int],
+                         parallel: bool, include_cash_flows: bool = False) -> List[models.ScenarioSimulation]:
+    """
+    Runs in a process of the simulation executor. Exceptions are mapped to HTTP errors by run_scenarios.
+    """
+    with get_connection() as con:
+        return storage.run_scenarios(con, scenarios, vcs_ids, design_group_ids, parallel, include_cash_flows)
+
+
+def run_design_sweep_worker(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                            sweep: models.DesignSweep, parallel: bool) -> List[models.DesignSweepResult]:
+    """
+    Runs in a process of the simulation executor. Exceptions are mapped to HTTP errors by run_design_sweep.
+    """
+    with get_connection() as con:
+        return storage.run_design_sweep(con, sim_settings, vcs_ids, sweep, parallel)
+
+
+def run_sim_monte_carlo_worker(sim_settings: models.EditSimSettings, vcs_ids: List[int], design_group_ids: List[int],
+                               normalized_npv: bool, summary: Optional[models.MonteCarloSummary] = None,
+                               convergence: Optional[models.MonteCarloConvergence] = None,
+                               seed: Optional[int] = None, on_result: Callable = None) -> List[models.Simulation]:
+    """
+    Runs in a process of the simulation executor. Exceptions are mapped to HTTP errors by run_sim_monte_carlo.
+    """
+    with get_connection() as con:
+        return storage.run_sim_monte_carlo(con, sim_settings, vcs_ids, design_group_ids, normalized_npv, on_result,
+                                           summary, convergence, seed)
+
+
+async def run_simulation_stream(sim_settings: models.EditSimSettings, vcs_ids: List[int], design_group_ids: List[int],
+                                monte_carlo: bool, normalized_npv: bool = False,
+                                summary: Optional[models.MonteCarloSummary] = None,
+                                parallel: bool = False,
+                                convergence: Optional[models.MonteCarloConvergence] = None,
+                                seed: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Starts the simulation and waits for the first design, so that errors in the input still give a proper HTTP
+    error. The rest of the designs are streamed as newline delimited json as soon as they are finished.
+    """
+    if monte_carlo:
+        results = simulation_executor.stream(run_sim_monte_carlo_worker, sim_settings, vcs_ids, design_group_ids,
+                                             normalized_npv, summary, convergence, seed)
+    else:
+        results = simulation_executor.stream(run_simulation_worker, sim_settings, vcs_ids, design_group_ids, parallel)
+
+    with simulation_errors():
+        first = await anext(results, None)
+
+    return stream_design_results(first, results)
+
+
+async def stream_design_results(first: Optional[tuple], results: AsyncIterator[tuple]) -> AsyncIterator[str]:
+    if first is None:
+        return
+    yield design_result_line(*first)
+
     try:
-        with get_connection() as con:
-            result = storage.run_sim_monte_carlo(con, sim_settings, vcs_ids, design_group_ids, normalized_npv)
-            return result
-    except vcs_exceptions.GenericDatabaseException:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f'Fel'
-        )
-    except FormulaEvalException as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f'Could not evaluate formulas of process with id: {e.process_id}'
-        )
-    except RateWrongOrderException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Wrong order of rate of entities. Per project assigned after per product'
-        )
-    except NegativeTimeException as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Formula at process with id: {e.process_id} evaluated to negative time'
-        )
-    except DesignIdsNotFoundException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'No design ids or empty array supplied'
-        )
-    except VcsFailedException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Invalid vcs ids'
-        )
-    except BadlyFormattedSettingsException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Settings are not correct'
-        )
-    except CouldNotFetchSimulationDataException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not fetch simulation data'
-        )
-    except CouldNotFetchMarketInputValuesException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not fetch market input values'
-        )
-    except CouldNotFetchValueDriverDesignValuesException:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Could not fetch value driver design values'
-        )
-    except NoTechnicalProcessException:
+        async for item in results:
+            yield design_result_line(*item)
+    except Exception as exc:
+        # The response has already started, so the error can only be reported in the stream
+        logger.debug(f'{exc.__class__}, {exc}')
+        yield json.dumps({'error': exc.__class__.__name__}) + '\n'
+
+
+def design_result_line(vcs_id: int, design_id: int, result: models.Simulation) -> str:
+    return models.DesignSimulation(vcs_id=vcs_id, design_id=design_id, result=result).json() + '\n'
+
+
+def rediscount_simulation(request: models.RediscountRequest) -> List[models.DiscountedSimulation]:
+    try:
+        return cashflow.rediscount(request.time, request.cash_flows, request.discount_rates)
+    except CashFlowLengthMismatchException:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'No technical processes found'
+            detail=f'There must be one cash flow per timestep'
         )
 
 
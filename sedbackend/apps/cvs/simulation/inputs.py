@@ -0,0 +1,214 @@
+from typing import Callable, Dict, Hashable, List, Union
+
+import numpy as np
+
+from desim.simulation import Process
+
+from sedbackend.apps.cvs.design.models import Design
+from sedbackend.apps.cvs.distributions.algorithms import sample_distributions
+from sedbackend.apps.cvs.simulation.dsm import create_dsm
+from sedbackend.libs.formula_parser.compiler import matrix_bindings
+
+
+class SimulationInput(object):
+    """
+    The database inputs of one simulation request, fetched once and indexed for the lookups the simulation makes.
+    Simulation data is indexed on (vcs, design group), market input values and BPMN edges on vcs and designs on
+    design group.
+    The value driver values are kept as one column per variable, with one entry per design, for batch evaluation
+    of formulas, both for all value drivers of a design and for the value drivers of each vcs row.
+
+    The lookups do not depend on the number of designs and rows, so preparing a simulation is linear in the size
+    of the project.
+    """
+
+    def __init__(self, sim_data: List[dict], market_values: List[dict], designs: List[Design],
+                 vd_design_values: List[dict], bpmn_edges: List[dict] = None):
+        self.sim_data = sim_data
+        self.market_values = market_values
+        self.designs = designs
+        self.vd_design_values = vd_design_values
+        self.bpmn_edges = bpmn_edges if bpmn_edges is not None else []
+
+        self._sim_data = group_by(sim_data, lambda sd: (sd['vcs'], sd['design_group']))
+        self._market_values = group_by(market_values, lambda mi: mi['vcs'])
+        self._bpmn_edges = {vcs_id: frozenset((edge['from_row'], edge['to_row']) for edge in edges)
+                            for vcs_id, edges in group_by(self.bpmn_edges, lambda edge: edge['vcs']).items()}
+        self._designs = group_by(designs, lambda design: design.design_group_id)
+        self._design_index = {design.id: i for i, design in enumerate(designs)}
+
+        self._vd_values = group_by(vd_design_values, lambda vd: vd['design'])
+        self._vd_row_values = group_by(vd_design_values, lambda vd: vd['vcs_row'])
+        self._vd_columns = None
+        self._vd_row_columns = {}
+        self._mi_bindings = {}
+
+    def get_sim_data(self, vcs_id: int, design_group_id: int) -> List[dict]:
+        return self._sim_data.get((vcs_id, design_group_id), [])
+
+    def get_designs(self, design_group_id: int) -> List[Design]:
+        return self._designs.get(design_group_id, [])
+
+    def get_design(self, design_id: int) -> Design:
+        return self.designs[self._design_index[design_id]]
+
+    def get_dsm(self, vcs_id: int, processes: List[Process]) -> dict:
+        """
+        The DSM of the processes of the vcs, from its BPMN. Shared by all designs with the same processes.
+        """
+        return create_dsm(processes, self._bpmn_edges.get(vcs_id, frozenset()))
+
+    def get_vd_values(self, design_id: int) -> List[dict]:
+        return self._vd_values.get(design_id, [])
+
+    def get_market_values(self, vcs_id: int) -> List[dict]:
+        return self._market_values.get(vcs_id, [])
+
+    def is_uncertain(self, vcs_id: int, design_id: int) -> bool:
+        """
+        Whether any of the value driver values of the design or market input values of the vcs has a distribution.
+        """
+        return any(value.get('distribution') is not None
+                   for value in self.get_vd_values(design_id) + self.get_market_values(vcs_id))
+
+    def get_mi_bindings(self, vcs_id: int) -> Dict[str, float]:
+        if vcs_id not in self._mi_bindings:
+            self._mi_bindings[vcs_id] = get_variable_bindings(self._market_values.get(vcs_id, []))
+        return self._mi_bindings[vcs_id]
+
+    def get_vd_bindings(self, design_ids: List[int]) -> Dict[str, np.ndarray]:
+        """
+        The value driver values of the designs, one column per variable name with one entry per design.
+        """
+        if self._vd_columns is None:
+            self._vd_columns = get_variable_binding_columns([self._vd_values.get(design.id, [])
+                                                             for design in self.designs])
+        return self._select(self._vd_columns, design_ids)
+
+    def get_vd_row_bindings(self, design_ids: List[int], vcs_row_id: int) -> Dict[str, np.ndarray]:
+        """
+        The values of the value drivers that belong to the stakeholder needs of the vcs row, as get_vd_bindings.
+        """
+        if vcs_row_id not in self._vd_row_columns:
+            row_values = group_by(self._vd_row_values.get(vcs_row_id, []), lambda vd: vd['design'])
+            self._vd_row_columns[vcs_row_id] = get_variable_binding_columns([row_values.get(design.id, [])
+                                                                             for design in self.designs])
+        return self._select(self._vd_row_columns[vcs_row_id], design_ids)
+
+    def _select(self, columns: Dict[str, np.ndarray], design_ids: List[int]) -> Dict[str, np.ndarray]:
+        rows = np.array([self._design_index[design_id] for design_id in design_ids], dtype=int)
+        return {name: column[rows] for name, column in columns.items()}
+
+
+class SampledInput(object):
+    """
+    The inputs of the runs of a monte carlo simulation of one design, where the value drivers and market inputs
+    that have a distribution get a sampled value in every run. Provides the lookups of SimulationInput that
+    populate_processes_batch makes, with one entry per run instead of one per design, so that the formulas of all
+    runs are evaluated at once.
+
+    Every value driver and market input is sampled once per run, so all formulas of a run see the same value.
+    """
+
+    def __init__(self, sim_input: SimulationInput, vcs_id: int, design_id: int, runs: int,
+                 rng: np.random.Generator):
+        self.sim_input = sim_input
+        self.runs = runs
+
+        vd_values = sim_input.get_vd_values(design_id)
+        mi_values = sim_input.get_market_values(vcs_id)
+        self._vd_samples = sample_values(vd_values, runs, rng)
+        self._vd_row_values = group_by(vd_values, lambda vd: vd['vcs_row'])
+        self._vd_bindings = get_sampled_bindings(vd_values, self._vd_samples)
+        self._vd_row_bindings = {}
+        self._mi_bindings = get_sampled_bindings(mi_values, sample_values(mi_values, runs, rng))
+
+    def get_sim_data(self, vcs_id: int, design_group_id: int) -> List[dict]:
+        return self.sim_input.get_sim_data(vcs_id, design_group_id)
+
+    def get_mi_bindings(self, vcs_id: int) -> Dict[str, Union[float, np.ndarray]]:
+        return self._mi_bindings
+
+    def get_vd_bindings(self, runs: List[int]) -> Dict[str, Union[float, np.ndarray]]:
+        return self._select(self._vd_bindings, runs)
+
+    def get_vd_row_bindings(self, runs: List[int], vcs_row_id: int) -> Dict[str, Union[float, np.ndarray]]:
+        if vcs_row_id not in self._vd_row_bindings:
+            self._vd_row_bindings[vcs_row_id] = get_sampled_bindings(self._vd_row_values.get(vcs_row_id, []),
+                                                                     self._vd_samples)
+        return self._select(self._vd_row_bindings[vcs_row_id], runs)
+
+    def _select(self, bindings: Dict[str, Union[float, np.ndarray]],
+                runs: List[int]) -> Dict[str, Union[float, np.ndarray]]:
+        rows = np.array(runs, dtype=int)
+        return {name: value[rows] if isinstance(value, np.ndarray) else value for name, value in bindings.items()}
+
+
+def group_by(values: list, key: Callable[[object], Hashable]) -> dict:
+    """
+    Groups the values on key, keeping the order of the values within each group.
+    """
+    groups = {}
+    for value in values:
+        groups.setdefault(key(value), []).append(value)
+    return groups
+
+
+def get_variable_bindings(values) -> dict:
+    """
+    Maps the value driver or market input values to the variable names used in formulas, "name [unit]".
+    The first value is used if there are several values with the same name.
+    """
+    bindings = {}
+    for value in values if values is not None else []:
+        bindings.setdefault(get_variable_name(value), float(value["value"]) if value["value"] is not None
+                            else None)
+    return bindings
+
+
+def get_variable_name(value: dict) -> str:
+    unit = value["unit"] if value["unit"] is not None and value["unit"] != "" else "N/A"
+    return f'{value["name"]} [{unit}]'
+
+
+def get_variable_binding_columns(values_per_design: List[list]) -> Dict[str, np.ndarray]:
+    """
+    Builds the designs x variables matrix of value driver values, as one column per variable name, for batch
+    evaluation of formulas. Designs without a value for a variable get 0.
+    """
+    bindings = [get_variable_bindings(values) for values in values_per_design]
+    names = dict.fromkeys(name for design_bindings in bindings for name in design_bindings)
+    columns = np.array([[design_bindings.get(name, 0) for name in names] for design_bindings in bindings],
+                       dtype=float).reshape(len(bindings), len(names))
+    return matrix_bindings(list(names), columns)
+
+
+def sample_values(values: List[dict], runs: int, rng: np.random.Generator) -> Dict[int, np.ndarray]:
+    """
+    Samples the value drivers or market inputs that have a distribution around their value, all at once.
+
+    :return: The sampled value of each run, keyed on the id of the value driver or market input
+    """
+    uncertain = {}
+    for value in values:
+        if value.get('distribution') is not None and value['value'] is not None:
+            uncertain.setdefault(value['id'], value)
+    ids = sorted(uncertain)  # The order of the rows should not change the samples of a seed
+    samples = sample_distributions([uncertain[i]['distribution'] for i in ids],
+                                   np.array([uncertain[i]['value'] for i in ids], dtype=float),
+                                   np.array([uncertain[i]['spread'] for i in ids], dtype=float), runs, rng)
+    return {i: samples[:, column] for column, i in enumerate(ids)}
+
+
+def get_sampled_bindings(values: List[dict], samples: Dict[int, np.ndarray]) -> Dict[str, Union[float, np.ndarray]]:
+    """
+    As get_variable_bindings, with the sampled values of the value drivers or market inputs that were sampled.
+    """
+    bindings = {}
+    for value in values:
+        if value['id'] in samples:
+            bindings.setdefault(get_variable_name(value), samples[value['id']])
+        else:
+            bindings.setdefault(get_variable_name(value), float(value["value"]) if value["value"] is not None
+                                else None)
+    return bindings
@@ -1,6 +1,6 @@
-from typing import List
+from typing import Dict, List
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, confloat, conint
 from typing import Optional
 import json
 from fastapi import Form
@@ -31,12 +31,127 @@ class NonTechnicalProcess(BaseModel):
     revenue: float
 
 
+class MonteCarloSummary(BaseModel):
+    """
+    The statistics to compute over the runs of a monte carlo simulation. The NPVs of every run are only
+    returned if include_all_npvs is set.
+    """
+    percentiles: List[confloat(ge=0, le=100)] = [5, 50, 95]
+    std: bool = True
+    negative_npv_probability: bool = True
+    histogram_bins: int = 0
+    include_all_npvs: bool = False
+
+
+class NPVHistogram(BaseModel):
+    bin_edges: List[float]
+    counts: List[int]
+
+
+class NPVStatistics(BaseModel):
+    percentiles: Dict[str, List[float]] = {}
+    std: Optional[List[float]] = None
+    negative_npv_probability: Optional[List[float]] = None
+    final_npv_histogram: Optional[NPVHistogram] = None
+
+
+class MonteCarloConvergence(BaseModel):
+    """
+    Runs a monte carlo simulation in batches of batch_size runs, until the confidence interval of the mean final NPV,
+    or of the given percentile of it, is narrower than tolerance on each side. With relative, the tolerance is a
+    fraction of the estimate. The runs in the simulation settings are the upper bound.
+    """
+    tolerance: confloat(gt=0)
+    relative: bool = False
+    percentile: Optional[confloat(gt=0, lt=100)] = None
+    confidence: confloat(gt=0, lt=1) = 0.95
+    batch_size: conint(ge=2) = 50
+
+
+class ConvergenceResult(BaseModel):
+    converged: bool
+    runs: int
+    estimate: Optional[float] = None
+    half_width: Optional[float] = None
+
+
 class Simulation(BaseModel):
     time: List[float]
     mean_NPV: List[float]
     max_NPVs: List[float]
     mean_payback_time: float
-    all_npvs: List[List[float]]
+    all_npvs: Optional[List[List[float]]]
+    statistics: Optional[NPVStatistics] = None
+    convergence: Optional[ConvergenceResult] = None
+    cash_flows: Optional[List[float]] = None
+
+
+class RediscountRequest(BaseModel):
+    """
+    The undiscounted cash flows of a simulation at every timestep, see Simulation.cash_flows, and the discount
+    rates to compute the NPV for.
+    """
+    time: List[float]
+    cash_flows: List[float]
+    discount_rates: List[confloat(gt=-1)]
+
+
+class DiscountedSimulation(BaseModel):
+    discount_rate: float
+    mean_NPV: List[float]
+    max_NPVs: List[float]
+    mean_payback_time: float
+
+
+class DesignSimulation(BaseModel):
+    vcs_id: int
+    design_id: int
+    result: Simulation
+
+
+class ScenarioSimulation(BaseModel):
+    scenario: int
+    results: List[DesignSimulation]
+
+
+class SamplePlan(str, Enum):
+    GRID = 'grid'
+    LATIN_HYPERCUBE = 'latin_hypercube'
+
+
+class ValueDriverRange(BaseModel):
+    """
+    The values of a value driver in a design sweep, from min to max. levels is the number of values in a grid.
+    """
+    vd_id: int
+    min: float
+    max: float
+    levels: conint(ge=1) = 5
+
+
+class DesignSweep(BaseModel):
+    """
+    Virtual designs of a design group, with the value drivers in ranges sampled by plan. A latin hypercube takes
+    samples designs, reproducibly with a seed. The other value drivers keep the values of the base design, or 0.
+    """
+    design_group_id: int
+    ranges: List[ValueDriverRange]
+    plan: SamplePlan = SamplePlan.GRID
+    samples: conint(ge=1) = 100
+    seed: Optional[conint(ge=0)] = None
+    base_design_id: Optional[int] = None
+
+
+class DesignSweepResult(BaseModel):
+    """
+    The results of a design sweep for one vcs, one entry per virtual design. values holds the values of the value
+    drivers in vd_ids of each virtual design.
+    """
+    vcs_id: int
+    vd_ids: List[int]
+    values: List[List[float]]
+    final_NPVs: List[float]
+    payback_times: List[float]
 
 
 class EditSimSettings(BaseModel):
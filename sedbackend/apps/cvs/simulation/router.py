@@ -1,11 +1,12 @@
-from fastapi import Depends, APIRouter
+from fastapi import Depends, APIRouter, Header, Query
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
 from sedbackend.apps.core.authentication.utils import get_current_active_user
 from sedbackend.apps.core.projects.dependencies import SubProjectAccessChecker
 from sedbackend.apps.core.projects.models import AccessLevel
 from sedbackend.apps.cvs.project.router import CVS_APP_SID
 from sedbackend.apps.core.users.models import User
-from sedbackend.apps.cvs.simulation import implementation, models
+from sedbackend.apps.cvs.simulation import implementation, models, encoding
 
 router = APIRouter()
 
@@ -13,12 +14,52 @@ router = APIRouter()
 @router.post(
     '/project/{native_project_id}/simulation/run',
     summary='Run simulation',
+    description='Responds with json by default. Send Accept: application/x-npz to get the results as float64 '
+                'arrays in a NumPy .npz archive instead. Set include_cash_flows to get the undiscounted cash '
+                'flows, which /simulation/rediscount takes to compute the NPV for other discount rates.',
     response_model=List[models.Simulation],
     dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read, CVS_APP_SID))]
 )
 async def run_simulation(sim_settings: models.EditSimSettings, vcs_ids: List[int],
-                         design_group_ids: List[int]) -> List[models.Simulation]:
-    return implementation.run_simulation(sim_settings, vcs_ids, design_group_ids)
+                         design_group_ids: List[int], parallel: Optional[bool] = False,
+                         include_cash_flows: Optional[bool] = False,
+                         accept: Optional[str] = Header(default=None)) -> List[models.Simulation]:
+    results = await implementation.run_simulation(sim_settings, vcs_ids, design_group_ids, parallel,
+                                                  include_cash_flows)
+    if encoding.accepts_npz(accept):
+        return Response(content=encoding.encode_npz(results), media_type=encoding.NPZ_MEDIA_TYPE)
+    return results
+
+
+@router.post(
+    '/project/{native_project_id}/simulation/run/scenarios',
+    summary='Run simulations with several simulation settings',
+    description='Runs /simulation/run for every design with each of the simulation settings in scenarios. The '
+                'project data is loaded once for all scenarios. Responds with the results of each scenario, '
+                'identified by its index in scenarios.',
+    response_model=List[models.ScenarioSimulation],
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def run_scenarios(scenarios: List[models.EditSimSettings], vcs_ids: List[int], design_group_ids: List[int],
+                        parallel: Optional[bool] = False,
+                        include_cash_flows: Optional[bool] = False) -> List[models.ScenarioSimulation]:
+    return await implementation.run_scenarios(scenarios, vcs_ids, design_group_ids, parallel, include_cash_flows)
+
+
+@router.post(
+    '/project/{native_project_id}/simulation/sweep',
+    summary='Simulate virtual designs of a design group',
+    description='Simulates designs of sweep.design_group_id with the value drivers in sweep.ranges sampled on a '
+                'grid or a latin hypercube, without storing the designs. Responds with the sampled values and the '
+                'final NPV and payback time of every virtual design, for each vcs.',
+    response_model=List[models.DesignSweepResult],
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def run_design_sweep(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                           sweep: models.DesignSweep,
+                           parallel: Optional[bool] = False) -> List[models.DesignSweepResult]:
+    return await implementation.run_design_sweep(sim_settings, vcs_ids, sweep, parallel)
+
 
 # Temporary disabled
 ''' 
@@ -42,13 +83,77 @@ async def run_dsm_file_simulation(native_project_id: int, sim_params: models.Fil
 @router.post(
     '/project/{native_project_id}/simulation/run-multiprocessing',
     summary='Run monte carlo simulation with multiprocessing',
+    description='Responds with json by default. Send Accept: application/x-npz to get the results as float64 '
+                'arrays in a NumPy .npz archive instead. Pass a summary to get percentiles, standard deviation, '
+                'the probability of a negative NPV and a histogram of the final NPV computed over the runs; the '
+                'NPVs of every run are then only included if summary.include_all_npvs is set. Pass convergence to '
+                'stop the runs of each design once the confidence interval of the final NPV is within the '
+                'tolerance; sim_settings.runs is then the maximum number of runs. Pass a seed to get reproducible '
+                'results. Value drivers and market inputs with an uncertainty get a sampled value in every run.',
     response_model=List[models.Simulation],
     dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read, CVS_APP_SID))]
 )
 async def run_sim_monte_carlo(sim_settings: models.EditSimSettings, vcs_ids: List[int],
                               design_group_ids: List[int],
-                              normalized_npv: Optional[bool] = False) -> List[models.Simulation]:
-    return implementation.run_sim_monte_carlo(sim_settings, vcs_ids, design_group_ids, normalized_npv)
+                              normalized_npv: Optional[bool] = False,
+                              summary: Optional[models.MonteCarloSummary] = None,
+                              convergence: Optional[models.MonteCarloConvergence] = None,
+                              seed: Optional[int] = Query(default=None, ge=0),
+                              accept: Optional[str] = Header(default=None)) -> List[models.Simulation]:
+    results = await implementation.run_sim_monte_carlo(sim_settings, vcs_ids, design_group_ids, normalized_npv,
+                                                       summary, convergence, seed)
+    if encoding.accepts_npz(accept):
+        return Response(content=encoding.encode_npz(results), media_type=encoding.NPZ_MEDIA_TYPE)
+    return results
+
+
+@router.post(
+    '/project/{native_project_id}/simulation/run/stream',
+    summary='Run simulation and stream the result of each design',
+    description='Responds with newline delimited json, one DesignSimulation per line in the same order as '
+                '/simulation/run. If the simulation fails after the first design, the last line is an error object.',
+    response_class=StreamingResponse,
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def run_simulation_stream(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                                design_group_ids: List[int], parallel: Optional[bool] = False) -> StreamingResponse:
+    lines = await implementation.run_simulation_stream(sim_settings, vcs_ids, design_group_ids, monte_carlo=False,
+                                                       parallel=parallel)
+    return StreamingResponse(lines, media_type='application/x-ndjson')
+
+
+@router.post(
+    '/project/{native_project_id}/simulation/run-multiprocessing/stream',
+    summary='Run monte carlo simulation and stream the result of each design',
+    description='Responds with newline delimited json, one DesignSimulation per line in the same order as '
+                '/simulation/run-multiprocessing. If the simulation fails after the first design, the last line is '
+                'an error object.',
+    response_class=StreamingResponse,
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def run_sim_monte_carlo_stream(sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                                     design_group_ids: List[int],
+                                     normalized_npv: Optional[bool] = False,
+                                     summary: Optional[models.MonteCarloSummary] = None,
+                                     convergence: Optional[models.MonteCarloConvergence] = None,
+                                     seed: Optional[int] = Query(default=None, ge=0)) -> StreamingResponse:
+    lines = await implementation.run_simulation_stream(sim_settings, vcs_ids, design_group_ids, monte_carlo=True,
+                                                       normalized_npv=normalized_npv, summary=summary,
+                                                       convergence=convergence, seed=seed)
+    return StreamingResponse(lines, media_type='application/x-ndjson')
+
+
+@router.post(
+    '/project/{native_project_id}/simulation/rediscount',
+    summary='Compute the NPV of a simulation for other discount rates',
+    description='Takes the time and cash_flows of a result of /simulation/run with include_cash_flows, and responds '
+                'with the NPV, max NPV and payback time for each discount rate, without running the simulation '
+                'again.',
+    response_model=List[models.DiscountedSimulation],
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def rediscount_simulation(request: models.RediscountRequest) -> List[models.DiscountedSimulation]:
+    return implementation.rediscount_simulation(request)
 
 
 @router.get(
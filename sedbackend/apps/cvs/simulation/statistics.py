@@ -0,0 +1,196 @@
+import math
+import os
+from statistics import NormalDist
+from typing import List, Tuple
+
+import numpy as np
+
+from sedbackend.apps.cvs.simulation import models
+
+# Number of points per timestep kept by the percentile sketch of a monte carlo simulation
+SKETCH_SIZE = int(os.environ.get('SIMULATION_SKETCH_SIZE', 200))
+
+
+def confidence_half_width(final_npvs, convergence: models.MonteCarloConvergence) -> Tuple[float, float]:
+    """
+    Estimates the mean, or the percentile, of the final NPV and the half width of its confidence interval.
+    The interval of the mean uses the normal approximation, the interval of a percentile the order statistics
+    that bound it. The half width is infinite while there are too few runs to tell.
+
+    :param final_npvs: The final NPV of each run
+    :param convergence: The statistic and confidence level
+    :return: The estimate and the half width
+    """
+    npvs = np.sort(np.asarray(final_npvs, dtype=np.float64))
+    n = len(npvs)
+    if n == 0:
+        return math.nan, math.inf
+
+    z = NormalDist().inv_cdf(0.5 + convergence.confidence / 2)
+
+    if convergence.percentile is None:
+        estimate = float(npvs.mean())
+        if n < 2:
+            return estimate, math.inf
+        return estimate, float(z * npvs.std(ddof=1) / math.sqrt(n))
+
+    p = convergence.percentile / 100
+    estimate = float(np.percentile(npvs, convergence.percentile))
+    spread = z * math.sqrt(n * p * (1 - p))
+    lower, upper = math.floor(n * p - spread), math.ceil(n * p + spread)
+    if lower < 0 or upper > n - 1:
+        return estimate, math.inf
+    return estimate, float((npvs[upper] - npvs[lower]) / 2)
+
+
+class QuantileSketch(object):
+    """
+    Mergeable summary of the distribution of the NPV at every timestep, with at most size points per timestep.
+    Up to size runs the points are the NPVs themselves, so the percentiles are exact. Beyond that the points are
+    compressed to size equally weighted quantiles of each timestep, which are weighted with the number of runs they
+    stand for (in the spirit of t-digest).
+    """
+
+    def __init__(self, size: int = SKETCH_SIZE):
+        self.size = size
+        self.values = None  # points x time
+        self.weights = np.zeros(0)
+
+    def add(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.values = values if self.values is None else np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, weights])
+        if len(self.weights) > self.size:
+            self._compress()
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.values is not None:
+            self.add(other.values, other.weights)
+
+    def percentiles(self, q: List[float]) -> np.ndarray:
+        """
+        The percentiles q of every timestep, len(q) x time. Interpolates linearly between the points, as
+        numpy.percentile does.
+        """
+        targets = np.asarray(q, dtype=np.float64) / 100 * (self.weights.sum() - 1)
+        return np.array([self._interpolate(column, targets) for column in self.values.T]).T
+
+    def _compress(self):
+        weight = self.weights.sum() / self.size
+        # Each new point is taken at the rank it stands for, see _interpolate
+        targets = (np.arange(self.size) + 0.5) * weight - 0.5
+        self.values = np.array([self._interpolate(column, targets) for column in self.values.T]).T
+        self.weights = np.full(self.size, weight)
+
+    def _interpolate(self, column: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        order = np.argsort(column, kind='stable')
+        weights = self.weights[order]
+        # The rank of each point is the middle of the runs it stands for, which is its index for single runs
+        ranks = np.cumsum(weights) - (weights + 1) / 2
+        return np.interp(targets, ranks, column[order])
+
+
+class NPVAccumulator(object):
+    """
+    Aggregates the NPVs of the runs of a monte carlo simulation without keeping them, so that the memory does not
+    grow with the number of runs. The mean and variance of every timestep are updated with Welford's algorithm and
+    the percentiles with a QuantileSketch. Accumulators of chunks of runs can be merged in any grouping.
+
+    Only the final NPV of every run is kept, since it is part of the results. The NPVs of every run are also kept
+    if keep_npvs is set.
+    """
+
+    def __init__(self, keep_npvs: bool = False, sketch_size: int = SKETCH_SIZE):
+        self.count = 0
+        self.time = None
+        self.mean = None
+        self.m2 = None
+        self.negative = None
+        self.final_npvs = []
+        self.sketch = QuantileSketch(sketch_size)
+        self.npvs = [] if keep_npvs else None
+
+    def add(self, time: List[float], npvs):
+        """
+        Adds a chunk of runs with the same timesteps.
+
+        :param time: The timesteps of the runs
+        :param npvs: The NPV of each run and timestep, runs x time
+        """
+        npvs = np.asarray(npvs, dtype=np.float64)
+        if npvs.ndim != 2 or npvs.shape[0] == 0:
+            return
+
+        chunk = NPVAccumulator(self.npvs is not None, self.sketch.size)
+        chunk.count = npvs.shape[0]
+        chunk.time = list(time)
+        chunk.mean = npvs.mean(axis=0)
+        chunk.m2 = ((npvs - chunk.mean) ** 2).sum(axis=0)
+        chunk.negative = (npvs < 0).sum(axis=0)
+        chunk.final_npvs = npvs[:, -1].tolist()
+        chunk.sketch.add(npvs)
+        if chunk.npvs is not None:
+            chunk.npvs = npvs.tolist()
+        self.merge(chunk)
+
+    def merge(self, other: 'NPVAccumulator'):
+        """
+        Adds the runs of another accumulator, with the parallel variant of Welford's algorithm by Chan et al.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.time, self.mean, self.m2, self.negative = other.time, other.mean, other.m2, other.negative
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * other.count / count
+            self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+            self.negative = self.negative + other.negative
+
+        self.count += other.count
+        self.final_npvs.extend(other.final_npvs)
+        self.sketch.merge(other.sketch)
+        if self.npvs is not None and other.npvs is not None:
+            self.npvs.extend(other.npvs)
+
+    def mean_npv(self) -> List[float]:
+        return self.mean.tolist()
+
+    def normalized_npv(self) -> List[float]:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((self.mean - self.mean.min()) / (self.mean.max() - self.mean.min())).tolist()
+
+    def mean_payback_time(self) -> float:
+        """
+        The first timestep where the mean NPV is positive, or -1 if it never is.
+        """
+        positive = np.flatnonzero(self.mean > 0)
+        return self.time[positive[0]] if len(positive) > 0 else -1
+
+    def summarize(self, summary: models.MonteCarloSummary) -> models.NPVStatistics:
+        """
+        Computes the requested statistics for every timestep. The percentiles are exact up to the size of the
+        sketch.
+        """
+        if self.count == 0:
+            return models.NPVStatistics()
+
+        statistics = models.NPVStatistics()
+
+        if summary.percentiles:
+            values = self.sketch.percentiles(summary.percentiles)
+            statistics.percentiles = {f'p{q:g}': row.tolist() for q, row in zip(summary.percentiles, values)}
+
+        if summary.std:
+            statistics.std = np.sqrt(self.m2 / self.count).tolist()
+
+        if summary.negative_npv_probability:
+            statistics.negative_npv_probability = (self.negative / self.count).tolist()
+
+        if summary.histogram_bins > 0:
+            counts, bin_edges = np.histogram(self.final_npvs, bins=summary.histogram_bins)
+            statistics.final_npv_histogram = models.NPVHistogram(bin_edges=bin_edges.tolist(), counts=counts.tolist())
+
+        return statistics
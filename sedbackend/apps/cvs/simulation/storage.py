@@ -10,17 +10,31 @@ from fastapi.logger import logger
 from desim import interface as des
 from desim.data import NonTechCost, TimeFormat
 from desim.simulation import Process
+import copy
+import functools
+import math
+import numpy as np
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 
-from typing import List
-from sedbackend.apps.cvs.design.models import ValueDriverDesignValue
-from sedbackend.apps.cvs.design.storage import get_all_designs
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from sedbackend.apps.cvs.design.models import Design, ValueDriverDesignValue
+from sedbackend.apps.cvs.design.storage import get_all_designs, get_designs_by_id
 
 from mysqlsb import FetchType, MySQLStatementBuilder
 
 from sedbackend.libs.formula_parser.parser import NumericStringParser
+from sedbackend.libs.formula_parser.compiler import CompiledFormula, compile_formula
 from sedbackend.libs.formula_parser import expressions as expr
-from sedbackend.apps.cvs.simulation import models
+from sedbackend.apps.cvs.simulation import models, sweep as sweep_plan
+from sedbackend.apps.cvs.simulation.cache import hash_inputs, simulation_cache
+from sedbackend.apps.cvs.simulation.cashflow import get_cash_flows, is_deterministic, run_cash_flow_simulation
+from sedbackend.apps.cvs.simulation.dsm import create_dsm
+from sedbackend.apps.cvs.simulation.executor import request_pool
+from sedbackend.apps.cvs.simulation.inputs import SampledInput, SimulationInput
+from sedbackend.apps.cvs.simulation.statistics import NPVAccumulator, SKETCH_SIZE, confidence_half_width
 import sedbackend.apps.cvs.simulation.exceptions as e
 from sedbackend.apps.cvs.vcs import storage as vcs_storage
 
@@ -29,6 +43,9 @@ SIM_SETTINGS_COLUMNS = ['project', 'time_unit', 'flow_process', 'flow_start_time
                         'interarrival_time', 'start_time', 'end_time', 'discount_rate', 'non_tech_add', 'monte_carlo',
                         'runs']
 
+# Number of runs of a monte carlo simulation that a worker process runs and aggregates at a time
+MONTE_CARLO_CHUNK_SIZE = int(os.environ.get('SIMULATION_CHUNK_SIZE', 10))
+
 TIME_FORMAT_DICT = dict({
     'year': TimeFormat.YEAR,
     'month': TimeFormat.MONTH,
@@ -83,6 +100,9 @@ def run_sim_with_dsm_file(db_connection: PooledMySQLConnection, user_id: int, pr
     vcs_ids = [int(id) for id in sim_params.vcs_ids.split(',')]
     design_ids = [int(id) for id in sim_params.design_ids.split(',')]
 
+    if len(design_ids) == 0:
+        raise e.DesignIdsNotFoundException
+
     interarrival = sim_params.interarrival_time
     flow_time = sim_params.flow_time
     runtime = sim_params.end_time
@@ -90,52 +110,162 @@ def run_sim_with_dsm_file(db_connection: PooledMySQLConnection, user_id: int, pr
     discount_rate = sim_params.discount_rate
     process = sim_params.flow_process
     time_unit = TIME_FORMAT_DICT.get(sim_params.time_unit)
-    process = sim_params.flow_process
+
+    designs = get_designs_by_id(db_connection, design_ids)
+    sim_input = get_simulation_input(db_connection, vcs_ids, list(dict.fromkeys(design.design_group_id
+                                                                               for design in designs)), designs)
+    formulas = {}  # Compiled formulas, shared by all designs
 
     design_results = []
     for vcs_id in vcs_ids:
-        res = get_sim_data(db_connection, vcs_id)
-        if not check_entity_rate(res, process):
-            raise e.RateWrongOrderException
+        for design in designs:
+            sim_data = sim_input.get_sim_data(vcs_id, design.design_group_id)
+            if not check_entity_rate(sim_data, process):
+                raise e.RateWrongOrderException
 
-        if sim_params.design_ids is None or []:
-            raise e.DesignIdsNotFoundException
+            processes, non_tech_processes = populate_processes(non_tech_add, sim_input, vcs_id, design.id, formulas)
+            design_results.append(run_des_simulation(flow_time, interarrival, process, processes, non_tech_processes,
+                                                     non_tech_add, dsm, time_unit, discount_rate, runtime))
 
-        for design_id in design_ids:
-            processes, non_tech_processes = populate_processes(
-                non_tech_add, res, db_connection, design_id)
-            sim = des.Des()
+    return design_results
 
-            try:
-                results = sim.run_simulation(flow_time, interarrival, process, processes, non_tech_processes,
-                                             non_tech_add, dsm, time_unit,
-                                             discount_rate, runtime)
 
-            except Exception as exc:
-                logger.debug(f'{exc.__class__}, {exc}')
-                print(f'Sim failed {exc.__class__}, {exc}')
-                raise e.SimulationFailedException
+def run_simulation(db_connection: PooledMySQLConnection, sim_settings: models.EditSimSettings,
+                   vcs_ids: List[int],
+                   design_group_ids: List[int], parallel: bool = False,
+                   on_result: Callable[[int, int, models.Simulation], None] = None,
+                   include_cash_flows: bool = False) -> List[models.Simulation]:
+    """
+    Simulates every design in the design groups, for each of the value chains. The results are ordered by vcs,
+    design group and design. With parallel the simulations are prepared first and then run in worker processes.
+    on_result is called with the vcs id, design id and result of each design, in the same order.
+    With include_cash_flows the undiscounted cash flows are kept in the results, see cashflow.rediscount.
+    """
+    if not check_sim_settings(sim_settings):
+        raise e.BadlyFormattedSettingsException
 
-            design_res = models.Simulation(
-                time=results.timesteps[-1],
-                mean_NPV=results.mean_npv(),
-                max_NPVs=results.all_max_npv(),
-                mean_payback_time=results.mean_npv_payback_time(),
-                all_npvs=results.npvs
-            )
+    sim_input = get_simulation_input(db_connection, vcs_ids, design_group_ids)
 
-            design_results.append(design_res)
+    cache_key = get_simulation_cache_key(sim_input, sim_settings, vcs_ids, design_group_ids, include_cash_flows)
+    cached = simulation_cache.get(cache_key)
+    if cached is not None:
+        logger.debug('Returning cached results')
+        job_designs, design_results = cached
+        return collect_results(design_results, job_designs, on_result)
 
+    jobs, job_designs = get_simulation_jobs(sim_input, sim_settings, vcs_ids, design_group_ids, include_cash_flows)
+    design_results = collect_results(run_des_simulations(jobs, parallel), job_designs, on_result)
+
+    simulation_cache.put(cache_key, (job_designs, design_results))
+
+    logger.debug('Returning the results')
     return design_results
 
 
-def run_simulation(db_connection: PooledMySQLConnection, sim_settings: models.EditSimSettings,
-                   vcs_ids: List[int],
-                   design_group_ids: List[int]) -> List[models.Simulation]:
-    design_results = []
+def run_scenarios(db_connection: PooledMySQLConnection, scenarios: List[models.EditSimSettings], vcs_ids: List[int],
+                  design_group_ids: List[int], parallel: bool = False,
+                  include_cash_flows: bool = False) -> List[models.ScenarioSimulation]:
+    """
+    Simulates every design in the design groups, for each of the value chains, with each of the simulation
+    settings. The simulation data is fetched and the formulas are compiled once for all scenarios, and the
+    simulations of all scenarios that are not cached run together, in worker processes with parallel.
+    """
+    if any(not check_sim_settings(sim_settings) for sim_settings in scenarios):
+        raise e.BadlyFormattedSettingsException
 
+    sim_input = get_simulation_input(db_connection, vcs_ids, design_group_ids)
+    formulas = {}  # Compiled formulas, shared by all scenarios
+
+    scenario_results = [None] * len(scenarios)
+    cache_keys = [get_simulation_cache_key(sim_input, sim_settings, vcs_ids, design_group_ids, include_cash_flows)
+                  for sim_settings in scenarios]
+    jobs, job_designs, job_scenarios = [], [], []
+    for index, (sim_settings, cache_key) in enumerate(zip(scenarios, cache_keys)):
+        cached = simulation_cache.get(cache_key)
+        if cached is not None:
+            scenario_results[index] = cached
+            continue
+        scenario_jobs, designs = get_simulation_jobs(sim_input, sim_settings, vcs_ids, design_group_ids,
+                                                     include_cash_flows, formulas)
+        scenario_results[index] = (designs, [])
+        jobs.extend(scenario_jobs)
+        job_designs.extend(designs)
+        job_scenarios.extend([index] * len(scenario_jobs))
+
+    for index, result in zip(job_scenarios, run_des_simulations(jobs, parallel)):
+        scenario_results[index][1].append(result)
+
+    for index in set(job_scenarios):
+        simulation_cache.put(cache_keys[index], scenario_results[index])
+
+    return [models.ScenarioSimulation(
+        scenario=index,
+        results=[models.DesignSimulation(vcs_id=vcs_id, design_id=design_id, result=result)
+                 for (vcs_id, design_id), result in zip(designs, results)]
+    ) for index, (designs, results) in enumerate(scenario_results)]
+
+
+def run_design_sweep(db_connection: PooledMySQLConnection, sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                     sweep: models.DesignSweep, parallel: bool = False) -> List[models.DesignSweepResult]:
+    """
+    Simulates virtual designs of the design group, for each of the value chains, without storing them. The values
+    of the swept value drivers are sampled with the sample plan of the sweep, and the formulas are evaluated once
+    for all virtual designs before the simulations run, in worker processes with parallel.
+    """
     if not check_sim_settings(sim_settings):
         raise e.BadlyFormattedSettingsException
+
+    samples = sweep_plan.create_samples(sweep)
+    vd_ids = [vd_range.vd_id for vd_range in sweep.ranges]
+
+    base_values = {}
+    if sweep.base_design_id is not None:
+        base_values = {vd['id']: vd['value'] for vd in get_all_vd_design_values(db_connection,
+                                                                                [sweep.base_design_id])}
+
+    designs, vd_design_values = sweep_plan.create_virtual_designs(
+        sweep.design_group_id, get_design_group_vd_rows(db_connection, sweep.design_group_id), vd_ids, samples,
+        base_values)
+    sim_input = SimulationInput(
+        sim_data=get_all_sim_data(db_connection, vcs_ids, [sweep.design_group_id]),
+        market_values=get_all_market_values(db_connection, vcs_ids),
+        designs=designs,
+        vd_design_values=vd_design_values,
+        bpmn_edges=get_all_bpmn_edges(db_connection, vcs_ids)
+    )
+
+    jobs, job_designs = get_simulation_jobs(sim_input, sim_settings, vcs_ids, [sweep.design_group_id])
+    sweep_results = {vcs_id: models.DesignSweepResult(vcs_id=vcs_id, vd_ids=vd_ids, values=samples.tolist(),
+                                                      final_NPVs=[], payback_times=[]) for vcs_id in vcs_ids}
+    for (vcs_id, _), result in zip(job_designs, run_des_simulations(jobs, parallel)):
+        sweep_results[vcs_id].final_NPVs.append(result.mean_NPV[-1])
+        sweep_results[vcs_id].payback_times.append(result.mean_payback_time)
+
+    return list(sweep_results.values())
+
+
+def get_simulation_cache_key(sim_input: SimulationInput, sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                             design_group_ids: List[int], include_cash_flows: bool) -> str:
+    # The simulation is deterministic, so the results only depend on the inputs
+    return hash_inputs('run_simulation', sim_settings, vcs_ids, design_group_ids, include_cash_flows,
+                       sim_input.sim_data,
+                       sim_input.market_values,
+                       [(design.id, design.design_group_id) for design in sim_input.designs],
+                       sim_input.vd_design_values,
+                       sim_input.bpmn_edges)
+
+
+def get_simulation_jobs(sim_input: SimulationInput, sim_settings: models.EditSimSettings, vcs_ids: List[int],
+                        design_group_ids: List[int], include_cash_flows: bool = False,
+                        formulas: dict = None) -> Tuple[List[tuple], List[Tuple[int, int]]]:
+    """
+    Prepares the simulation of every design with the settings.
+
+    :return: The arguments of run_des_simulation for each design, and the vcs and design id of each design
+    """
+    jobs = []
+    job_designs = []
+
     interarrival = sim_settings.interarrival_time
     flow_time = sim_settings.flow_time
     runtime = sim_settings.end_time - sim_settings.start_time
@@ -144,67 +274,95 @@ def run_simulation(db_connection: PooledMySQLConnection, sim_settings: models.Ed
     process = sim_settings.flow_process
     time_unit = TIME_FORMAT_DICT.get(sim_settings.time_unit)
 
-    all_sim_data = get_all_sim_data(db_connection, vcs_ids, design_group_ids)
+    for vcs_id, design, processes, non_tech_processes in prepare_simulations(sim_input, vcs_ids, design_group_ids,
+                                                                             non_tech_add, process, formulas):
+        dsm = sim_input.get_dsm(vcs_id, processes)
+        jobs.append((flow_time, interarrival, process, processes, non_tech_processes, non_tech_add, dsm,
+                     time_unit, discount_rate, runtime, include_cash_flows))
+        job_designs.append((vcs_id, design))
 
-    all_market_values = get_all_market_values(db_connection, vcs_ids)
+    return jobs, job_designs
 
-    all_designs = get_all_designs(db_connection, design_group_ids)
 
-    all_vd_design_values = get_all_vd_design_values(db_connection, [design.id for design in all_designs])
+def run_des_simulations(jobs: List[tuple], parallel: bool = False) -> Iterator[models.Simulation]:
+    """
+    Runs the simulations and yields the results in the same order as the jobs. With parallel the simulations
+    run in the pool of the request, see request_pool.
+    """
+    with request_pool(len(jobs) if parallel else 1) as pool:
+        if pool is None:
+            for job in jobs:
+                yield run_des_simulation(*job)
+            return
 
-    for vcs_id in vcs_ids:
-        market_values = [mi for mi in all_market_values if mi['vcs'] == vcs_id]
-        for design_group_id in design_group_ids:
-            sim_data = [sd for sd in all_sim_data if sd['vcs'] == vcs_id and sd['design_group'] == design_group_id]
-            if sim_data is None or sim_data == []:
-                raise e.VcsFailedException
+        futures = [pool.submit(run_des_simulation, *job) for job in jobs]
+        for future in futures:
+            yield future.result()
 
-            if not check_entity_rate(sim_data, process):
-                raise e.RateWrongOrderException
 
-            designs = [design.id for design in all_designs if design.design_group_id == design_group_id]
-
-            if designs is None or []:
-                raise e.DesignIdsNotFoundException
-
-            for design in designs:
-                vd_values = [vd for vd in all_vd_design_values if vd['design'] == design]
-                processes, non_tech_processes = populate_processes(non_tech_add, sim_data, design, market_values,
-                                                                   vd_values)
-
-                dsm = create_simple_dsm(processes)  # TODO Change to using BPMN
-
-                sim = des.Des()
-
-                try:
-                    results = sim.run_simulation(flow_time, interarrival, process, processes, non_tech_processes,
-                                                 non_tech_add, dsm, time_unit,
-                                                 discount_rate, runtime)
+def collect_results(results: Iterable[models.Simulation], designs: List[Tuple[int, int]],
+                    on_result: Callable[[int, int, models.Simulation], None] = None) -> List[models.Simulation]:
+    design_results = []
+    for (vcs_id, design_id), result in zip(designs, results):
+        if on_result is not None:
+            on_result(vcs_id, design_id, result)
+        design_results.append(result)
+    return design_results
 
-                except Exception as exc:
-                    tb = sys.exc_info()[2]
-                    logger.debug(
-                        f'{exc.__class__}, {exc}, {exc.with_traceback(tb)}')
-                    print(f'{exc.__class__}, {exc}')
-                    raise e.SimulationFailedException
 
-                design_res = models.Simulation(
-                    time=results.timesteps[-1],
-                    mean_NPV=results.mean_npv(),
-                    max_NPVs=results.all_max_npv(),
-                    mean_payback_time=results.mean_npv_payback_time(),
-                    all_npvs=results.npvs
-                )
+def run_des_simulation(flow_time: float, interarrival: float, process: str, processes: List[Process],
+                       non_tech_processes: List[models.NonTechnicalProcess], non_tech_add: NonTechCost, dsm: dict,
+                       time_unit: TimeFormat, discount_rate: float, runtime: float,
+                       include_cash_flows: bool = False) -> models.Simulation:
+    """
+    Runs a single simulation of one design. Independent of the database, so it can run in another process.
+    Simulations that follow a single path through the processes are computed from their cash flows, without desim.
+    """
+    sim = des.Des()
 
-                design_results.append(design_res)
-    logger.debug('Returning the results')
-    return design_results
+    try:
+        if is_deterministic(processes, process, dsm, runtime, time_unit, non_tech_add):
+            return run_cash_flow_simulation(flow_time, interarrival, process, processes, non_tech_processes,
+                                            non_tech_add, dsm, time_unit, discount_rate, runtime,
+                                            include_cash_flows)
+
+        results = sim.run_simulation(flow_time, interarrival, process, processes, non_tech_processes,
+                                     non_tech_add, dsm, time_unit,
+                                     discount_rate, runtime)
+
+    except Exception as exc:
+        tb = sys.exc_info()[2]
+        logger.debug(
+            f'{exc.__class__}, {exc}, {exc.with_traceback(tb)}')
+        raise e.SimulationFailedException
+
+    return models.Simulation(
+        time=results.timesteps[-1],
+        mean_NPV=results.mean_npv(),
+        max_NPVs=results.all_max_npv(),
+        mean_payback_time=results.mean_npv_payback_time(),
+        all_npvs=results.npvs,
+        cash_flows=get_cash_flows(results.costs[-1], results.revenues[-1]).tolist() if include_cash_flows else None
+    )
 
 
 def run_sim_monte_carlo(db_connection: PooledMySQLConnection, simSettings: models.EditSimSettings, vcs_ids: List[int],
-                        design_group_ids: List[int], normalized_npv: bool = False) -> List[
+                        design_group_ids: List[int], normalized_npv: bool = False,
+                        on_result: Callable[[int, int, models.Simulation], None] = None,
+                        summary: models.MonteCarloSummary = None,
+                        convergence: models.MonteCarloConvergence = None, seed: int = None) -> List[
     models.Simulation]:
+    """
+    Runs a monte carlo simulation of every design. With a summary, the requested statistics are computed over the
+    runs and the NPVs of the runs are left out unless summary.include_all_npvs is set. With convergence, the runs
+    of each design stop as soon as the final NPV has converged. Value drivers and market inputs with a distribution
+    get a sampled value in every run, see sample_monte_carlo_args.
+
+    The runs are aggregated in chunks as they finish, so unless the NPVs of the runs are returned the memory does
+    not depend on the number of runs. With a seed the results are reproducible, and therefore cached.
+    """
     design_results = []
+    job_designs = []
 
     if not check_sim_settings(simSettings):
         raise e.BadlyFormattedSettingsException
@@ -217,137 +375,282 @@ def run_sim_monte_carlo(db_connection: PooledMySQLConnection, simSettings: model
     process = simSettings.flow_process
     time_unit = TIME_FORMAT_DICT.get(simSettings.time_unit)
     runs = simSettings.runs
+    keep_npvs = summary is None or summary.include_all_npvs
+
+    sim_input = get_simulation_input(db_connection, vcs_ids, design_group_ids)
+
+    cache_key = None
+    if seed is not None:
+        cache_key = hash_inputs('run_sim_monte_carlo', simSettings, vcs_ids, design_group_ids, normalized_npv,
+                                summary, convergence, seed, MONTE_CARLO_CHUNK_SIZE, SKETCH_SIZE, sim_input.sim_data,
+                                sim_input.market_values,
+                                [(design.id, design.design_group_id) for design in sim_input.designs],
+                                sim_input.vd_design_values, sim_input.bpmn_edges)
+        cached = simulation_cache.get(cache_key)
+        if cached is not None:
+            logger.debug('Returning cached results')
+            job_designs, design_results = cached
+            return collect_results(design_results, job_designs, on_result)
+
+    formulas = {}  # Compiled formulas, shared by all designs and runs
+    with request_pool(math.ceil(runs / MONTE_CARLO_CHUNK_SIZE)) as pool:
+        for vcs_id, design, processes, non_tech_processes in prepare_simulations(sim_input, vcs_ids,
+                                                                                 design_group_ids, non_tech_add,
+                                                                                 process, formulas):
+            dsm = sim_input.get_dsm(vcs_id, processes)
+            args = (flow_time, interarrival, process, processes, non_tech_processes, non_tech_add, dsm, time_unit,
+                    discount_rate, runtime)
+            # Every design gets its own stream, so its results do not depend on the other designs of the request
+            seed_sequence = np.random.SeedSequence(seed, spawn_key=(vcs_id, design)) if seed is not None \
+                else np.random.SeedSequence()
+            sample_args = None
+            if sim_input.is_uncertain(vcs_id, design):
+                sample_args = functools.partial(sample_monte_carlo_args, sim_input, vcs_id, design, args, formulas)
 
-    all_sim_data = get_all_sim_data(db_connection, vcs_ids, design_group_ids)
+            try:
+                results, converged = run_chunked_monte_carlo(args, runs, seed_sequence, keep_npvs, convergence,
+                                                             sample_args, pool)
+            except e.FormulaEvalException:
+                raise
+            except Exception as exc:
+                logger.debug(f'{exc.__class__}, {exc}')
+                raise e.SimulationFailedException
 
-    all_market_values = get_all_market_values(db_connection, vcs_ids)
+            sim_res = models.Simulation(
+                time=results.time,
+                mean_NPV=results.normalized_npv() if normalized_npv else results.mean_npv(),
+                max_NPVs=results.final_npvs,
+                mean_payback_time=results.mean_payback_time(),
+                all_npvs=results.npvs,
+                statistics=results.summarize(summary) if summary is not None else None,
+                convergence=converged
+            )
+            if on_result is not None:
+                on_result(vcs_id, design, sim_res)
+            design_results.append(sim_res)
+            job_designs.append((vcs_id, design))
+
+    if cache_key is not None:
+        simulation_cache.put(cache_key, (job_designs, design_results))
 
-    all_designs = get_all_designs(db_connection, design_group_ids)
+    return design_results
 
-    all_vd_design_values = get_all_vd_design_values(db_connection, [design.id for design in all_designs])
+
+def run_chunked_monte_carlo(args: tuple, runs: int, seed_sequence: np.random.SeedSequence, keep_npvs: bool = False,
+                            convergence: models.MonteCarloConvergence = None,
+                            sample_args: Callable[[int, np.random.Generator], List[tuple]] = None,
+                            pool: ProcessPoolExecutor = None) -> Tuple[
+    NPVAccumulator, Optional[models.ConvergenceResult]]:
+    """
+    Runs the monte carlo simulation of one design in chunks of MONTE_CARLO_CHUNK_SIZE runs in the pool of the
+    request, or one after the other without a pool, and merges the aggregates of the chunks in order as they finish.
+    Each chunk has its own random stream spawned from seed_sequence, so the results only depend on the seed and not
+    on the number of workers.
+
+    With convergence, the chunks are run in batches of convergence.batch_size runs, until the confidence interval
+    of the final NPV is within the tolerance or the maximum number of runs is reached.
+
+    :param args: The arguments of des.Des.help_run_simulation
+    :param sample_args: Creates the arguments of each run of a batch, from a random generator spawned from
+        seed_sequence. All runs use args if it is not given
+    """
+    batch_size = convergence.batch_size if convergence is not None else runs
+    results = NPVAccumulator(keep_npvs)
+    estimate, half_width, converged = math.nan, math.inf, False
+
+    while results.count < runs and not converged:
+        batch = min(batch_size, runs - results.count)
+        if sample_args is None:
+            run_args = [args] * batch  # Pickled once per chunk, since the runs share the same tuple
+        else:
+            run_args = sample_args(batch, np.random.default_rng(seed_sequence.spawn(1)[0]))
+        chunks = [run_args[start:start + MONTE_CARLO_CHUNK_SIZE]
+                  for start in range(0, batch, MONTE_CARLO_CHUNK_SIZE)]
+        seeds = seed_sequence.spawn(len(chunks))
+        chunk_jobs = [(chunk_seed, chunk_args, keep_npvs) for chunk_seed, chunk_args in zip(seeds, chunks)]
+        for chunk in (pool.map if pool is not None else map)(run_monte_carlo_chunk, chunk_jobs):
+            results.merge(chunk)
+
+        if convergence is not None:
+            estimate, half_width = confidence_half_width(results.final_npvs, convergence)
+            tolerance = convergence.tolerance * abs(estimate) if convergence.relative else convergence.tolerance
+            converged = half_width <= tolerance
+
+    if convergence is None:
+        return results, None
+
+    logger.debug(f'Monte carlo simulation {"converged" if converged else "did not converge"} after {results.count} '
+                 f'runs')
+    return results, models.ConvergenceResult(
+        converged=converged, runs=results.count, estimate=None if math.isnan(estimate) else estimate,
+        half_width=None if math.isinf(half_width) else half_width)
+
+
+def run_monte_carlo_chunk(chunk: Tuple[np.random.SeedSequence, List[tuple], bool]) -> NPVAccumulator:
+    """
+    Runs a chunk of the runs of a monte carlo simulation in a worker process and aggregates them. desim draws from
+    the global random generators of numpy and random, so they are seeded from the stream of the chunk. Every run
+    gets its own copy of the processes, since desim keeps state in them.
+    """
+    seed_sequence, run_args, keep_npvs = chunk
+    state = seed_sequence.generate_state(5)
+    np.random.seed(state[:4])
+    random.seed(int(state[4]))
+
+    sim = des.Des()
+    time, npvs = None, []
+    for args in run_args:
+        time, npv, _, _ = sim.help_run_simulation(*copy.deepcopy(args))
+        npvs.append(npv)
+
+    results = NPVAccumulator(keep_npvs)
+    results.add(time, npvs)
+    return results
+
+
+def sample_monte_carlo_args(sim_input: SimulationInput, vcs_id: int, design_id: int, args: tuple, formulas: dict,
+                            runs: int, rng: np.random.Generator) -> List[tuple]:
+    """
+    Creates the arguments of des.Des.help_run_simulation for runs runs of a design with uncertain value drivers or
+    market inputs. The values are sampled for all runs at once and every formula is evaluated once for all runs.
+
+    :param args: The arguments of the design with the values of the value drivers and market inputs
+    """
+    non_tech_add = args[5]
+    design_group_id = sim_input.get_design(design_id).design_group_id
+    populated = populate_processes_batch(non_tech_add, SampledInput(sim_input, vcs_id, design_id, runs, rng), vcs_id,
+                                         design_group_id, list(range(runs)), formulas)
+    return [args[:3] + (processes, non_tech_processes) + args[5:] for processes, non_tech_processes in populated]
+
+
+def get_simulation_input(db_connection: PooledMySQLConnection, vcs_ids: List[int], design_group_ids: List[int],
+                         designs: List[Design] = None) -> SimulationInput:
+    """
+    Fetches everything a simulation of the value chains and design groups needs, with one query per table.
+    All designs of the design groups are simulated unless designs is given.
+    """
+    if designs is None:
+        designs = get_all_designs(db_connection, design_group_ids)
+
+    return SimulationInput(
+        sim_data=get_all_sim_data(db_connection, vcs_ids, design_group_ids),
+        market_values=get_all_market_values(db_connection, vcs_ids),
+        designs=designs,
+        vd_design_values=get_all_vd_design_values(db_connection, [design.id for design in designs]),
+        bpmn_edges=get_all_bpmn_edges(db_connection, vcs_ids)
+    )
+
+
+def prepare_simulations(sim_input: SimulationInput, vcs_ids: List[int], design_group_ids: List[int],
+                        non_tech_add: NonTechCost, process: str,
+                        formulas: dict = None) -> Iterator[Tuple[int, int, List[Process],
+                                                                 List[models.NonTechnicalProcess]]]:
+    """
+    Creates the processes of every design in the design groups, for each of the value chains. Yields the vcs id,
+    design id and the technical and non-technical processes, ordered by vcs, design group and design.
+    """
+    if formulas is None:
+        formulas = {}  # Compiled formulas, shared by all designs
 
     for vcs_id in vcs_ids:
-        market_values = [mi for mi in all_market_values if mi['vcs'] == vcs_id]
         for design_group_id in design_group_ids:
-            sim_data = [sd for sd in all_sim_data if sd['vcs'] == vcs_id and sd['design_group'] == design_group_id]
-            if sim_data is None or sim_data == []:
+            sim_data = sim_input.get_sim_data(vcs_id, design_group_id)
+            if len(sim_data) == 0:
                 raise e.VcsFailedException
 
             if not check_entity_rate(sim_data, process):
                 raise e.RateWrongOrderException
 
-            designs = [design.id for design in all_designs if design.design_group_id == design_group_id]
+            designs = [design.id for design in sim_input.get_designs(design_group_id)]
 
-            if designs is None or []:
+            if len(designs) == 0:
                 raise e.DesignIdsNotFoundException
 
-            for design in designs:
-                vd_values = [vd for vd in all_vd_design_values if vd['design'] == design]
-                processes, non_tech_processes = populate_processes(non_tech_add, sim_data, design, market_values,
-                                                                   vd_values)
-
-                dsm = create_simple_dsm(processes)
+            populated = populate_processes_batch(non_tech_add, sim_input, vcs_id, design_group_id, designs, formulas)
 
-                sim = des.Des()
+            for design, (processes, non_tech_processes) in zip(designs, populated):
+                yield vcs_id, design, processes, non_tech_processes
 
-                try:
-                    results = sim.run_parallell_simulations(flow_time, interarrival, process, processes,
-                                                            non_tech_processes,
-                                                            non_tech_add, dsm, time_unit, discount_rate, runtime, runs)
 
-                except Exception as exc:
-                    logger.debug(f'{exc.__class__}, {exc}')
-                    raise e.SimulationFailedException
+def populate_processes(non_tech_add: NonTechCost, sim_input: SimulationInput, vcs_id: int, design: int,
+                       formulas: dict = None):
+    design_group_id = sim_input.get_design(design).design_group_id
+    return populate_processes_batch(non_tech_add, sim_input, vcs_id, design_group_id, [design], formulas)[0]
 
-                if normalized_npv:
-                    m_npv = results.normalize_npv()
-                else:
-                    m_npv = results.mean_npv()
 
-                sim_res = models.Simulation(
-                    time=results.timesteps[-1],
-                    mean_NPV=m_npv,
-                    max_NPVs=results.all_max_npv(),
-                    mean_payback_time=results.mean_npv_payback_time(),
-                    all_npvs=results.npvs
-                )
-                design_results.append(sim_res)
+def populate_processes_batch(non_tech_add: NonTechCost, sim_input: SimulationInput, vcs_id: int,
+                             design_group_id: int, designs: List[int],
+                             formulas: dict = None) -> List[Tuple[List[Process], List[models.NonTechnicalProcess]]]:
+    """
+    Creates the processes of several designs of a design group at once. Every formula is evaluated a single time
+    for all designs, using one column of value driver values per variable and one row per design.
+    With a SampledInput in place of the SimulationInput, designs are the runs of a monte carlo simulation instead.
 
-    return design_results
-
-
-def populate_processes(non_tech_add: NonTechCost, db_results, design: int,
-                       mi_values=None,
-                       vd_values=None):
-    if mi_values is None:
-        mi_values = []
+    :return: The technical and non-technical processes of each design, in the same order as designs
+    """
+    if formulas is None:
+        formulas = {}
     nsp = NumericStringParser()
+    size = len(designs)
+    db_results = sim_input.get_sim_data(vcs_id, design_group_id)
 
-    technical_processes = []
-    non_tech_processes = []
+    mi_bindings = sim_input.get_mi_bindings(vcs_id)
+    vd_bindings = sim_input.get_vd_bindings(designs)
+
+    populated = [([], []) for _ in designs]
 
     for row in db_results:
-        vd_values_row = [vd for vd in vd_values if vd['vcs_row'] == row['id'] and vd['design'] == design]
         if row['category'] != 'Technical processes':
             try:
-                non_tech = models.NonTechnicalProcess(cost=nsp.eval(parse_formula(row['cost'], vd_values_row, mi_values)),
-                                                      revenue=nsp.eval(
-                                                          parse_formula(row['revenue'], vd_values_row, mi_values)),
-                                                      name=row['iso_name'])
+                vd_bindings_row = sim_input.get_vd_row_bindings(designs, row['id'])
+                cost_formula = get_compiled_formula(formulas, row['cost'], ('time',), nsp)
+                revenue_formula = get_compiled_formula(formulas, row['revenue'], ('time',), nsp)
+                if cost_formula.names or revenue_formula.names:
+                    raise ValueError('Time can only be used in formulas of technical processes')
+                costs = cost_formula.evaluate_batch(size, vd_bindings_row, mi_bindings).tolist()
+                revenues = revenue_formula.evaluate_batch(size, vd_bindings_row, mi_bindings).tolist()
+                non_techs = [models.NonTechnicalProcess(cost=cost, revenue=revenue, name=row['iso_name'])
+                             for cost, revenue in zip(costs, revenues)]
             except Exception as exc:
                 logger.debug(f'{exc.__class__}, {exc}')
                 raise e.FormulaEvalException(row['id'])
-            non_tech_processes.append(non_tech)
+            for (_, non_tech_processes), non_tech in zip(populated, non_techs):
+                non_tech_processes.append(non_tech)
 
-        elif row['iso_name'] is not None and row['sub_name'] is None:
-            try:
-                time = nsp.eval(parse_formula(
-                    row['time'], vd_values, mi_values))
-                cost_formula = parse_formula(row['cost'], vd_values, mi_values)
-                revenue_formula = parse_formula(
-                    row['revenue'], vd_values, mi_values)
-                p = Process(row['id'],
-                            time,
-                            nsp.eval(expr.replace_all(
-                                'time', time, cost_formula)),
-                            nsp.eval(expr.replace_all(
-                                'time', time, revenue_formula)),
-                            row['iso_name'], non_tech_add, TIME_FORMAT_DICT.get(
-                        row['time_unit'].lower())
-                            )
-                if p.time < 0:
-                    raise e.NegativeTimeException(row['id'])
-            except Exception as exc:
-                logger.debug(f'{exc.__class__}, {exc}')
-                raise e.FormulaEvalException(row['id'])
-            technical_processes.append(p)
-        elif row['sub_name'] is not None:
+        elif row['iso_name'] is not None or row['sub_name'] is not None:
+            name = row['sub_name'] if row['sub_name'] is not None else row['iso_name']
             try:
-                time = nsp.eval(parse_formula(
-                    row['time'], vd_values, mi_values))
-                cost_formula = parse_formula(row['cost'], vd_values, mi_values)
-                revenue_formula = parse_formula(
-                    row['revenue'], vd_values, mi_values)
-                p = Process(row['id'],
-                            time,
-                            nsp.eval(expr.replace_all(
-                                'time', time, cost_formula)),
-                            nsp.eval(expr.replace_all(
-                                'time', time, revenue_formula)),
-                            row['sub_name'], non_tech_add, TIME_FORMAT_DICT.get(
-                        row['time_unit'].lower())
-                            )
-
-                if p.time < 0:
+                times = get_compiled_formula(formulas, row['time'], (), nsp).evaluate_batch(size, vd_bindings,
+                                                                                            mi_bindings)
+                cost_formula = get_compiled_formula(formulas, row['cost'], ('time',), nsp)
+                revenue_formula = get_compiled_formula(formulas, row['revenue'], ('time',), nsp)
+                costs = cost_formula.evaluate_batch(size, vd_bindings, mi_bindings, time=times)
+                revenues = revenue_formula.evaluate_batch(size, vd_bindings, mi_bindings, time=times)
+                if (times < 0).any():
                     raise e.NegativeTimeException(row['id'])
+                processes = [Process(row['id'], time, cost, revenue, name, non_tech_add,
+                                     TIME_FORMAT_DICT.get(row['time_unit'].lower()))
+                             for time, cost, revenue in zip(times.tolist(), costs.tolist(), revenues.tolist())]
             except Exception as exc:
                 logger.debug(f'{exc.__class__}, {exc}')
                 raise e.FormulaEvalException(row['id'])
-            technical_processes.append(p)
+            for (technical_processes, _), p in zip(populated, processes):
+                technical_processes.append(p)
         else:
             raise e.ProcessNotFoundException
 
-    return technical_processes, non_tech_processes
+    return populated
+
+
+def get_compiled_formula(formulas: dict, formula: str, names: tuple, parser: NumericStringParser) -> CompiledFormula:
+    """
+    Fetches a compiled formula from the formulas dict, compiling it on first use. Passing the same dict for
+    every design means that each formula only has to be parsed once per simulation.
+    """
+    key = (formula, names)
+    if key not in formulas:
+        formulas[key] = compile_formula(formula, names, parser)
+    return formulas[key]
 
 
 def get_sim_data(db_connection: PooledMySQLConnection, vcs_id: int, design_group_id: int):
@@ -402,14 +705,50 @@ def get_vd_design_values(db_connection: PooledMySQLConnection, vcs_row_id: int,
     return res
 
 
+def get_all_bpmn_edges(db_connection: PooledMySQLConnection, vcs_ids: List[int]):
+    """
+    Fetches the edges between the process nodes in the BPMN of the value chains, as the vcs rows they go from
+    and to.
+    """
+    try:
+        query = f'SELECT cvs_nodes.vcs, from_nodes.vcs_row AS from_row, to_nodes.vcs_row AS to_row \
+                FROM cvs_nodes \
+                INNER JOIN cvs_process_nodes from_nodes ON from_nodes.id = cvs_nodes.id \
+                INNER JOIN cvs_process_nodes to_nodes ON to_nodes.id = cvs_nodes.`to` \
+                WHERE cvs_nodes.vcs IN ({",".join(["%s" for _ in range(len(vcs_ids))])}) \
+                UNION \
+                SELECT cvs_nodes.vcs, from_nodes.vcs_row AS from_row, to_nodes.vcs_row AS to_row \
+                FROM cvs_nodes \
+                INNER JOIN cvs_process_nodes to_nodes ON to_nodes.id = cvs_nodes.id \
+                INNER JOIN cvs_process_nodes from_nodes ON from_nodes.id = cvs_nodes.`from` \
+                WHERE cvs_nodes.vcs IN ({",".join(["%s" for _ in range(len(vcs_ids))])}) \
+                ORDER BY vcs, from_row, to_row'
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(query, vcs_ids + vcs_ids)
+            res = cursor.fetchall()
+            res = [dict(zip(cursor.column_names, row)) for row in res]
+    except Error as error:
+        logger.debug(f'Error msg: {error.msg}')
+        raise e.CouldNotFetchSimulationDataException
+    return res
+
+
 def get_all_vd_design_values(db_connection: PooledMySQLConnection, designs: List[int]):
+    """
+    Fetches the values of the value drivers that are referenced by the formulas of the design groups of the designs
+    (see link_design_lifecycle.references).
+    """
     try:
-        query = f'SELECT cvs_value_drivers.id, design, name, value, unit, vcs_row \
+        query = f'SELECT cvs_value_drivers.id, design, name, value, distribution, spread, unit, vcs_row \
                         FROM cvs_vd_design_values \
                         INNER JOIN cvs_value_drivers ON cvs_vd_design_values.value_driver = cvs_value_drivers.id \
                         INNER JOIN cvs_vcs_need_drivers ON cvs_vcs_need_drivers.value_driver = cvs_value_drivers.id \
                         INNER JOIN cvs_stakeholder_needs ON cvs_stakeholder_needs.id = cvs_vcs_need_drivers.stakeholder_need \
-                        WHERE design IN ({",".join(["%s" for _ in range(len(designs))])})'
+                        WHERE design IN ({",".join(["%s" for _ in range(len(designs))])}) \
+                        AND EXISTS (SELECT 1 FROM cvs_formulas_value_drivers \
+                            INNER JOIN cvs_designs ON cvs_designs.design_group = cvs_formulas_value_drivers.design_group \
+                            WHERE cvs_designs.id = cvs_vd_design_values.design \
+                            AND cvs_formulas_value_drivers.value_driver = cvs_value_drivers.id)'
         with db_connection.cursor(prepared=True) as cursor:
             cursor.execute(query, designs)
             res = cursor.fetchall()
@@ -420,6 +759,28 @@ def get_all_vd_design_values(db_connection: PooledMySQLConnection, designs: List
     return res
 
 
+def get_design_group_vd_rows(db_connection: PooledMySQLConnection, design_group_id: int):
+    """
+    Fetches the value drivers that are referenced by the formulas of the design group, once for every vcs row they
+    belong to, as get_all_vd_design_values without the design and value.
+    """
+    try:
+        query = f'SELECT DISTINCT cvs_value_drivers.id, name, unit, vcs_row \
+                        FROM cvs_formulas_value_drivers \
+                        INNER JOIN cvs_value_drivers ON cvs_formulas_value_drivers.value_driver = cvs_value_drivers.id \
+                        INNER JOIN cvs_vcs_need_drivers ON cvs_vcs_need_drivers.value_driver = cvs_value_drivers.id \
+                        INNER JOIN cvs_stakeholder_needs ON cvs_stakeholder_needs.id = cvs_vcs_need_drivers.stakeholder_need \
+                        WHERE cvs_formulas_value_drivers.design_group = %s'
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(query, [design_group_id])
+            res = cursor.fetchall()
+            res = [dict(zip(cursor.column_names, row)) for row in res]
+    except Error as error:
+        logger.debug(f'Error msg: {error.msg}')
+        raise e.CouldNotFetchValueDriverDesignValuesException
+    return res
+
+
 def get_simulation_settings(db_connection: PooledMySQLConnection, project_id: int):
     logger.debug(f'Fetching simulation settings for project {project_id}')
 
@@ -512,11 +873,19 @@ def get_market_values(db_connection: PooledMySQLConnection, vcs: int):
 
 
 def get_all_market_values(db_connection: PooledMySQLConnection, vcs_ids: List[int]):
+    """
+    Fetches the values of the market inputs that are referenced by the formulas of the value chains
+    (see link_design_lifecycle.references).
+    """
     try:
-        query = f'SELECT id, name, value, unit, vcs \
+        query = f'SELECT id, name, value, distribution, spread, unit, vcs \
                 FROM cvs_market_input_values \
                 INNER JOIN cvs_market_inputs ON cvs_market_input_values.market_input = cvs_market_inputs.id \
-                WHERE cvs_market_input_values.vcs IN ({",".join(["%s" for _ in range(len(vcs_ids))])})'
+                WHERE cvs_market_input_values.vcs IN ({",".join(["%s" for _ in range(len(vcs_ids))])}) \
+                AND EXISTS (SELECT 1 FROM cvs_formulas_market_inputs \
+                    INNER JOIN cvs_vcs_rows ON cvs_vcs_rows.id = cvs_formulas_market_inputs.formulas \
+                    WHERE cvs_vcs_rows.vcs = cvs_market_input_values.vcs \
+                    AND cvs_formulas_market_inputs.market_input = cvs_market_inputs.id)'
         with db_connection.cursor(prepared=True) as cursor:
             cursor.execute(query, vcs_ids)
             res = cursor.fetchall()
@@ -529,19 +898,14 @@ def get_all_market_values(db_connection: PooledMySQLConnection, vcs_ids: List[in
 
 def parse_formula(formula: str, vd_values, mi_values) -> str:
     new_formula = formula
-    vd_names = expr.get_prefix_variables('VD', new_formula)
-    mi_names = expr.get_prefix_variables('EF', new_formula)
-
-    for vd in vd_values:
-        for name in vd_names:
-            unit = vd["unit"] if vd["unit"] is not None and vd["unit"] != "" else "N/A"
-            if name == f'{vd["name"]} [{unit}]':
-                new_formula = expr.replace_prefix_variables("VD", name, str(vd["value"]), new_formula)
-    for mi in mi_values:
-        for name in mi_names:
-            unit = mi["unit"] if mi["unit"] is not None and mi["unit"] != "" else "N/A"
-            if name == f'{mi["name"]} [{unit}]':
-                new_formula = expr.replace_prefix_variables("EF", name, str(mi["value"]), new_formula)
+    for prefix, values in [('VD', vd_values), ('EF', mi_values)]:
+        bindings = {}
+        for value in values:
+            unit = value["unit"] if value["unit"] is not None and value["unit"] != "" else "N/A"
+            bindings.setdefault(f'{value["name"]} [{unit}]', str(value["value"]))
+        for name in expr.get_prefix_variables(prefix, new_formula):
+            if name in bindings:
+                new_formula = expr.replace_prefix_variables(prefix, name, bindings[name], new_formula)
     new_formula = expr.remove_strings_replace_zero(new_formula)
 
     return new_formula
@@ -584,17 +948,11 @@ def check_sim_settings(settings: models.EditSimSettings) -> bool:
     return settings_check
 
 
-# TODO Change dsm creation to follow BPMN and the nodes in the BPMN.
-# Currently the DSM only goes from one process to the other following the order of the index in the VCS
 def create_simple_dsm(processes: List[Process]) -> dict:
-    l = len(processes)
-
-    index_list = list(range(0, l))
-    dsm = dict()
-    for i, p in enumerate(processes):
-        dsm.update({p.name: [1 if i + 1 == j else 0 for j in index_list]})
-
-    return dsm
+    """
+    The DSM of the processes without a BPMN, where the processes follow each other in the order of the vcs.
+    """
+    return create_dsm(processes)
 
 
 def get_dsm_from_csv(path):
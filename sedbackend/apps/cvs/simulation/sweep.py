@@ -0,0 +1,70 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from sedbackend.apps.cvs.design.models import Design
+from sedbackend.apps.cvs.simulation import models
+import sedbackend.apps.cvs.simulation.exceptions as e
+
+# Maximum number of virtual designs in a design sweep
+MAX_SWEEP_SIZE = int(os.environ.get('SIMULATION_SWEEP_SIZE', 10000))
+
+
+def create_samples(sweep: models.DesignSweep) -> np.ndarray:
+    """
+    The values of the swept value drivers of every virtual design, as a designs x ranges matrix. A grid takes
+    every combination of levels evenly spaced values of each range, a latin hypercube takes sweep.samples values
+    of each range, one in each of sweep.samples equally wide strata, and pairs them at random.
+
+    :raises InvalidSweepException: If there are no ranges, a value driver is swept twice or a range is empty
+    :raises SweepTooLargeException: If there would be more than MAX_SWEEP_SIZE virtual designs
+    """
+    vd_ids = [vd_range.vd_id for vd_range in sweep.ranges]
+    if len(vd_ids) == 0 or len(set(vd_ids)) != len(vd_ids) \
+            or any(vd_range.max < vd_range.min for vd_range in sweep.ranges):
+        raise e.InvalidSweepException
+
+    if sweep.plan == models.SamplePlan.GRID:
+        if np.prod([vd_range.levels for vd_range in sweep.ranges], dtype=float) > MAX_SWEEP_SIZE:
+            raise e.SweepTooLargeException
+        axes = [np.linspace(vd_range.min, vd_range.max, vd_range.levels) for vd_range in sweep.ranges]
+        return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(axes))
+
+    if sweep.samples > MAX_SWEEP_SIZE:
+        raise e.SweepTooLargeException
+    lower = np.array([vd_range.min for vd_range in sweep.ranges], dtype=float)
+    upper = np.array([vd_range.max for vd_range in sweep.ranges], dtype=float)
+    return latin_hypercube(lower, upper, sweep.samples, np.random.default_rng(sweep.seed))
+
+
+def latin_hypercube(lower: np.ndarray, upper: np.ndarray, samples: int, rng: np.random.Generator) -> np.ndarray:
+    strata = rng.permuted(np.tile(np.arange(samples), (len(lower), 1)), axis=1).T
+    return lower + (strata + rng.random(strata.shape)) / samples * (upper - lower)
+
+
+def create_virtual_designs(design_group_id: int, vd_rows: List[dict], vd_ids: List[int], samples: np.ndarray,
+                           base_values: Dict[int, float] = None) -> Tuple[List[Design], List[dict]]:
+    """
+    Creates a design for every row of samples, with the sampled values for the value drivers in vd_ids. The other
+    value drivers get their value in base_values, or 0. The designs get negative ids so that they can not be
+    mistaken for stored designs.
+
+    :param vd_rows: The value drivers of the design group and their vcs rows, see get_design_group_vd_rows
+    :return: The designs and their value driver values, in the same form as get_all_vd_design_values
+    """
+    if base_values is None:
+        base_values = {}
+    columns = {vd_id: i for i, vd_id in enumerate(vd_ids)}
+
+    designs = []
+    vd_design_values = []
+    for i, values in enumerate(samples.tolist()):
+        design = Design(id=-(i + 1), name=f'Virtual design {i + 1}', design_group_id=design_group_id,
+                        vd_design_values=[])
+        designs.append(design)
+        for vd_row in vd_rows:
+            value = values[columns[vd_row['id']]] if vd_row['id'] in columns else base_values.get(vd_row['id'], 0)
+            vd_design_values.append({**vd_row, 'design': design.id, 'value': value})
+
+    return designs, vd_design_values
@@ -0,0 +1,14 @@
+class SimulationJobNotFoundException(Exception):
+    pass
+
+
+class SimulationJobStoppedException(Exception):
+    pass
+
+
+class SimulationJobNotCancellableException(Exception):
+    pass
+
+
+class SimulationJobInterruptedException(Exception):
+    pass
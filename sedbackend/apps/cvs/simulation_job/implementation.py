@@ -0,0 +1,213 @@
+import os
+import socket
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.logger import logger
+from mysql.connector.pooling import PooledMySQLConnection
+from starlette import status
+
+from sedbackend.apps.core.authentication import exceptions as auth_ex
+from sedbackend.apps.core.db import get_connection
+from sedbackend.apps.cvs.design.storage import get_all_designs
+from sedbackend.apps.cvs.project import exceptions as proj_exceptions
+from sedbackend.apps.cvs.simulation import models as sim_models, storage as sim_storage
+from sedbackend.apps.cvs.simulation.exceptions import SimulationQueueFullException
+from sedbackend.apps.cvs.simulation.executor import simulation_executor
+from sedbackend.apps.cvs.simulation_job import models, storage, exceptions
+from sedbackend.libs.datastructures.pagination import ListChunk
+
+# Name of this server in the server ids of the jobs. Has to be the same after a restart, so that the server can
+# fail the jobs of its dead processes
+SERVER_NAME = os.environ.get('SIMULATION_SERVER_NAME', socket.gethostname())
+
+
+def get_server_id(pid: Optional[int] = None) -> str:
+    """
+    Identifies the server process that accepts and runs a job, by default the current one.
+    """
+    return f'{SERVER_NAME}:{pid if pid is not None else os.getpid()}'
+
+
+def is_orphaned_server(server: Optional[str]) -> bool:
+    """
+    Whether the jobs of the server process can no longer be running. That is the case for jobs without a server,
+    created before servers were recorded, for the current process, which has not submitted any jobs when it
+    starts, and for the processes of this server that no longer exist. The processes of other servers are left
+    to those servers.
+    """
+    if server is None:
+        return True
+    name, _, pid = server.rpartition(':')
+    if name != SERVER_NAME:
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:  # The process exists, but belongs to another user
+        return False
+    return False
+
+
+def create_simulation_job(project_id: int, request: models.SimulationJobRequest) -> models.SimulationJob:
+    try:
+        with get_connection() as con:
+            job = storage.create_simulation_job(con, project_id, request, get_server_id())
+            con.commit()
+    except auth_ex.UnauthorizedOperationException:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Unauthorized user.',
+        )
+
+    try:
+        simulation_executor.submit(run_simulation_job_worker, job.id)
+    except Exception as exc:
+        logger.debug(f'{exc.__class__}, {exc}')
+        with get_connection() as con:
+            storage.finish_simulation_job(con, job.id, models.SimulationJobStatus.FAILED, exc.__class__.__name__)
+            con.commit()
+        if isinstance(exc, SimulationQueueFullException):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Too many simulations are running. Try again later.'
+            )
+        raise
+
+    return job
+
+
+def get_simulation_job(project_id: int, job_id: int) -> models.SimulationJob:
+    try:
+        with get_connection() as con:
+            return storage.get_simulation_job(con, project_id, job_id)
+    except auth_ex.UnauthorizedOperationException:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Unauthorized user.',
+        )
+    except exceptions.SimulationJobNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Could not find simulation job with id={job_id}.',
+        )
+    except proj_exceptions.CVSProjectNoMatchException:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Simulation job with id={job_id} is not a part of project with id={project_id}.',
+        )
+
+
+def get_simulation_job_results(project_id: int, job_id: int, segment_length: int = 0,
+                               index: int = 0) -> ListChunk[models.SimulationJobResult]:
+    try:
+        with get_connection() as con:
+            return storage.get_simulation_job_results(con, project_id, job_id, segment_length, index)
+    except auth_ex.UnauthorizedOperationException:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Unauthorized user.',
+        )
+    except exceptions.SimulationJobNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Could not find simulation job with id={job_id}.',
+        )
+    except proj_exceptions.CVSProjectNoMatchException:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Simulation job with id={job_id} is not a part of project with id={project_id}.',
+        )
+
+
+def cancel_simulation_job(project_id: int, job_id: int) -> bool:
+    try:
+        with get_connection() as con:
+            res = storage.cancel_simulation_job(con, project_id, job_id)
+            con.commit()
+            return res
+    except auth_ex.UnauthorizedOperationException:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Unauthorized user.',
+        )
+    except exceptions.SimulationJobNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Could not find simulation job with id={job_id}.',
+        )
+    except proj_exceptions.CVSProjectNoMatchException:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Simulation job with id={job_id} is not a part of project with id={project_id}.',
+        )
+    except exceptions.SimulationJobNotCancellableException:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f'Simulation job with id={job_id} has already finished.',
+        )
+
+
+def fail_unfinished_simulation_jobs():
+    """
+    Marks the jobs that were pending or running in a process of this server that stopped as failed, since no worker
+    runs them anymore. Called when a process of the server starts. The jobs of the other processes, and of other
+    servers that share the database, are left alone.
+    """
+    with get_connection() as con:
+        servers = [server for server in storage.get_unfinished_simulation_job_servers(con)
+                   if is_orphaned_server(server)]
+        count = storage.fail_unfinished_simulation_jobs(con, servers)
+        con.commit()
+    if count > 0:
+        logger.info(f'Marked {count} unfinished simulation jobs as failed')
+
+
+def run_simulation_job_worker(job_id: int):
+    """
+    Runs a simulation job in a process of the simulation executor. Every finished design is stored and committed
+    right away, so that progress can be polled and the job can be cancelled between two designs. The job stops as
+    soon as it is no longer running, when it has been cancelled or failed from elsewhere. The job is marked
+    as failed if anything goes wrong, so that it does not stay pending or running.
+    """
+    with get_connection() as con:
+        try:
+            run_simulation_job(con, job_id)
+        except exceptions.SimulationJobStoppedException:
+            logger.debug(f'Simulation job with id={job_id} was stopped')
+        except Exception as exc:
+            logger.debug(f'{exc.__class__}, {exc}')
+            con.rollback()
+            storage.finish_simulation_job(con, job_id, models.SimulationJobStatus.FAILED, exc.__class__.__name__)
+        con.commit()
+
+
+def run_simulation_job(con: PooledMySQLConnection, job_id: int):
+    request = storage.get_simulation_job_request(con, job_id)
+    designs = get_all_designs(con, request.design_group_ids)
+    started = storage.start_simulation_job(con, job_id, len(designs) * len(request.vcs_ids))
+    con.commit()
+    if not started:
+        return
+
+    completed = []
+
+    def on_result(vcs_id: int, design_id: int, result: sim_models.Simulation):
+        storage.add_simulation_job_result(con, job_id, len(completed), vcs_id, design_id, result)
+        con.commit()
+        completed.append(design_id)
+        if storage.get_simulation_job_status(con, job_id) != models.SimulationJobStatus.RUNNING:
+            raise exceptions.SimulationJobStoppedException
+
+    if request.sim_settings.monte_carlo:
+        sim_storage.run_sim_monte_carlo(con, request.sim_settings, request.vcs_ids,
+                                        request.design_group_ids, request.normalized_npv, on_result=on_result,
+                                        summary=request.summary, convergence=request.convergence,
+                                        seed=request.seed)
+    else:
+        sim_storage.run_simulation(con, request.sim_settings, request.vcs_ids, request.design_group_ids,
+                                   on_result=on_result)
+    storage.finish_simulation_job(con, job_id, models.SimulationJobStatus.COMPLETED)
@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, conint
+
+from sedbackend.apps.cvs.simulation import models as sim_models
+
+
+class SimulationJobStatus(str, Enum):
+    PENDING: str = 'pending'
+    RUNNING: str = 'running'
+    COMPLETED: str = 'completed'
+    FAILED: str = 'failed'
+    CANCELLED: str = 'cancelled'
+
+
+class SimulationJobRequest(BaseModel):
+    sim_settings: sim_models.EditSimSettings
+    vcs_ids: List[int]
+    design_group_ids: List[int]
+    normalized_npv: bool = False
+    summary: Optional[sim_models.MonteCarloSummary] = None
+    convergence: Optional[sim_models.MonteCarloConvergence] = None
+    seed: Optional[conint(ge=0)] = None
+
+
+class SimulationJob(BaseModel):
+    id: int
+    project_id: int
+    status: SimulationJobStatus
+    designs_completed: int
+    designs_total: int
+    error: Optional[str] = None
+    datetime_created: datetime
+    datetime_finished: Optional[datetime] = None
+
+
+class SimulationJobResult(BaseModel):
+    index: int
+    vcs_id: int
+    design_id: int
+    result: sim_models.Simulation
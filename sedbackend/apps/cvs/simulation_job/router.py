@@ -0,0 +1,66 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from sedbackend.apps.core.projects.dependencies import SubProjectAccessChecker
+from sedbackend.apps.core.projects.models import AccessLevel
+from sedbackend.apps.cvs.project.router import CVS_APP_SID
+from sedbackend.apps.cvs.simulation import models as sim_models
+from sedbackend.apps.cvs.simulation_job import models, implementation
+from sedbackend.libs.datastructures.pagination import ListChunk
+
+router = APIRouter()
+
+
+@router.post(
+    '/project/{native_project_id}/simulation/job',
+    summary='Start a simulation in the background',
+    description='Creates a simulation job and returns it right away. Poll the job for its progress and fetch the '
+                'results when it has completed. Monte carlo is used if it is enabled in the simulation settings.',
+    response_model=models.SimulationJob,
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def create_simulation_job(native_project_id: int, sim_settings: sim_models.EditSimSettings, vcs_ids: List[int],
+                                design_group_ids: List[int],
+                                normalized_npv: Optional[bool] = False,
+                                summary: Optional[sim_models.MonteCarloSummary] = None,
+                                convergence: Optional[sim_models.MonteCarloConvergence] = None,
+                                seed: Optional[int] = Query(default=None, ge=0)
+                                ) -> models.SimulationJob:
+    request = models.SimulationJobRequest(sim_settings=sim_settings, vcs_ids=vcs_ids,
+                                          design_group_ids=design_group_ids, normalized_npv=normalized_npv,
+                                          summary=summary, convergence=convergence, seed=seed)
+    return implementation.create_simulation_job(native_project_id, request)
+
+
+@router.get(
+    '/project/{native_project_id}/simulation/job/{job_id}',
+    summary='Get the status and progress of a simulation job',
+    response_model=models.SimulationJob,
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def get_simulation_job(native_project_id: int, job_id: int) -> models.SimulationJob:
+    return implementation.get_simulation_job(native_project_id, job_id)
+
+
+@router.get(
+    '/project/{native_project_id}/simulation/job/{job_id}/results',
+    summary='Get the results of a simulation job',
+    description='Results are ordered by vcs, design group and design. Use segment_length and index to fetch the '
+                'results one page at a time.',
+    response_model=ListChunk[models.SimulationJobResult],
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
+)
+async def get_simulation_job_results(native_project_id: int, job_id: int, segment_length: int = 0,
+                                     index: int = 0) -> ListChunk[models.SimulationJobResult]:
+    return implementation.get_simulation_job_results(native_project_id, job_id, segment_length, index)
+
+
+@router.put(
+    '/project/{native_project_id}/simulation/job/{job_id}/cancel',
+    summary='Cancel a simulation job',
+    response_model=bool,
+    dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_edit(), CVS_APP_SID))]
+)
+async def cancel_simulation_job(native_project_id: int, job_id: int) -> bool:
+    return implementation.cancel_simulation_job(native_project_id, job_id)
@@ -0,0 +1,204 @@
+from typing import List, Optional
+
+from fastapi.logger import logger
+from mysql.connector.pooling import PooledMySQLConnection
+
+from mysqlsb import MySQLStatementBuilder, FetchType, Sort
+from sedbackend.apps.cvs.simulation import models as sim_models
+from sedbackend.apps.cvs.simulation_job import models, exceptions
+from sedbackend.apps.cvs.project import exceptions as project_exceptions
+from sedbackend.libs.datastructures.pagination import ListChunk
+
+CVS_SIM_JOBS_TABLE = 'cvs_simulation_jobs'
+CVS_SIM_JOBS_COLUMNS = ['id', 'project', 'status', 'request', 'designs_completed', 'designs_total', 'error',
+                        'datetime_created', 'datetime_finished']
+
+UNFINISHED_STATUSES = [models.SimulationJobStatus.PENDING.value, models.SimulationJobStatus.RUNNING.value]
+
+CVS_SIM_JOB_RESULTS_TABLE = 'cvs_simulation_job_results'
+CVS_SIM_JOB_RESULTS_COLUMNS = ['job', 'index', 'vcs', 'design', 'result']
+
+
+def populate_simulation_job(db_result) -> models.SimulationJob:
+    return models.SimulationJob(
+        id=db_result['id'],
+        project_id=db_result['project'],
+        status=db_result['status'],
+        designs_completed=db_result['designs_completed'],
+        designs_total=db_result['designs_total'],
+        error=db_result['error'],
+        datetime_created=db_result['datetime_created'],
+        datetime_finished=db_result['datetime_finished']
+    )
+
+
+def get_simulation_job_row(db_connection: PooledMySQLConnection, job_id: int):
+    select_statement = MySQLStatementBuilder(db_connection)
+    db_result = select_statement \
+        .select(CVS_SIM_JOBS_TABLE, CVS_SIM_JOBS_COLUMNS) \
+        .where('id = %s', [job_id]) \
+        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
+
+    if db_result is None:
+        raise exceptions.SimulationJobNotFoundException
+
+    return db_result
+
+
+def get_simulation_job(db_connection: PooledMySQLConnection, project_id: int,
+                       job_id: int) -> models.SimulationJob:
+    logger.debug(f'Fetching simulation job with id={job_id}.')
+
+    db_result = get_simulation_job_row(db_connection, job_id)
+    if db_result['project'] != project_id:
+        raise project_exceptions.CVSProjectNoMatchException
+
+    return populate_simulation_job(db_result)
+
+
+def get_simulation_job_request(db_connection: PooledMySQLConnection, job_id: int) -> models.SimulationJobRequest:
+    db_result = get_simulation_job_row(db_connection, job_id)
+    return models.SimulationJobRequest.parse_raw(db_result['request'])
+
+
+def get_simulation_job_status(db_connection: PooledMySQLConnection, job_id: int) -> models.SimulationJobStatus:
+    return models.SimulationJobStatus(get_simulation_job_row(db_connection, job_id)['status'])
+
+
+def create_simulation_job(db_connection: PooledMySQLConnection, project_id: int,
+                          request: models.SimulationJobRequest, server: str) -> models.SimulationJob:
+    """
+    Creates a pending job, owned by the server process that runs it.
+    """
+    logger.debug(f'Create simulation job for project with id={project_id}')
+
+    insert_statement = MySQLStatementBuilder(db_connection)
+    insert_statement \
+        .insert(table=CVS_SIM_JOBS_TABLE, columns=['project', 'status', 'server', 'request']) \
+        .set_values([project_id, models.SimulationJobStatus.PENDING.value, server, request.json()]) \
+        .execute(fetch_type=FetchType.FETCH_NONE)
+
+    return get_simulation_job(db_connection, project_id, insert_statement.last_insert_id)
+
+
+def start_simulation_job(db_connection: PooledMySQLConnection, job_id: int, designs_total: int) -> bool:
+    """
+    Marks a pending job as running. Returns False if the job has been cancelled before it started.
+    """
+    update_statement = MySQLStatementBuilder(db_connection)
+    _, rows = update_statement \
+        .update(table=CVS_SIM_JOBS_TABLE, set_statement='status = %s, designs_total = %s',
+                values=[models.SimulationJobStatus.RUNNING.value, designs_total]) \
+        .where('id = %s AND status = %s', [job_id, models.SimulationJobStatus.PENDING.value]) \
+        .execute(return_affected_rows=True)
+
+    return rows > 0
+
+
+def add_simulation_job_result(db_connection: PooledMySQLConnection, job_id: int, index: int, vcs_id: int,
+                              design_id: int, result: sim_models.Simulation):
+    insert_statement = MySQLStatementBuilder(db_connection)
+    insert_statement \
+        .insert(table=CVS_SIM_JOB_RESULTS_TABLE, columns=CVS_SIM_JOB_RESULTS_COLUMNS) \
+        .set_values([job_id, index, vcs_id, design_id, result.json()]) \
+        .execute(fetch_type=FetchType.FETCH_NONE)
+
+    update_statement = MySQLStatementBuilder(db_connection)
+    update_statement \
+        .update(table=CVS_SIM_JOBS_TABLE, set_statement='designs_completed = designs_completed + 1', values=[]) \
+        .where('id = %s', [job_id]) \
+        .execute(fetch_type=FetchType.FETCH_NONE)
+
+
+def finish_simulation_job(db_connection: PooledMySQLConnection, job_id: int, status: models.SimulationJobStatus,
+                          error: str = None):
+    """
+    Finishes a pending or running job. A job that has been cancelled or failed in the meantime is left as it is.
+    """
+    update_statement = MySQLStatementBuilder(db_connection)
+    update_statement \
+        .update(table=CVS_SIM_JOBS_TABLE, set_statement='status = %s, error = %s, datetime_finished = NOW(3)',
+                values=[status.value, error]) \
+        .where('id = %s AND status IN (%s, %s)', [job_id, *UNFINISHED_STATUSES]) \
+        .execute(fetch_type=FetchType.FETCH_NONE)
+
+
+def get_unfinished_simulation_job_servers(db_connection: PooledMySQLConnection) -> List[Optional[str]]:
+    """
+    The server processes that own pending or running jobs. Jobs created before the servers were recorded have None.
+    """
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(f'SELECT DISTINCT server FROM {CVS_SIM_JOBS_TABLE} WHERE status IN (%s, %s)',
+                       UNFINISHED_STATUSES)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fail_unfinished_simulation_jobs(db_connection: PooledMySQLConnection, servers: List[Optional[str]]) -> int:
+    """
+    Marks the pending and running jobs of the server processes as failed, and the ones without a server if servers
+    contains None. Returns the number of jobs.
+    """
+    owners = [server for server in servers if server is not None]
+    conditions = ['server IS NULL'] if None in servers else []
+    if len(owners) > 0:
+        conditions.append(f'server IN ({",".join(["%s" for _ in owners])})')
+    if len(conditions) == 0:
+        return 0
+
+    update_statement = MySQLStatementBuilder(db_connection)
+    _, rows = update_statement \
+        .update(table=CVS_SIM_JOBS_TABLE, set_statement='status = %s, error = %s, datetime_finished = NOW(3)',
+                values=[models.SimulationJobStatus.FAILED.value,
+                        exceptions.SimulationJobInterruptedException.__name__]) \
+        .where(f'status IN (%s, %s) AND ({" OR ".join(conditions)})', [*UNFINISHED_STATUSES, *owners]) \
+        .execute(return_affected_rows=True)
+
+    return rows
+
+
+def cancel_simulation_job(db_connection: PooledMySQLConnection, project_id: int, job_id: int) -> bool:
+    logger.debug(f'Cancel simulation job with id={job_id}')
+
+    get_simulation_job(db_connection, project_id, job_id)  # check if job exists and belongs to project
+
+    update_statement = MySQLStatementBuilder(db_connection)
+    _, rows = update_statement \
+        .update(table=CVS_SIM_JOBS_TABLE, set_statement='status = %s, datetime_finished = NOW(3)',
+                values=[models.SimulationJobStatus.CANCELLED.value]) \
+        .where('id = %s AND status IN (%s, %s)', [job_id, *UNFINISHED_STATUSES]) \
+        .execute(return_affected_rows=True)
+
+    if rows == 0:
+        raise exceptions.SimulationJobNotCancellableException
+
+    return True
+
+
+def get_simulation_job_results(db_connection: PooledMySQLConnection, project_id: int, job_id: int,
+                               segment_length: int = 0, index: int = 0) -> ListChunk[models.SimulationJobResult]:
+    logger.debug(f'Fetching results of simulation job with id={job_id}.')
+
+    get_simulation_job(db_connection, project_id, job_id)  # check if job exists and belongs to project
+
+    select_statement = MySQLStatementBuilder(db_connection)
+    select_statement \
+        .select(CVS_SIM_JOB_RESULTS_TABLE, CVS_SIM_JOB_RESULTS_COLUMNS) \
+        .where('job = %s', [job_id]) \
+        .order_by(['index'], Sort.ASCENDING)
+    if segment_length > 0:
+        select_statement.limit(segment_length).offset(segment_length * max(index, 0))
+    results = select_statement.execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+
+    count_statement = MySQLStatementBuilder(db_connection)
+    count_result = count_statement.count(CVS_SIM_JOB_RESULTS_TABLE) \
+        .where('job = %s', [job_id]) \
+        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
+
+    chunk = [models.SimulationJobResult(
+        index=result['index'],
+        vcs_id=result['vcs'],
+        design_id=result['design'],
+        result=sim_models.Simulation.parse_raw(result['result'])
+    ) for result in results]
+
+    return ListChunk[models.SimulationJobResult](chunk=chunk, length_total=count_result['count'])
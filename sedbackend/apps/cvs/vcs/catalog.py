@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mysql.connector.pooling import PooledMySQLConnection
+
+from sedbackend.apps.cvs.vcs import models
+
+# Seconds between checks of whether the ISO process table has changed
+CATALOG_TTL = float(os.environ.get('ISO_PROCESS_CATALOG_TTL', 300))
+
+# Minimum seconds between checks of the table that are forced by lookups of unknown ids
+CATALOG_REFRESH_INTERVAL = float(os.environ.get('ISO_PROCESS_CATALOG_REFRESH_INTERVAL', 5))
+
+# Seconds that clients may use the ISO processes without revalidating them
+CACHE_MAX_AGE = int(os.environ.get('ISO_PROCESS_CACHE_MAX_AGE', 3600))
+
+
+class ISOProcessCatalog(object):
+    """
+    Process-wide, in-memory copy of the ISO processes, with lookups on id and name. ISO processes are static
+    reference data, so they are loaded on first use and served from memory to every request after that.
+
+    The catalog is reloaded only when the table has changed. At most every ttl seconds the checksum of the table
+    is compared to the one of the loaded catalog. A lookup of an id that is not in the catalog checks the table
+    early, but at most every refresh_interval seconds, so that lookups of unknown ids can not keep the table locked.
+    """
+
+    def __init__(self, load: Callable[[PooledMySQLConnection], List[models.VCSISOProcess]],
+                 checksum: Callable[[PooledMySQLConnection], Any], ttl: float = CATALOG_TTL,
+                 refresh_interval: float = CATALOG_REFRESH_INTERVAL):
+        self.load = load
+        self.checksum = checksum
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_all(self, db_connection: PooledMySQLConnection) -> List[models.VCSISOProcess]:
+        return list(self._refresh(db_connection)['iso_processes'])
+
+    def get_all_tagged(self, db_connection: PooledMySQLConnection) -> Tuple[List[models.VCSISOProcess], str]:
+        """
+        All ISO processes and a strong ETag of them, which changes whenever their content changes. Both are taken
+        from the same snapshot, so the ETag always belongs to the returned ISO processes.
+        """
+        snapshot = self._refresh(db_connection)
+        return list(snapshot['iso_processes']), snapshot['etag']
+
+    def get(self, db_connection: PooledMySQLConnection, iso_process_id: int) -> Optional[models.VCSISOProcess]:
+        snapshot = self._refresh(db_connection)
+        if iso_process_id not in snapshot['by_id']:
+            snapshot = self._refresh(db_connection, force=True)
+        return snapshot['by_id'].get(iso_process_id)
+
+    def get_by_name(self, db_connection: PooledMySQLConnection, name: str) -> Optional[models.VCSISOProcess]:
+        return self._refresh(db_connection)['by_name'].get(name)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def _refresh(self, db_connection: PooledMySQLConnection, force: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and now - self._checked_at < (self.refresh_interval if force else self.ttl):
+                return self._snapshot
+
+            checksum = self.checksum(db_connection)
+            if self._snapshot is None or checksum is None or checksum != self._snapshot['checksum']:
+                self._snapshot = create_snapshot(self.load(db_connection), checksum)
+            self._checked_at = now
+            return self._snapshot
+
+
+def create_snapshot(iso_processes: List[models.VCSISOProcess], checksum: Any) -> Dict[str, Any]:
+    data = json.dumps([iso_process.dict() for iso_process in iso_processes], sort_keys=True, separators=(',', ':'))
+    return {
+        'iso_processes': iso_processes,
+        'by_id': {iso_process.id: iso_process for iso_process in iso_processes},
+        'by_name': {iso_process.name: iso_process for iso_process in iso_processes},
+        'checksum': checksum,
+        'etag': f'"{hashlib.sha256(data.encode()).hexdigest()}"'
+    }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether the If-None-Match header of a request matches the ETag, so that the client has the current version.
+    """
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from fastapi import HTTPException
 from starlette import status
@@ -15,10 +15,10 @@ from sedbackend.libs.datastructures.pagination import ListChunk
 # VCS
 # ======================================================================================================================
 
-def get_all_vcs(project_id: int) -> ListChunk[models.VCS]:
+def get_all_vcs(project_id: int, limit: Optional[int] = None, after_id: Optional[int] = None) -> ListChunk[models.VCS]:
     try:
         with get_connection() as con:
-            return storage.get_all_vcs(con, project_id)
+            return storage.get_all_vcs(con, project_id, limit, after_id)
     except project_exceptions.CVSProjectNotFoundException:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -332,6 +332,20 @@ def get_all_iso_process() -> List[models.VCSISOProcess]:
         )
 
 
+def get_all_iso_process_tagged() -> Tuple[List[models.VCSISOProcess], str]:
+    """
+    All ISO processes together with the ETag of the catalog snapshot they were served from.
+    """
+    try:
+        with get_connection() as con:
+            return storage.get_all_iso_process_tagged(con)
+    except exceptions.ISOProcessNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Could not find any ISO processes'
+        )
+
+
 def get_iso_process(iso_process_id: int) -> models.VCSISOProcess:
     try:
         with get_connection() as con:
@@ -1,5 +1,6 @@
-from typing import List, Tuple
-from fastapi import Depends, APIRouter
+from typing import List, Optional, Tuple
+from fastapi import Depends, APIRouter, Header, Query, Response
+from starlette import status
 from sedbackend.apps.core.authentication.utils import get_current_active_user
 from sedbackend.apps.core.projects.dependencies import SubProjectAccessChecker
 from sedbackend.apps.core.projects.models import AccessLevel
@@ -8,7 +9,7 @@ from sedbackend.apps.cvs.design.router import router
 from sedbackend.apps.cvs.project.router import CVS_APP_SID
 from sedbackend.apps.cvs.vcs.models import ValueDriver
 from sedbackend.libs.datastructures.pagination import ListChunk
-from sedbackend.apps.cvs.vcs import models, implementation, implementation as vcs_impl
+from sedbackend.apps.cvs.vcs import models, catalog, implementation, implementation as vcs_impl
 
 router = APIRouter()
 
@@ -24,8 +25,9 @@ router = APIRouter()
     response_model=ListChunk[models.VCS],
     dependencies=[Depends(SubProjectAccessChecker(AccessLevel.list_can_read(), CVS_APP_SID))]
 )
-async def get_all_vcs(native_project_id: int) -> ListChunk[models.VCS]:
-    return implementation.get_all_vcs(native_project_id)
+async def get_all_vcs(native_project_id: int, limit: Optional[int] = Query(default=None, ge=1),
+                      after_id: Optional[int] = Query(default=None, ge=0)) -> ListChunk[models.VCS]:
+    return implementation.get_all_vcs(native_project_id, limit, after_id)
 
 
 @router.get(
@@ -183,8 +185,14 @@ async def delete_value_driver(value_driver_id: int) -> bool:
     summary='Returns all ISO processes',
     response_model=List[models.VCSISOProcess],
 )
-async def get_all_iso_process() -> List[models.VCSISOProcess]:
-    return implementation.get_all_iso_process()
+async def get_all_iso_process(response: Response,
+                              if_none_match: Optional[str] = Header(default=None)) -> List[models.VCSISOProcess]:
+    iso_processes, etag = implementation.get_all_iso_process_tagged()
+    headers = {'ETag': etag, 'Cache-Control': f'public, max-age={catalog.CACHE_MAX_AGE}'}
+    if catalog.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return iso_processes
 
 
 # ======================================================================================================================
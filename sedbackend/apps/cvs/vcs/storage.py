@@ -1,12 +1,15 @@
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi.logger import logger
 from mysql.connector.pooling import PooledMySQLConnection
 from mysql.connector import Error
 from sedbackend.apps.cvs.project import exceptions as project_exceptions
-from sedbackend.apps.cvs.project.storage import get_cvs_project
+from sedbackend.apps.cvs.project.storage import get_cvs_project, project_loader
 from sedbackend.apps.cvs.vcs import models, exceptions
-from sedbackend.apps.cvs.life_cycle import storage as life_cycle_storage, models as life_cycle_models
-from sedbackend.libs.datastructures.pagination import ListChunk
+from sedbackend.apps.cvs.vcs.catalog import ISOProcessCatalog
+from sedbackend.apps.cvs.life_cycle import storage as life_cycle_storage
+from sedbackend.apps.cvs.link_design_lifecycle import references as formula_references
+from sedbackend.libs.datastructures.identity_map import Loader
+from sedbackend.libs.datastructures.pagination import ListChunk, fetch_keyset_page
 from mysqlsb import MySQLStatementBuilder, Sort, FetchType
 
 DEBUG_ERROR_HANDLING = True  # Set to false in production
@@ -45,49 +48,61 @@ CVS_VCS_NEED_DRIVERS_COLUMNS = ['stakeholder_need', 'value_driver']
 # ======================================================================================================================
 
 
-def get_all_vcs(db_connection: PooledMySQLConnection, project_id: int) -> ListChunk[models.VCS]:
+def get_all_vcs(db_connection: PooledMySQLConnection, project_id: int, limit: Optional[int] = None,
+                after_id: Optional[int] = None) -> ListChunk[models.VCS]:
+    """
+    Fetches the VCSs of the project ordered on id, at most limit of them after the VCS with id after_id, and the
+    number of VCSs of the project.
+    """
     logger.debug(f'Fetching all VCSs for project with id={project_id}.')
 
     get_cvs_project(db_connection, project_id)  # perform checks: project and user
 
-    where_statement = f'project = %s'
-    where_values = [project_id]
-
-    select_statement = MySQLStatementBuilder(db_connection)
-    results = select_statement.select(CVS_VCS_TABLE, CVS_VCS_COLUMNS) \
-        .where(where_statement, where_values) \
-        .order_by(['id'], Sort.ASCENDING) \
-        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+    results, length_total = fetch_keyset_page(db_connection, CVS_VCS_TABLE, CVS_VCS_COLUMNS, 'project = %s',
+                                              [project_id], limit, after_id)
 
     vcs_list = []
     for result in results:
-        vcs_list.append(populate_vcs(db_connection, result))
+        vcs = populate_vcs(db_connection, result)
+        vcs_loader.prime(db_connection, vcs.id, vcs)
+        vcs_list.append(vcs)
 
-    count_statement = MySQLStatementBuilder(db_connection)
-    result = count_statement.count(CVS_VCS_TABLE) \
-        .where(where_statement, where_values) \
-        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
-    chunk = ListChunk[models.VCS](chunk=vcs_list, length_total=result['count'])
-
-    return chunk
+    return ListChunk[models.VCS](chunk=vcs_list, length_total=length_total)
 
 
 def get_vcs(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int) -> models.VCS:
     logger.debug(f'Fetching VCS with id={vcs_id}.')
 
+    vcs = vcs_loader.load(db_connection, vcs_id)
+    if vcs is None:
+        raise exceptions.VCSNotFoundException
+
+    elif vcs.project.id != project_id:
+        raise project_exceptions.CVSProjectNoMatchException
+
+    return vcs
+
+
+def get_vcss_by_id(db_connection: PooledMySQLConnection, vcs_ids: Iterable[int]) -> Dict[int, models.VCS]:
+    """
+    Fetches many VCSs and their projects, in one query and the queries of the projects that are not fetched yet.
+    """
+    vcs_ids = list(vcs_ids)
+    if len(vcs_ids) == 0:
+        return {}
+
     select_statement = MySQLStatementBuilder(db_connection)
-    result = select_statement \
+    results = select_statement \
         .select(CVS_VCS_TABLE, CVS_VCS_COLUMNS) \
-        .where('id = %s', [vcs_id]) \
-        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
+        .where(f'id IN ({",".join(["%s" for _ in vcs_ids])})', vcs_ids) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
 
-    if result is None:
-        raise exceptions.VCSNotFoundException
+    project_loader.load_many(db_connection, [result['project'] for result in results])
+    return {result['id']: populate_vcs(db_connection, result) for result in results}
 
-    elif result['project'] != project_id:
-        raise project_exceptions.CVSProjectNoMatchException
 
-    return populate_vcs(db_connection, result)
+# VCSs fetched within a request, most of all by the VCS checks of the other storage functions
+vcs_loader = Loader(get_vcss_by_id)
 
 
 def create_vcs(db_connection: PooledMySQLConnection, project_id: int, vcs_post: models.VCSPost) -> models.VCS:
@@ -126,6 +141,7 @@ def edit_vcs(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int,
     )
     update_statement.where('id = %s', [vcs_id])
     _, rows = update_statement.execute(return_affected_rows=True)
+    vcs_loader.clear(db_connection, vcs_id)
 
     return get_vcs(db_connection, project_id, vcs_id)
 
@@ -139,6 +155,7 @@ def delete_vcs(db_connection: PooledMySQLConnection, project_id: int, vcs_id: in
     _, rows = delete_statement.delete(CVS_VCS_TABLE) \
         .where('id = %s', [vcs_id]) \
         .execute(return_affected_rows=True)
+    vcs_loader.clear(db_connection, vcs_id)
 
     if rows == 0:
         raise exceptions.VCSFailedDeletionException
@@ -293,7 +310,11 @@ def get_all_value_drivers_vcs_row(db_connection: PooledMySQLConnection, project_
             value_drivers += [vd.id for vd in need.value_drivers]
 
     value_drivers = list(dict.fromkeys(value_drivers))
-    return [get_value_driver(db_connection, vd_id) for vd_id in value_drivers]
+    found = value_driver_loader.load_many(db_connection, value_drivers)
+    for vd_id in value_drivers:
+        if vd_id not in found:
+            raise exceptions.ValueDriverNotFoundException(value_driver_id=vd_id)
+    return [found[vd_id] for vd_id in value_drivers]
 
 
 def get_vcs_need_drivers(db_connection: PooledMySQLConnection, need_id: int) -> List[models.ValueDriver]:
@@ -313,6 +334,26 @@ def get_vcs_need_drivers(db_connection: PooledMySQLConnection, need_id: int) ->
     return [populate_value_driver(result) for result in results]
 
 
+def get_vcs_need_drivers_by_need(db_connection: PooledMySQLConnection,
+                                 need_ids: List[int]) -> Dict[int, List[models.ValueDriver]]:
+    if len(need_ids) == 0:
+        return {}
+
+    select_statement = MySQLStatementBuilder(db_connection)
+    results = select_statement \
+        .select(CVS_VALUE_DRIVER_TABLE, CVS_VALUE_DRIVER_COLUMNS + ['stakeholder_need']) \
+        .inner_join(CVS_VCS_NEED_DRIVERS_TABLE, 'cvs_vcs_need_drivers.value_driver = cvs_value_drivers.id') \
+        .where(f'stakeholder_need IN ({",".join(["%s" for _ in need_ids])})', need_ids) \
+        .order_by(['cvs_value_drivers.id'], Sort.ASCENDING) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+
+    need_drivers = {}
+    for result in results:
+        need_drivers.setdefault(result['stakeholder_need'], []).append(populate_value_driver(result))
+
+    return need_drivers
+
+
 def add_vcs_need_driver(db_connection: PooledMySQLConnection, need_id: int, value_driver_id: int) -> bool:
     logger.debug(f'Add value drivers with id={value_driver_id} to stakeholder need with id={need_id}.')
 
@@ -330,7 +371,10 @@ def add_vcs_need_driver(db_connection: PooledMySQLConnection, need_id: int, valu
 
 def add_vcs_multiple_needs_drivers(db_connection: PooledMySQLConnection, need_driver_ids: List[Tuple[int, int]]):
     logger.debug(f'Add value drivers to stakeholder needs')
-    
+
+    if len(need_driver_ids) == 0:
+        return True
+
     prepared_list = []
     try:
         insert_statement = f'INSERT INTO {CVS_VCS_NEED_DRIVERS_TABLE} (stakeholder_need, value_driver) VALUES'
@@ -347,6 +391,41 @@ def add_vcs_multiple_needs_drivers(db_connection: PooledMySQLConnection, need_dr
     
     return True
 
+def get_need_driver_ids(db_connection: PooledMySQLConnection, need_ids: List[int]) -> Dict[int, set]:
+    """
+    The ids of the value drivers of each of the stakeholder needs, in one query.
+    """
+    if len(need_ids) == 0:
+        return {}
+
+    select_statement = MySQLStatementBuilder(db_connection)
+    results = select_statement \
+        .select(CVS_VCS_NEED_DRIVERS_TABLE, CVS_VCS_NEED_DRIVERS_COLUMNS) \
+        .where(f'stakeholder_need IN ({",".join(["%s" for _ in need_ids])})', need_ids) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+
+    need_drivers = {}
+    for result in results:
+        need_drivers.setdefault(result['stakeholder_need'], set()).add(result['value_driver'])
+
+    return need_drivers
+
+
+def delete_vcs_needs_drivers(db_connection: PooledMySQLConnection, need_driver_ids: List[Tuple[int, int]]) -> bool:
+    logger.debug(f'Remove value drivers from stakeholder needs')
+
+    if len(need_driver_ids) == 0:
+        return True
+
+    delete_statement = MySQLStatementBuilder(db_connection)
+    delete_statement.delete(CVS_VCS_NEED_DRIVERS_TABLE) \
+        .where(f'(stakeholder_need, value_driver) IN ({",".join(["(%s, %s)" for _ in need_driver_ids])})',
+               [value for need_driver in need_driver_ids for value in need_driver]) \
+        .execute(return_affected_rows=True)
+
+    return True
+
+
 def update_vcs_need_driver(db_connection: PooledMySQLConnection, need_id: int, value_drivers: List[int]) -> bool:
     logger.debug(f'Update value drivers in stakeholder need with id={need_id}.')
 
@@ -364,19 +443,30 @@ def update_vcs_need_driver(db_connection: PooledMySQLConnection, need_id: int, v
 def get_value_driver(db_connection: PooledMySQLConnection, value_driver_id: int) -> models.ValueDriver:
     logger.debug(f'Fetching value driver with id={value_driver_id}.')
 
-    where_statement = f'id = %s'
-    where_values = [value_driver_id]
+    value_driver = value_driver_loader.load(db_connection, value_driver_id)
+    if value_driver is None:
+        raise exceptions.ValueDriverNotFoundException(value_driver_id=value_driver_id)
+
+    return value_driver
+
+
+def get_value_drivers_by_id(db_connection: PooledMySQLConnection,
+                            value_driver_ids: Iterable[int]) -> Dict[int, models.ValueDriver]:
+    value_driver_ids = list(value_driver_ids)
+    if len(value_driver_ids) == 0:
+        return {}
 
     select_statement = MySQLStatementBuilder(db_connection)
-    result = select_statement \
+    results = select_statement \
         .select(CVS_VALUE_DRIVER_TABLE, CVS_VALUE_DRIVER_COLUMNS) \
-        .where(where_statement, where_values) \
-        .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
+        .where(f'id IN ({",".join(["%s" for _ in value_driver_ids])})', value_driver_ids) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+
+    return {result['id']: populate_value_driver(result) for result in results}
 
-    if result is None:
-        raise exceptions.ValueDriverNotFoundException(value_driver_id=value_driver_id)
 
-    return populate_value_driver(result)
+# Value drivers fetched within a request
+value_driver_loader = Loader(get_value_drivers_by_id)
 
 
 def create_value_driver(db_connection: PooledMySQLConnection, user_id: int,
@@ -409,10 +499,13 @@ def edit_value_driver(db_connection: PooledMySQLConnection, value_driver_id: int
     )
     update_statement.where('id = %s', [value_driver_id])
     _, rows = update_statement.execute(return_affected_rows=True)
+    value_driver_loader.clear(db_connection, value_driver_id)
 
     if rows == 0:
         raise exceptions.ValueDriverFailedToUpdateException
 
+    formula_references.refresh_value_driver_references(db_connection, value_driver_id)
+
     return get_value_driver(db_connection, value_driver_id)
 
 
@@ -423,6 +516,7 @@ def delete_value_driver(db_connection: PooledMySQLConnection, value_driver_id: i
     _, rows = delete_statement.delete(CVS_VALUE_DRIVER_TABLE) \
         .where('id = %s', [value_driver_id]) \
         .execute(return_affected_rows=True)
+    value_driver_loader.clear(db_connection, value_driver_id)
 
     if rows == 0:
         raise exceptions.ValueDriverNotFoundException(value_driver_id=value_driver_id)
@@ -437,6 +531,7 @@ def delete_all_value_drivers(db_connection: PooledMySQLConnection, user_id: int)
     _, rows = delete_statement.delete(CVS_VALUE_DRIVER_TABLE) \
         .where('user = %s', [user_id]) \
         .execute(return_affected_rows=True)
+    value_driver_loader.clear(db_connection)
 
     return True
 
@@ -457,32 +552,52 @@ def populate_value_driver(db_result) -> models.ValueDriver:
 def get_all_iso_process(db_connection: PooledMySQLConnection) -> List[models.VCSISOProcess]:
     logger.debug(f'Fetching all ISO processes.')
 
-    select_statement = MySQLStatementBuilder(db_connection)
-    results = select_statement \
-        .select(CVS_ISO_PROCESS_TABLE, CVS_ISO_PROCESS_COLUMNS) \
-        .execute(FetchType.FETCH_ALL, dictionary=True)
+    return iso_process_catalog.get_all(db_connection)
 
-    iso_processes = []
 
-    for res in results:
-        iso_processes.append(populate_iso_process(res))
+def get_all_iso_process_tagged(db_connection: PooledMySQLConnection) -> Tuple[List[models.VCSISOProcess], str]:
+    logger.debug(f'Fetching all ISO processes with their ETag.')
 
-    return iso_processes
+    return iso_process_catalog.get_all_tagged(db_connection)
 
 
 def get_iso_process(iso_process_id: int, db_connection) -> models.VCSISOProcess:
     logger.debug(f'Fetching ISO process with id={iso_process_id}.')
 
+    iso_process = iso_process_catalog.get(db_connection, int(iso_process_id))
+    if iso_process is None:
+        raise exceptions.ISOProcessNotFoundException
+
+    return iso_process
+
+
+def get_iso_processes_by_id(db_connection: PooledMySQLConnection,
+                            iso_process_ids: Iterable[int]) -> Dict[int, models.VCSISOProcess]:
+    iso_processes = {}
+    for iso_process_id in {int(iso_process_id) for iso_process_id in iso_process_ids}:
+        iso_process = iso_process_catalog.get(db_connection, iso_process_id)
+        if iso_process is not None:
+            iso_processes[iso_process_id] = iso_process
+
+    return iso_processes
+
+
+def load_iso_processes(db_connection: PooledMySQLConnection) -> List[models.VCSISOProcess]:
+    logger.debug(f'Loading the ISO process catalog.')
+
     select_statement = MySQLStatementBuilder(db_connection)
-    result = select_statement \
+    results = select_statement \
         .select(CVS_ISO_PROCESS_TABLE, CVS_ISO_PROCESS_COLUMNS) \
-        .where(f'id = %s', [iso_process_id]) \
-        .execute(FetchType.FETCH_ONE, dictionary=True)
+        .order_by(['id'], Sort.ASCENDING) \
+        .execute(FetchType.FETCH_ALL, dictionary=True)
+
+    return [populate_iso_process(res) for res in results]
 
-    if result is None:
-        raise exceptions.ISOProcessNotFoundException
 
-    return populate_iso_process(result)
+def get_iso_process_checksum(db_connection: PooledMySQLConnection) -> int:
+    with db_connection.cursor() as cursor:
+        cursor.execute(f'CHECKSUM TABLE {CVS_ISO_PROCESS_TABLE}')
+        return cursor.fetchall()[0][1]
 
 
 def populate_iso_process(db_result):
@@ -493,6 +608,9 @@ def populate_iso_process(db_result):
     )
 
 
+iso_process_catalog = ISOProcessCatalog(load_iso_processes, get_iso_process_checksum)
+
+
 # ======================================================================================================================
 # VCS Subprocesses
 # ======================================================================================================================
@@ -543,6 +661,23 @@ def get_subprocess(db_connection: PooledMySQLConnection, project_id: int, subpro
     return populate_subprocess(res)
 
 
+def get_subprocesses_by_id(db_connection: PooledMySQLConnection,
+                           subprocess_ids: Iterable[int]) -> Dict[int, models.VCSSubprocess]:
+    subprocess_ids = list(subprocess_ids)
+    if len(subprocess_ids) == 0:
+        return {}
+
+    query = f'SELECT cvs_subprocesses.id, cvs_subprocesses.vcs, cvs_subprocesses.name, \
+        cvs_subprocesses.iso_process, cvs_iso_processes.name as iso_process_name, category \
+        FROM cvs_subprocesses INNER JOIN cvs_iso_processes ON iso_process = cvs_iso_processes.id \
+        WHERE cvs_subprocesses.id IN ({",".join(["%s" for _ in subprocess_ids])})'
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(query, subprocess_ids)
+        res = [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+
+    return {result['id']: populate_subprocess(result) for result in res}
+
+
 def create_subprocess(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int,
                       subprocess_post: models.VCSSubprocessPost) -> models.VCSSubprocess:
     logger.debug(f'Creating a subprocesses.')
@@ -706,6 +841,40 @@ def get_all_stakeholder_needs(db_connection: PooledMySQLConnection, vcs_row_id:
     return [populate_stakeholder_need(db_connection, result) for result in results]
 
 
+def get_stakeholder_needs_by_row(db_connection: PooledMySQLConnection,
+                                 vcs_row_ids: List[int]) -> Dict[int, List[models.StakeholderNeed]]:
+    """
+    Fetches the stakeholder needs of many vcs rows, together with their value drivers, in two queries.
+    """
+    if len(vcs_row_ids) == 0:
+        return {}
+
+    try:
+        select_statement = MySQLStatementBuilder(db_connection)
+        results = select_statement \
+            .select(CVS_VCS_STAKEHOLDER_NEED_TABLE, CVS_VCS_STAKEHOLDER_NEED_COLUMNS) \
+            .where(f'vcs_row IN ({",".join(["%s" for _ in vcs_row_ids])})', vcs_row_ids) \
+            .order_by(['id'], Sort.ASCENDING) \
+            .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise exceptions.VCSTableRowNotFoundException
+
+    need_drivers = get_vcs_need_drivers_by_need(db_connection, [result['id'] for result in results])
+
+    needs = {}
+    for result in results:
+        needs.setdefault(result['vcs_row'], []).append(models.StakeholderNeed(
+            id=result['id'],
+            need=result['need'],
+            value_dimension=result['value_dimension'],
+            value_drivers=need_drivers.get(result['id'], []),
+            rank_weight=result['rank_weight']
+        ))
+
+    return needs
+
+
 def create_stakeholder_need(db_connection: PooledMySQLConnection, vcs_row_id: int,
                             need: models.StakeholderNeedPost) -> int:
     logger.debug(f'Creating stakeholder need for vcs row with id={vcs_row_id}')
@@ -774,6 +943,84 @@ def delete_stakeholder_need(db_connection: PooledMySQLConnection, need_id: int)
     return True
 
 
+def get_stakeholder_need_rows(db_connection: PooledMySQLConnection, vcs_row_ids: List[int]) -> Dict[int, dict]:
+    """
+    Fetches the stakeholder needs of many vcs rows, without their value drivers, in one query.
+    """
+    if len(vcs_row_ids) == 0:
+        return {}
+
+    select_statement = MySQLStatementBuilder(db_connection)
+    results = select_statement \
+        .select(CVS_VCS_STAKEHOLDER_NEED_TABLE, CVS_VCS_STAKEHOLDER_NEED_COLUMNS) \
+        .where(f'vcs_row IN ({",".join(["%s" for _ in vcs_row_ids])})', vcs_row_ids) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
+
+    return {result['id']: result for result in results}
+
+
+def create_multiple_stakeholder_needs(db_connection: PooledMySQLConnection,
+                                      needs: List[Tuple[int, models.StakeholderNeedPost]]) -> List[int]:
+    logger.debug(f'Creating {len(needs)} stakeholder needs.')
+
+    if len(needs) == 0:
+        return []
+
+    prepared_list = []
+    try:
+        insert_statement = f'INSERT INTO {CVS_VCS_STAKEHOLDER_NEED_TABLE} ' \
+                           f'(vcs_row, need, value_dimension, rank_weight) VALUES '
+        for vcs_row_id, need in needs:
+            insert_statement += f'(%s,%s,%s,%s),'
+            prepared_list += [vcs_row_id, need.need, need.value_dimension, need.rank_weight]
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(insert_statement[:-1], prepared_list)
+            insert_id = cursor.lastrowid
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise exceptions.VCSStakeholderNeedFailedCreationException
+
+    # The ids of the rows of a multi-row insert are consecutive
+    return [insert_id + i for i in range(len(needs))]
+
+
+def update_stakeholder_needs(db_connection: PooledMySQLConnection,
+                             needs: List[Tuple[int, models.StakeholderNeedPost]]) -> bool:
+    logger.debug(f'Updating {len(needs)} stakeholder needs.')
+
+    if len(needs) == 0:
+        return True
+
+    try:
+        update_statement = f'UPDATE {CVS_VCS_STAKEHOLDER_NEED_TABLE} ' \
+                           f'SET vcs_row = %s, need = %s, value_dimension = %s, rank_weight = %s WHERE id = %s'
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.executemany(update_statement, [[vcs_row_id, need.need, need.value_dimension, need.rank_weight,
+                                                   need.id] for vcs_row_id, need in needs])
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise exceptions.VCSStakeholderNeedFailedToUpdateException
+
+    return True
+
+
+def delete_stakeholder_needs(db_connection: PooledMySQLConnection, need_ids: List[int]) -> bool:
+    logger.debug(f'Delete {len(need_ids)} stakeholder needs.')
+
+    if len(need_ids) == 0:
+        return True
+
+    delete_statement = MySQLStatementBuilder(db_connection)
+    _, rows = delete_statement.delete(CVS_VCS_STAKEHOLDER_NEED_TABLE) \
+        .where(f'id IN ({",".join(["%s" for _ in need_ids])})', need_ids) \
+        .execute(return_affected_rows=True)
+
+    if rows != len(need_ids):
+        raise exceptions.VCSStakeholderNeedFailedDeletionException
+
+    return True
+
+
 # ======================================================================================================================
 # VCS Rows
 # ======================================================================================================================
@@ -790,7 +1037,48 @@ def get_vcs_table(db_connection: PooledMySQLConnection, project_id: int, vcs_id:
         .order_by(['index'], Sort.ASCENDING) \
         .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
 
-    return [populate_vcs_row(db_connection, project_id, result) for result in results]
+    return populate_vcs_rows(db_connection, results)
+
+
+def populate_vcs_rows(db_connection: PooledMySQLConnection, db_results) -> List[models.VcsRow]:
+    """
+    Populates the models of many table rows at once. The processes, stakeholder needs and need drivers of all rows
+    are fetched with one query each, independent of the number of rows, and assembled in memory.
+    All rows have to belong to the same, already checked, VCS.
+    """
+    logger.debug(f'Populating models for {len(db_results)} table rows.')
+
+    iso_processes = get_iso_processes_by_id(db_connection, {res['iso_process'] for res in db_results
+                                                            if res['iso_process'] is not None})
+    subprocesses = get_subprocesses_by_id(db_connection, {res['subprocess'] for res in db_results
+                                                         if res['iso_process'] is None
+                                                         and res['subprocess'] is not None})
+    needs = get_stakeholder_needs_by_row(db_connection, [res['id'] for res in db_results])
+
+    table = []
+    for res in db_results:
+        iso_process, subprocess = None, None
+        if res['iso_process'] is not None:
+            iso_process = iso_processes.get(int(res['iso_process']))
+            if iso_process is None:
+                raise exceptions.ISOProcessNotFoundException
+        elif res['subprocess'] is not None:
+            subprocess = subprocesses.get(res['subprocess'])
+            if subprocess is None:
+                raise exceptions.SubprocessNotFoundException(res['subprocess'])
+
+        table.append(models.VcsRow(
+            id=res['id'],
+            vcs_id=res['vcs'],
+            index=res['index'],
+            stakeholder=res['stakeholder'],
+            stakeholder_expectations=res['stakeholder_expectations'],
+            stakeholder_needs=needs.get(res['id'], []),
+            iso_process=iso_process,
+            subprocess=subprocess
+        ))
+
+    return table
 
 
 def get_vcs_row(db_connection: PooledMySQLConnection, project_id: int, vcs_row_id: int) -> models.VcsRow:
@@ -856,88 +1144,176 @@ def create_vcs_row(db_connection: PooledMySQLConnection, row: models.VcsRowPost,
             raise exceptions.VCSTableRowFailedToUpdateException(e.msg)
 
 
-# TODO: Too big, split into smaller methods
 def edit_vcs_table(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int,
                    updated_vcs_rows: List[models.VcsRowPost]) -> bool:
+    """
+    Replaces the table of the vcs with the updated rows. The updated table is diffed in memory against the current
+    table, which is fetched in one snapshot, and only the differences are written, with one statement per table and
+    kind of change. Rows and stakeholder needs without an id, or whose id does not exist, are created. Rows and
+    stakeholder needs of the current table that are not in the updated table are deleted.
+    """
     logger.debug(f'Editing vcs table')
 
     get_vcs(db_connection, project_id, vcs_id)  # Check if VCS exists and belongs to project
 
+    for row in updated_vcs_rows:
+        if (row.iso_process is None) == (row.subprocess is None):
+            raise exceptions.VCSTableProcessAmbiguity
+
     updated_vcs_rows = remove_duplicate_names(db_connection, vcs_id, updated_vcs_rows)
 
-    new_table_ids = []
+    current_rows = get_vcs_table_rows(db_connection, vcs_id, [row.id for row in updated_vcs_rows if row.id])
+    if any(current_rows[row.id]['vcs'] != vcs_id for row in updated_vcs_rows if row.id in current_rows):
+        raise exceptions.VCSandVCSRowIDMismatchException
+
+    # Rows
+    new_rows, rows_to_update = [], []
+    for i, row in enumerate(updated_vcs_rows):
+        current = current_rows.get(row.id) if row.id else None
+        if current is None:
+            new_rows.append(i)
+        elif get_vcs_row_values(row) != tuple(current[column] for column in CVS_VCS_ROWS_COLUMNS[2:]):
+            rows_to_update.append(row)
+
+    table_ids = [row.id for row in updated_vcs_rows if row.id in current_rows]
+    rows_to_delete = [row_id for row_id, row in current_rows.items()
+                      if row['vcs'] == vcs_id and row_id not in table_ids]
+
+    delete_vcs_rows(db_connection, vcs_id, rows_to_delete)
+    update_vcs_rows(db_connection, vcs_id, rows_to_update)
+    created_ids = create_vcs_rows(db_connection, vcs_id, [updated_vcs_rows[i] for i in new_rows])
+    life_cycle_storage.create_multiple_process_nodes(db_connection, vcs_id, created_ids)
+
+    row_ids = [row.id for row in updated_vcs_rows]
+    for i, vcs_row_id in zip(new_rows, created_ids):
+        row_ids[i] = vcs_row_id
+
+    # Stakeholder needs and their value drivers
+    current_needs = get_stakeholder_need_rows(db_connection, table_ids)
+    current_drivers = get_need_driver_ids(db_connection, list(current_needs.keys()))
+
+    needs_to_update, needs_to_create, need_ids = [], [], set()
+    drivers_to_delete, drivers_to_add = [], []
+    for vcs_row_id, row in zip(row_ids, updated_vcs_rows):
+        for need in row.stakeholder_needs or []:
+            current = current_needs.get(need.id) if need.id else None
+            if current is None:
+                needs_to_create.append((vcs_row_id, need))
+                continue
+
+            need_ids.add(need.id)
+            if (vcs_row_id, need.need, need.value_dimension, need.rank_weight) != \
+                    (current['vcs_row'], current['need'], current['value_dimension'], current['rank_weight']):
+                needs_to_update.append((vcs_row_id, need))
+
+            drivers = set(need.value_drivers or [])
+            curr_drivers = current_drivers.get(need.id, set())
+            drivers_to_delete += [(need.id, vd_id) for vd_id in sorted(curr_drivers - drivers)]
+            drivers_to_add += [(need.id, vd_id) for vd_id in sorted(drivers - curr_drivers)]
+
+    needs_to_delete = [need_id for need_id in current_needs if need_id not in need_ids]
+    delete_stakeholder_needs(db_connection, needs_to_delete)
+    update_stakeholder_needs(db_connection, needs_to_update)
+    created_need_ids = create_multiple_stakeholder_needs(db_connection, needs_to_create)
+    for need_id, (_, need) in zip(created_need_ids, needs_to_create):
+        drivers_to_add += [(need_id, vd_id) for vd_id in dict.fromkeys(need.value_drivers or [])]
+
+    delete_vcs_needs_drivers(db_connection, drivers_to_delete)
+    add_vcs_multiple_needs_drivers(db_connection, drivers_to_add)
+
+    # The value drivers of the project have changed, so the formulas may refer to other value drivers now
+    if len(rows_to_delete) > 0 or len(needs_to_delete) > 0 or len(drivers_to_delete) > 0 or len(drivers_to_add) > 0:
+        formula_references.refresh_formula_references(db_connection, [project_id])
 
-    for row in updated_vcs_rows:
+    return True
 
-        if row.iso_process is None and row.subprocess is None:
-            raise exceptions.VCSTableProcessAmbiguity
-        elif row.iso_process is not None and row.subprocess is not None:
-            raise exceptions.VCSTableProcessAmbiguity
 
-        count = 0
-        vcs_check = 0
-        if row.id:
-            count_statement = MySQLStatementBuilder(db_connection)
-            count_result = count_statement.count(CVS_VCS_ROWS_TABLE) \
-                .where(f'id = %s', [row.id]) \
-                .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
-            count = count_result['count']
+def get_vcs_row_values(row: models.VcsRowPost) -> tuple:
+    return row.index, row.stakeholder, row.stakeholder_expectations, row.iso_process, row.subprocess
 
-            count_statement = MySQLStatementBuilder(db_connection)
-            count_result = count_statement.count(CVS_VCS_ROWS_TABLE) \
-                .where(f'id = %s and vcs = %s', [row.id, vcs_id]) \
-                .execute(fetch_type=FetchType.FETCH_ONE, dictionary=True)
-            vcs_check = count_result['count']
 
-        if count > 0 and vcs_check == 0:
-            raise exceptions.VCSandVCSRowIDMismatchException
+def get_vcs_table_rows(db_connection: PooledMySQLConnection, vcs_id: int, row_ids: List[int]) -> Dict[int, dict]:
+    """
+    Fetches the rows of the vcs, and the rows with the given ids whatever vcs they belong to, in one query.
+    """
+    where_statement = 'vcs = %s'
+    if len(row_ids) > 0:
+        where_statement += f' OR id IN ({",".join(["%s" for _ in row_ids])})'
 
-        vcs_row_id = row.id
+    select_statement = MySQLStatementBuilder(db_connection)
+    results = select_statement \
+        .select(CVS_VCS_ROWS_TABLE, CVS_VCS_ROWS_COLUMNS) \
+        .where(where_statement, [vcs_id] + row_ids) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
 
-        if row.id and count > 0:
-            update_statement = MySQLStatementBuilder(db_connection)
-            update_statement.update(
-                table=CVS_VCS_ROWS_TABLE,
-                set_statement=f'`index` = %s, stakeholder = %s, stakeholder_expectations = %s, iso_process = %s, '
-                              f'subprocess = %s, vcs = %s',
-                values=[row.index, row.stakeholder, row.stakeholder_expectations, row.iso_process, row.subprocess,
-                        vcs_id]
-            )
-            update_statement.where(f'id = %s', [row.id])
-            _, rows = update_statement.execute(return_affected_rows=True)
-        else:
-            vcs_row_id: int = create_vcs_row(db_connection, row, vcs_id)
-            node = life_cycle_models.ProcessNodePost(
-                pos_x=0,
-                pos_y=0,
-                vcs_row_id=vcs_row_id
-            )
-            life_cycle_storage.create_process_node(db_connection, project_id, vcs_id, node)
+    return {result['id']: result for result in results}
 
-        new_table_ids.append(vcs_row_id)
 
-        curr_needs = get_all_stakeholder_needs(db_connection, vcs_row_id)
-        new_need_ids = []
+def create_vcs_rows(db_connection: PooledMySQLConnection, vcs_id: int, rows: List[models.VcsRowPost]) -> List[int]:
+    logger.debug(f'Creating {len(rows)} rows for VCS with id={vcs_id}.')
 
-        if row.stakeholder_needs is not None:
-            for need in row.stakeholder_needs:
-                new_need_ids.append(need.id)
-                update_stakeholder_need(db_connection, vcs_row_id, need, need.id)
+    if len(rows) == 0:
+        return []
 
-        for need in curr_needs:
-            if need.id not in new_need_ids:
-                delete_stakeholder_need(db_connection, need.id)
+    prepared_list = []
+    try:
+        insert_statement = f'INSERT INTO {CVS_VCS_ROWS_TABLE} (`vcs`, `index`, `stakeholder`, ' \
+                           f'`stakeholder_expectations`, `iso_process`, `subprocess`) VALUES '
+        for row in rows:
+            insert_statement += f'(%s,%s,%s,%s,%s,%s),'
+            prepared_list += [vcs_id, *get_vcs_row_values(row)]
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(insert_statement[:-1], prepared_list)
+            insert_id = cursor.lastrowid
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise_vcs_row_exception(e)
+
+    # The ids of the rows of a multi-row insert are consecutive
+    return [insert_id + i for i in range(len(rows))]
+
+
+def update_vcs_rows(db_connection: PooledMySQLConnection, vcs_id: int, rows: List[models.VcsRowPost]) -> bool:
+    logger.debug(f'Updating {len(rows)} rows of VCS with id={vcs_id}.')
 
-    curr_table = get_vcs_table(db_connection, project_id, vcs_id)
+    if len(rows) == 0:
+        return True
+
+    try:
+        update_statement = f'UPDATE {CVS_VCS_ROWS_TABLE} SET `index` = %s, stakeholder = %s, ' \
+                           f'stakeholder_expectations = %s, iso_process = %s, subprocess = %s ' \
+                           f'WHERE id = %s AND vcs = %s'
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.executemany(update_statement, [[*get_vcs_row_values(row), row.id, vcs_id] for row in rows])
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise_vcs_row_exception(e)
+
+    return True
+
+
+def raise_vcs_row_exception(error: Error):
+    if 'iso_process' in error.msg:
+        raise exceptions.ISOProcessNotFoundException
+    elif 'subprocess' in error.msg:
+        raise exceptions.SubprocessNotFoundException
+    else:
+        raise exceptions.VCSTableRowFailedToUpdateException(error.msg)
+
+
+def delete_vcs_rows(db_connection: PooledMySQLConnection, vcs_id: int, row_ids: List[int]) -> bool:
+    logger.debug(f'Deleting {len(row_ids)} rows of VCS with id={vcs_id}.')
+
+    if len(row_ids) == 0:
+        return True
+
+    delete_statement = MySQLStatementBuilder(db_connection)
+    _, rows = delete_statement.delete(CVS_VCS_ROWS_TABLE) \
+        .where(f'vcs = %s AND id IN ({",".join(["%s" for _ in row_ids])})', [vcs_id] + row_ids) \
+        .execute(return_affected_rows=True)
 
-    for row in curr_table:
-        if row.id not in new_table_ids:
-            delete_statement = MySQLStatementBuilder(db_connection)
-            res, rows = delete_statement.delete(CVS_VCS_ROWS_TABLE) \
-                .where('id = %s and vcs = %s', [row.id, vcs_id]) \
-                .execute(return_affected_rows=True, fetch_type=FetchType.FETCH_ONE)
-            if rows == 0:
-                raise exceptions.VCSTableRowFailedDeletionException
+    if rows != len(row_ids):
+        raise exceptions.VCSTableRowFailedDeletionException
 
     return True
 
@@ -945,22 +1321,20 @@ def edit_vcs_table(db_connection: PooledMySQLConnection, project_id: int, vcs_id
 def remove_duplicate_names(db_connection: PooledMySQLConnection, vcs_id: int,
                            rows: List[models.VcsRowPost]):
 
+    rows_by_process: Dict[int, List[int]] = {}
+    for i, row in enumerate(rows):
+        if row.iso_process:
+            rows_by_process.setdefault(row.iso_process, []).append(i)
+
     new_subprocesses: List[Tuple[int, models.VCSSubprocessPost]] = []
-    done = []
-    for i in range(0, len(rows)):
-        dupes: List[Tuple[int, models.VCSSubprocessPost]] = []
-        if i in done:
+    for iso_process_id, indices in rows_by_process.items():
+        if len(indices) < 2:
             continue
-        for j in range(i + 1, len(rows)):
-            if rows[i].iso_process is None:
-                break
-            if rows[i].iso_process and rows[i].iso_process == rows[j].iso_process:
-                process = get_iso_process(rows[i].iso_process, db_connection)
-                sub = models.VCSSubprocessPost(name=process.name + " (" + str(len(dupes) + 1) + ")",
-                                               parent_process_id=process.id)
-                dupes.append((j, sub))
-                new_subprocesses.append((j, sub))
-                done.append(j)
+        process = get_iso_process(iso_process_id, db_connection)
+        for dupe, j in enumerate(indices[1:]):
+            sub = models.VCSSubprocessPost(name=process.name + " (" + str(dupe + 1) + ")",
+                                           parent_process_id=process.id)
+            new_subprocesses.append((j, sub))
 
     subprocesses = create_multiple_subprocesses(db_connection, vcs_id, new_subprocesses)
 
@@ -982,76 +1356,106 @@ def remove_duplicate_names(db_connection: PooledMySQLConnection, vcs_id: int,
 # Duplicate a vcs n times
 def duplicate_vcs(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int, n: int) -> List[models.VCS]:
     vcs = get_vcs(db_connection, project_id, vcs_id)
-    vcs_list = []
-    for i in range(n):
-        vcs_post = models.VCSPost(
-            name=f'{vcs.name} ({i + 1})',
-            description=vcs.description,
-            year_from=vcs.year_from,
-            year_to=vcs.year_to
-        )
-        new_vcs = create_vcs(db_connection, vcs.project.id, vcs_post)
-        vcs_list.append(new_vcs)
-    return vcs_list
-
+    if n <= 0:
+        return []
 
-def duplicate_stakeholder_need(db_connection: PooledMySQLConnection, vcs_row_id: int,
-                               needs: List[models.StakeholderNeed]) -> bool:
-    for need in needs:
-        try:
-            insert_statement = MySQLStatementBuilder(db_connection)
-            insert_statement \
-                .insert(table=CVS_VCS_STAKEHOLDER_NEED_TABLE,
-                        columns=['vcs_row', 'need', 'value_dimension', 'rank_weight']) \
-                .set_values([vcs_row_id, need.need, need.value_dimension, need.rank_weight]) \
-                .execute(fetch_type=FetchType.FETCH_NONE)
-            need_id = insert_statement.last_insert_id
-
-            for vd in need.value_drivers:
-                add_vcs_need_driver(db_connection, need_id, vd.id)
-        except Error as e:
-            logger.debug(f'Error msg: {e.msg}')
-            raise exceptions.VCSNotFoundException
+    prepared_list = []
+    insert_statement = f'INSERT INTO {CVS_VCS_TABLE} (name, description, year_from, year_to, project) VALUES '
+    for i in range(n):
+        insert_statement += f'(%s,%s,%s,%s,%s),'
+        prepared_list += [f'{vcs.name} ({i + 1})', vcs.description, vcs.year_from, vcs.year_to, vcs.project.id]
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(insert_statement[:-1], prepared_list)
+        insert_id = cursor.lastrowid
 
-    return True
+    # The ids of the rows of a multi-row insert are consecutive
+    vcs_ids = [insert_id + i for i in range(n)]
+    select_statement = MySQLStatementBuilder(db_connection)
+    results = select_statement.select(CVS_VCS_TABLE, CVS_VCS_COLUMNS) \
+        .where(f'id IN ({",".join(["%s" for _ in vcs_ids])})', vcs_ids) \
+        .order_by(['id'], Sort.ASCENDING) \
+        .execute(fetch_type=FetchType.FETCH_ALL, dictionary=True)
 
+    return [models.VCS(
+        id=result['id'],
+        name=result['name'],
+        description=result['description'],
+        project=vcs.project,
+        datetime_created=result['datetime_created'],
+        year_from=result['year_from'],
+        year_to=result['year_to'],
+    ) for result in results]
+
+
+def get_copy_map(table: str, copy_ids: List[int], vcs_column: str = 'vcs', join: str = '',
+                 order_by: str = None) -> str:
+    """
+    A query that maps the ids of the rows of table that belong to a vcs to the ids of their copies in the copies
+    of the vcs, as (old_id, new_id). The copies are inserted with INSERT ... SELECT in the order of the ids of the
+    originals, and auto increment ids grow in insertion order, so the k:th original of the vcs is copied to the k:th
+    row of each copy. Takes the vcs id and then copy_ids as parameters.
+
+    :param order_by: The order in which the originals were copied, their ids by default
+    """
+    if order_by is None:
+        order_by = f'{table}.id'
+    copies = ",".join(["%s" for _ in copy_ids])
+    return f'SELECT originals.id AS old_id, copies.id AS new_id ' \
+           f'FROM (SELECT {table}.id, ROW_NUMBER() OVER (ORDER BY {order_by}) AS seq ' \
+           f'FROM {table} {join} WHERE {vcs_column} = %s) AS originals ' \
+           f'INNER JOIN (SELECT {table}.id, ROW_NUMBER() OVER (PARTITION BY {vcs_column} ORDER BY {table}.id) AS seq ' \
+           f'FROM {table} {join} WHERE {vcs_column} IN ({copies})) AS copies ON copies.seq = originals.seq'
+
+
+# Duplicate the table of a vcs into each of the copies of the vcs
+def duplicate_vcs_table(db_connection: PooledMySQLConnection, vcs_id: int, copy_ids: List[int]) -> bool:
+    logger.debug(f'Duplicate table of vcs with id={vcs_id} into {len(copy_ids)} vcss')
+
+    copies = ",".join(["%s" for _ in copy_ids])
+    try:
+        with db_connection.cursor(prepared=True) as cursor:
+            cursor.execute(f'INSERT INTO {CVS_VCS_ROWS_TABLE} '
+                           f'(vcs, `index`, stakeholder, stakeholder_expectations, iso_process, subprocess) '
+                           f'SELECT copies.id, r.`index`, r.stakeholder, r.stakeholder_expectations, r.iso_process, '
+                           f'r.subprocess FROM {CVS_VCS_ROWS_TABLE} r '
+                           f'INNER JOIN {CVS_VCS_TABLE} copies ON copies.id IN ({copies}) '
+                           f'WHERE r.vcs = %s ORDER BY copies.id, r.id', copy_ids + [vcs_id])
+
+            cursor.execute(f'INSERT INTO {CVS_VCS_STAKEHOLDER_NEED_TABLE} '
+                           f'(vcs_row, need, value_dimension, rank_weight) '
+                           f'SELECT row_map.new_id, n.need, n.value_dimension, n.rank_weight '
+                           f'FROM {CVS_VCS_STAKEHOLDER_NEED_TABLE} n '
+                           f'INNER JOIN ({get_copy_map(CVS_VCS_ROWS_TABLE, copy_ids)}) AS row_map '
+                           f'ON row_map.old_id = n.vcs_row ORDER BY row_map.new_id, n.id', [vcs_id] + copy_ids)
+
+            # The needs of the copies were inserted in the order of the rows of the originals
+            need_map = get_copy_map(CVS_VCS_STAKEHOLDER_NEED_TABLE, copy_ids, vcs_column='r.vcs',
+                                    join=f'INNER JOIN {CVS_VCS_ROWS_TABLE} r '
+                                         f'ON r.id = {CVS_VCS_STAKEHOLDER_NEED_TABLE}.vcs_row',
+                                    order_by=f'r.id, {CVS_VCS_STAKEHOLDER_NEED_TABLE}.id')
+            cursor.execute(f'INSERT INTO {CVS_VCS_NEED_DRIVERS_TABLE} (stakeholder_need, value_driver) '
+                           f'SELECT need_map.new_id, d.value_driver FROM {CVS_VCS_NEED_DRIVERS_TABLE} d '
+                           f'INNER JOIN ({need_map}) AS need_map ON need_map.old_id = d.stakeholder_need',
+                           [vcs_id] + copy_ids)
+    except Error as e:
+        logger.debug(f'Error msg: {e.msg}')
+        raise exceptions.VCSNotFoundException
 
-# Duplicate vcs table
-def duplicate_vcs_table(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int,
-                        table: List[models.VcsRow]) -> bool:
-    for row in table:
-        try:
-            insert_statement = MySQLStatementBuilder(db_connection)
-            insert_statement \
-                .insert(table=CVS_VCS_ROWS_TABLE,
-                        columns=['vcs', 'index', 'stakeholder', 'stakeholder_expectations', 'iso_process',
-                                 'subprocess']) \
-                .set_values([vcs_id, row.index, row.stakeholder, row.stakeholder_expectations,
-                             row.iso_process.id if row.iso_process is not None else None,
-                             row.subprocess.id if row.subprocess is not None else None]) \
-                .execute(fetch_type=FetchType.FETCH_NONE)
-            row_id = insert_statement.last_insert_id
-            duplicate_stakeholder_need(db_connection, row_id, row.stakeholder_needs)
-            node = life_cycle_models.ProcessNodePost(
-                pos_x=0,
-                pos_y=0,
-                vcs_row_id=row_id
-            )
-            life_cycle_storage.create_process_node(db_connection, project_id, vcs_id, node)
-        except Error as e:
-            logger.debug(f'Error msg: {e.msg}')
-            raise exceptions.VCSNotFoundException
+    life_cycle_storage.create_vcs_process_nodes(db_connection, copy_ids)
 
     return True
 
 
 def duplicate_whole_vcs(db_connection: PooledMySQLConnection, project_id: int, vcs_id: int, n: int) -> List[models.VCS]:
+    """
+    Duplicates the vcs n times, together with its table, stakeholder needs and their value drivers. The copies are
+    made with a fixed number of INSERT ... SELECT statements, independent of n and the size of the table.
+    """
     logger.debug(f'Duplicate vcs with id = {vcs_id}, {n} times')
 
-    table = get_vcs_table(db_connection, project_id, vcs_id)
-
     vcs_list = duplicate_vcs(db_connection, project_id, vcs_id, n)
 
-    [duplicate_vcs_table(db_connection, project_id, vcs.id, table) for vcs in vcs_list]
+    if len(vcs_list) > 0:
+        duplicate_vcs_table(db_connection, vcs_id, [vcs.id for vcs in vcs_list])
 
     return vcs_list
@@ -0,0 +1,58 @@
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+class Loader(object):
+    """
+    A DataLoader style loader of one kind of entity, with an identity map per database connection. The
+    implementation functions check out one connection per request, so an entity that is looked up repeatedly
+    within a request is fetched once, and the map is dropped together with the connection.
+
+    Lookups of many keys are coalesced into a single call of batch_load with the keys that are not in the map yet,
+    so that storage functions can fetch them with one IN (...) query. Keys that are not found are not kept, so that
+    the callers can raise their not found exceptions. Storage functions that change an entity must clear it.
+    """
+
+    def __init__(self, batch_load: Callable[[Any, List[Hashable]], Dict[Hashable, Any]]):
+        self.batch_load = batch_load
+        self._maps = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def load(self, db_connection, key: Hashable) -> Optional[Any]:
+        return self.load_many(db_connection, [key]).get(key)
+
+    def load_many(self, db_connection, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        keys = list(dict.fromkeys(keys))
+        identity_map = self._get_map(db_connection)
+        if identity_map is None:
+            return self.batch_load(db_connection, keys) if len(keys) > 0 else {}
+
+        missing = [key for key in keys if key not in identity_map]
+        if len(missing) > 0:
+            identity_map.update(self.batch_load(db_connection, missing))
+        return {key: identity_map[key] for key in keys if key in identity_map}
+
+    def prime(self, db_connection, key: Hashable, value: Any):
+        identity_map = self._get_map(db_connection)
+        if identity_map is not None:
+            identity_map[key] = value
+
+    def clear(self, db_connection, key: Hashable = None):
+        """
+        Drops the entity with the key, or all entities if there is no key, from the map of the connection.
+        """
+        identity_map = self._get_map(db_connection)
+        if identity_map is None:
+            return
+        if key is None:
+            identity_map.clear()
+        else:
+            identity_map.pop(key, None)
+
+    def _get_map(self, db_connection) -> Optional[dict]:
+        try:
+            with self._lock:
+                return self._maps.setdefault(db_connection, {})
+        except TypeError:  # Connections that can not be weakly referenced are not mapped
+            return None
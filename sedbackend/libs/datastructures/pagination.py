@@ -1,4 +1,4 @@
-from typing import TypeVar, Generic, List
+from typing import TypeVar, Generic, List, Optional, Tuple
 
 from pydantic.generics import GenericModel
 
@@ -8,3 +8,39 @@ T = TypeVar('T')
 class ListChunk(GenericModel, Generic[T]):
     chunk: List[T]
     length_total: int
+
+
+def fetch_keyset_page(db_connection, table: str, columns: List[str], where: str, values: list,
+                      limit: Optional[int] = None, after_id: Optional[int] = None,
+                      key: str = 'id') -> Tuple[List[dict], int]:
+    """
+    Fetches one page of the rows of table that match where, ordered on key, together with the number of rows that
+    match where on all pages. The page starts after the row whose key is after_id and has at most limit rows, or
+    all of the remaining rows if there is no limit. The page is selected on the key rather than an offset, so rows
+    are neither skipped nor repeated when rows are added or removed between pages, and the database only reads the
+    rows of the page from the index on key.
+
+    The total is counted with a separate COUNT(*) query, unless the page starts at the first row and holds all of
+    the rows.
+
+    :return: The rows of the page and the total number of rows
+    """
+    page_where, page_values = f'({where})', list(values)
+    if after_id is not None:
+        page_where += f' AND `{key}` > %s'
+        page_values.append(after_id)
+    query = f'SELECT {",".join(f"`{column}`" for column in columns)} FROM {table} WHERE {page_where} ' \
+            f'ORDER BY `{key}` ASC'
+    if limit is not None:
+        query += f' LIMIT {int(limit)}'
+
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(query, page_values)
+        rows = [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+
+    if after_id is None and (limit is None or len(rows) < limit):
+        return rows, len(rows)
+
+    with db_connection.cursor(prepared=True) as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', list(values))
+        return rows, cursor.fetchall()[0][0]
@@ -0,0 +1,194 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sedbackend.libs.formula_parser.parser import NumericStringParser
+
+
+# Matches the quoted variables of a formula, e.g. "VD(Speed [km/h])" and "EF(Price [SEK])". All other quoted
+# strings are matched by the second alternative and evaluate to 0, the same as remove_strings_replace_zero.
+VARIABLE_PATTERN = re.compile(r'\"(VD|EF)\((.*?)\)\"|\".*?\"')
+
+BINARY_OPERATORS = {'+': '+', '-': '-', '*': '*', '/': '/', '^': '**'}
+
+# Element-wise versions of the functions in NumericStringParser.fn
+BATCH_FUNCTIONS = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'abs': np.abs,
+    'trunc': np.trunc,
+    'round': np.round,
+    'sgn': lambda a: np.where(np.abs(a) > 1e-12, np.sign(a), 0)
+}
+
+
+class CompiledFormula(object):
+    """
+    A formula that has been parsed once and can be evaluated any number of times against different variable
+    bindings. Value drivers, market inputs and plain names (such as time) are stored as slots instead of being
+    substituted into the string before every evaluation.
+    """
+
+    def __init__(self, formula: str, source: str, slots: List[Tuple[Optional[str], str]], constants: List[float],
+                 fn: dict):
+        self.formula = formula
+        self.source = source
+        self.slots = slots
+        self.constants = constants
+
+        self._function = self._build_function(fn)
+        self._batch_function = None
+
+    def _build_function(self, fn: dict):
+        namespace = {'__builtins__': {}, 'c': tuple(self.constants)}
+        namespace.update({f'fn_{name}': f for name, f in fn.items()})
+        return eval(compile(f'lambda v: {self.source}', '<formula>', 'eval'), namespace)
+
+    def __reduce__(self):
+        names = tuple(name for prefix, name in self.slots if prefix is None)
+        return compile_formula, (self.formula, names)
+
+    @property
+    def vd_names(self) -> List[str]:
+        return [name for prefix, name in self.slots if prefix == 'VD']
+
+    @property
+    def mi_names(self) -> List[str]:
+        return [name for prefix, name in self.slots if prefix == 'EF']
+
+    @property
+    def names(self) -> List[str]:
+        return [name for prefix, name in self.slots if prefix is None]
+
+    def bind(self, vd_values: Dict[str, float] = None, mi_values: Dict[str, float] = None, **names) -> list:
+        """
+        Orders the given values after the slots of the formula. Variables without a value are bound to 0.
+
+        :param vd_values: Value driver values keyed on "name [unit]"
+        :param mi_values: Market input values keyed on "name [unit]"
+        :param names: Values for the plain names in the formula, e.g. time
+
+        :return list: The values of all slots
+        """
+        bindings = {'VD': vd_values or {}, 'EF': mi_values or {}, None: names}
+        return [bindings[prefix].get(name, 0) for prefix, name in self.slots]
+
+    def evaluate(self, vd_values: Dict[str, float] = None, mi_values: Dict[str, float] = None, **names):
+        """
+        Evaluates the formula.
+
+        :param vd_values: Value driver values keyed on "name [unit]"
+        :param mi_values: Market input values keyed on "name [unit]"
+        :param names: Values for the plain names in the formula, e.g. time
+
+        :return: The value of the formula
+        """
+        return self._function(self.bind(vd_values, mi_values, **names))
+
+    def evaluate_batch(self, size: int, vd_values: Dict[str, np.ndarray] = None, mi_values: Dict[str, np.ndarray] = None,
+                       **names) -> np.ndarray:
+        """
+        Evaluates the formula for several sets of values at once, e.g. for all designs in a design group. Each value
+        can either be an array with one value per set or a single value that is shared by all sets.
+
+        :param size: The number of sets
+        :param vd_values: Value driver values keyed on "name [unit]"
+        :param mi_values: Market input values keyed on "name [unit]"
+        :param names: Values for the plain names in the formula, e.g. time
+
+        :return np.ndarray: The value of the formula for each set
+        """
+        if self._batch_function is None:
+            self._batch_function = self._build_function(BATCH_FUNCTIONS)
+
+        values = [np.asarray(value, dtype=float) for value in self.bind(vd_values, mi_values, **names)]
+        with np.errstate(divide='raise', invalid='raise'):
+            result = self._batch_function(values)
+
+        return np.array(np.broadcast_to(result, (size,)), dtype=float)
+
+
+def matrix_bindings(names: List[str], matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Converts a matrix with one row per set of values and one column per variable into bindings for
+    CompiledFormula.evaluate_batch.
+
+    :param names: The variable names of the columns, "name [unit]"
+    :param matrix: The values, e.g. designs x value drivers
+
+    :return Dict[str, np.ndarray]:
+    """
+    return {name: matrix[:, i] for i, name in enumerate(names)}
+
+
+def compile_formula(formula: str, names: Tuple[str, ...] = (), parser: NumericStringParser = None) -> CompiledFormula:
+    """
+    Compiles a formula into a CompiledFormula. The result is evaluated exactly as NumericStringParser would
+    evaluate the formula after parse_formula has substituted the variables.
+
+    :param formula: The formula, e.g. 2*"VD(Speed [km/h])"+time
+    :param names: Plain names that are replaced by a slot, e.g. ('time',)
+    :param parser: Parser used to parse the formula. A new parser is created if none is given
+
+    :return CompiledFormula:
+    """
+    if parser is None:
+        parser = NumericStringParser()
+
+    slots: List[Tuple[Optional[str], str]] = []
+
+    def slot_token(prefix: Optional[str], name: str) -> str:
+        if (prefix, name) not in slots:
+            slots.append((prefix, name))
+        return f'${slots.index((prefix, name))}'
+
+    def replace_variable(match) -> str:
+        if match.group(1) is None:
+            return '0'
+        return slot_token(match.group(1), match.group(2))
+
+    if '$' in VARIABLE_PATTERN.sub('', formula):
+        raise ValueError(f'Invalid character in formula {formula}')
+
+    new_formula = VARIABLE_PATTERN.sub(replace_variable, formula)
+    for name in names:
+        if re.search(r'\b' + name + r'\b', new_formula):
+            new_formula = re.sub(r'\b' + name + r'\b', slot_token(None, name), new_formula)
+
+    constants: List[float] = []
+    source = _build_source(parser.parse(new_formula), parser.fn, constants)
+
+    return CompiledFormula(formula, source, slots, constants, parser.fn)
+
+
+def _build_source(stack: list, fn: dict, constants: List[float]) -> str:
+    """
+    Builds a python expression from a parsed formula. The operands are consumed from the stack in the same order as
+    NumericStringParser.evaluate_stack does, so that the expression gives the same result.
+    """
+    op = stack.pop()
+    if op == 'unary -':
+        return f'(-{_build_source(stack, fn, constants)})'
+    if op in BINARY_OPERATORS:
+        op2 = _build_source(stack, fn, constants)
+        op1 = _build_source(stack, fn, constants)
+        return f'({op1} {BINARY_OPERATORS[op]} {op2})'
+    elif op[0] == '$':
+        return f'v[{int(op[1:])}]'
+    elif op in fn:
+        return f'fn_{op}({_build_source(stack, fn, constants)})'
+
+    if op == 'PI':
+        value = math.pi
+    elif op == 'E':
+        value = math.e
+    elif op[0].isalpha():
+        value = 0
+    else:
+        value = float(op)
+
+    constants.append(value)
+    return f'c[{len(constants) - 1}]'
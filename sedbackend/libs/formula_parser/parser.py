@@ -32,7 +32,8 @@ class NumericStringParser(object):
         multop  :: '*' | '/'
         addop   :: '+' | '-'
         integer :: ['+' | '-'] '0'..'9'+
-        atom    :: PI | E | real | fn '(' expr ')' | '(' expr ')'
+        slot    :: '$' '0'..'9'+
+        atom    :: PI | E | real | slot | fn '(' expr ')' | '(' expr ')'
         factor  :: atom [ expop factor ]*
         term    :: factor [ multop factor ]*
         expr    :: term [ addop term ]*
@@ -43,6 +44,8 @@ class NumericStringParser(object):
                               pyp.Optional(point + pyp.Optional(pyp.Word(pyp.nums))) +
                               pyp.Optional(e + pyp.Word("+-" + pyp.nums, pyp.nums)))
         ident = pyp.Word(pyp.alphas, pyp.alphas + pyp.nums + "_$")
+        # Variable slots are only produced by the formula compiler, see compiler.py
+        slot = pyp.Combine(pyp.Literal("$") + pyp.Word(pyp.nums))
         plus = pyp.Literal("+")
         minus = pyp.Literal("-")
         mult = pyp.Literal("*")
@@ -55,7 +58,7 @@ class NumericStringParser(object):
         pi = pyp.CaselessLiteral("PI")
         expr = pyp.Forward()
         atom = ((pyp.Optional(pyp.oneOf("- +")) +
-                 (pi | e | fnumber | ident + lpar + expr + rpar).setParseAction(self.push_first))
+                 (pi | e | fnumber | slot | ident + lpar + expr + rpar).setParseAction(self.push_first))
                 | pyp.Optional(pyp.oneOf("- +")) + pyp.Group(lpar + expr + rpar)
                 ).setParseAction(self.push_u_minus)
         # by defining exponentiation as "atom [ ^ factor ]..." instead of 
@@ -105,6 +108,15 @@ class NumericStringParser(object):
         else:
             return float(op)
 
+    def parse(self, num_string, parse_all=True):
+        """
+        Parses a mathematical expression into a list of operands and operators in postfix order.
+
+        """
+        self.exprStack = []
+        self.bnf.parseString(num_string, parse_all)
+        return self.exprStack[:]
+
     def eval(self, num_string, parse_all=True):
         """
         Evaluates a mathematical expression consisting of numbers and mathematical operators. 
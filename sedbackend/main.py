@@ -4,6 +4,8 @@ from fastapi.middleware.cors import CORSMiddleware
 import sedbackend.main_router as api
 import sedbackend.setup as setup
 import sedbackend.env as env
+from sedbackend.apps.cvs.simulation.executor import simulation_executor
+from sedbackend.apps.cvs.simulation_job import implementation as simulation_job_impl
 
 
 # Parse environment variables
@@ -34,3 +36,13 @@ app.add_middleware(
 
 # Misc middleware
 setup.install_middleware(app)
+
+
+@app.on_event("startup")
+def recover_simulation_jobs():
+    simulation_job_impl.fail_unfinished_simulation_jobs()
+
+
+@app.on_event("shutdown")
+def shutdown_simulation_executor():
+    simulation_executor.shutdown()
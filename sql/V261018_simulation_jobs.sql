@@ -0,0 +1,32 @@
+# Simulation jobs that run in the background
+CREATE TABLE IF NOT EXISTS `seddb`.`cvs_simulation_jobs`
+(
+    `id`                INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    `project`           INT UNSIGNED NOT NULL,
+    `status`            VARCHAR(16)  NOT NULL DEFAULT 'pending',
+    `request`           LONGTEXT     NOT NULL,
+    `designs_completed` INT UNSIGNED NOT NULL DEFAULT 0,
+    `designs_total`     INT UNSIGNED NOT NULL DEFAULT 0,
+    `error`             TEXT         NULL     DEFAULT NULL,
+    `datetime_created`  DATETIME(3)  NOT NULL DEFAULT NOW(3),
+    `datetime_finished` DATETIME(3)  NULL     DEFAULT NULL,
+    PRIMARY KEY (`id`),
+    FOREIGN KEY (`project`)
+        REFERENCES `seddb`.`cvs_projects` (`id`)
+        ON DELETE CASCADE,
+    CONSTRAINT `check_job_status` CHECK (`status` IN ('pending', 'running', 'completed', 'failed', 'cancelled'))
+);
+
+# The result of each design in a simulation job, in the order they were simulated
+CREATE TABLE IF NOT EXISTS `seddb`.`cvs_simulation_job_results`
+(
+    `job`               INT UNSIGNED NOT NULL,
+    `index`             INT UNSIGNED NOT NULL,
+    `vcs`               INT UNSIGNED NOT NULL,
+    `design`            INT UNSIGNED NOT NULL,
+    `result`            LONGTEXT     NOT NULL,
+    PRIMARY KEY (`job`, `index`),
+    FOREIGN KEY (`job`)
+        REFERENCES `seddb`.`cvs_simulation_jobs` (`id`)
+        ON DELETE CASCADE
+);
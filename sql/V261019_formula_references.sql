@@ -0,0 +1,45 @@
+# The value drivers and market inputs referenced by the formulas of a vcs row are stored per design group
+ALTER TABLE `seddb`.`cvs_formulas_value_drivers`
+DROP FOREIGN KEY `cvs_formulas_value_drivers_ibfk_1`;
+ALTER TABLE `seddb`.`cvs_formulas_value_drivers`
+ADD COLUMN `design_group` INT UNSIGNED NOT NULL AFTER `formulas`,
+DROP PRIMARY KEY,
+ADD PRIMARY KEY (`formulas`, `design_group`, `value_driver`),
+ADD CONSTRAINT `cvs_formulas_value_drivers_ibfk_1`
+  FOREIGN KEY (`formulas`, `design_group`)
+  REFERENCES `seddb`.`cvs_design_mi_formulas` (`vcs_row`, `design_group`)
+  ON DELETE CASCADE;
+
+ALTER TABLE `seddb`.`cvs_formulas_market_inputs`
+DROP FOREIGN KEY `cvs_formulas_market_inputs_ibfk_1`;
+ALTER TABLE `seddb`.`cvs_formulas_market_inputs`
+ADD COLUMN `design_group` INT UNSIGNED NOT NULL AFTER `formulas`,
+DROP PRIMARY KEY,
+ADD PRIMARY KEY (`formulas`, `design_group`, `market_input`),
+ADD CONSTRAINT `cvs_formulas_market_inputs_ibfk_1`
+  FOREIGN KEY (`formulas`, `design_group`)
+  REFERENCES `seddb`.`cvs_design_mi_formulas` (`vcs_row`, `design_group`)
+  ON DELETE CASCADE;
+
+# Resolve the references of the formulas that were saved before
+INSERT IGNORE INTO `seddb`.`cvs_formulas_value_drivers` (`formulas`, `design_group`, `value_driver`)
+SELECT DISTINCT f.`vcs_row`, f.`design_group`, vd.`id`
+FROM `seddb`.`cvs_design_mi_formulas` f
+    INNER JOIN `seddb`.`cvs_vcs_rows` r ON r.`id` = f.`vcs_row`
+    INNER JOIN `seddb`.`cvs_vcss` v ON v.`id` = r.`vcs`
+    INNER JOIN `seddb`.`cvs_vcss` pv ON pv.`project` = v.`project`
+    INNER JOIN `seddb`.`cvs_vcs_rows` pr ON pr.`vcs` = pv.`id`
+    INNER JOIN `seddb`.`cvs_stakeholder_needs` sn ON sn.`vcs_row` = pr.`id`
+    INNER JOIN `seddb`.`cvs_vcs_need_drivers` nd ON nd.`stakeholder_need` = sn.`id`
+    INNER JOIN `seddb`.`cvs_value_drivers` vd ON vd.`id` = nd.`value_driver`
+WHERE INSTR(CONCAT_WS(' ', f.`time`, f.`cost`, f.`revenue`),
+            CONCAT('"VD(', vd.`name`, ' [', IF(vd.`unit` IS NULL OR vd.`unit` = '', 'N/A', vd.`unit`), '])"')) > 0;
+
+INSERT IGNORE INTO `seddb`.`cvs_formulas_market_inputs` (`formulas`, `design_group`, `market_input`)
+SELECT DISTINCT f.`vcs_row`, f.`design_group`, mi.`id`
+FROM `seddb`.`cvs_design_mi_formulas` f
+    INNER JOIN `seddb`.`cvs_vcs_rows` r ON r.`id` = f.`vcs_row`
+    INNER JOIN `seddb`.`cvs_vcss` v ON v.`id` = r.`vcs`
+    INNER JOIN `seddb`.`cvs_market_inputs` mi ON mi.`project` = v.`project`
+WHERE INSTR(CONCAT_WS(' ', f.`time`, f.`cost`, f.`revenue`),
+            CONCAT('"EF(', mi.`name`, ' [', IF(mi.`unit` IS NULL OR mi.`unit` = '', 'N/A', mi.`unit`), '])"')) > 0;
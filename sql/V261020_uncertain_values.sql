@@ -0,0 +1,11 @@
+# Value driver and market input values can have a distribution around the value, which monte carlo simulations
+# sample from. spread is the half width of a uniform distribution or the standard deviation of a gaussian one
+ALTER TABLE `seddb`.`cvs_vd_design_values`
+ADD COLUMN `distribution` VARCHAR(16) NULL DEFAULT NULL AFTER `value`,
+ADD COLUMN `spread` FLOAT NULL DEFAULT NULL AFTER `distribution`,
+ADD CONSTRAINT `check_vd_design_value_distribution` CHECK (`distribution` IN ('uniform', 'gaussian'));
+
+ALTER TABLE `seddb`.`cvs_market_input_values`
+ADD COLUMN `distribution` VARCHAR(16) NULL DEFAULT NULL AFTER `value`,
+ADD COLUMN `spread` FLOAT NULL DEFAULT NULL AFTER `distribution`,
+ADD CONSTRAINT `check_market_input_value_distribution` CHECK (`distribution` IN ('uniform', 'gaussian'));
@@ -0,0 +1,4 @@
+# The server process that runs a simulation job, as host name and process id, so that a server that starts only
+# fails the unfinished jobs of its own dead processes
+ALTER TABLE `seddb`.`cvs_simulation_jobs`
+ADD COLUMN `server` VARCHAR(255) NULL DEFAULT NULL AFTER `status`;
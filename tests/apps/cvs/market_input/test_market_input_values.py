@@ -85,6 +85,33 @@ def test_edit_market_input_value(client, std_headers, std_user):
     tu.delete_vd_from_user(current_user.id)
 
 
+def test_edit_market_input_value_uncertainty(client, std_headers, std_user):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    vcs = tu.seed_random_vcs(project.id)
+    market_input = tu.seed_random_market_input(project.id)
+    tu.seed_random_market_input_values(project.id, vcs.id, market_input.id)
+    # Act
+    res = client.put(f'/api/cvs/project/{project.id}/market-input-values', headers=std_headers, json=[
+        {
+            'market_input_id': market_input.id,
+            'vcs_id': vcs.id,
+            'value': 10,
+            'uncertainty': {'distribution': 'gaussian', 'spread': 2}
+        }
+    ])
+    # Assert
+    market_input_values = impl_market_input.get_all_market_values(project.id)
+    assert res.status_code == 200  # 200 OK
+    assert market_input_values[0].uncertainty.distribution == 'gaussian'
+    assert abs(market_input_values[0].uncertainty.spread - 2) < 0.0001
+
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
+
+
 def test_delete_market_input_value(client, std_headers, std_user):
     # Setup
     current_user = impl_users.impl_get_user_with_username(std_user.username)
@@ -264,4 +264,24 @@ def test_get_all_cvs_projects(client, std_headers, std_user):
     tu.delete_project_by_id(proj1.id, current_user.id)
     tu.delete_project_by_id(proj2.id, current_user.id)
     tu.delete_project_by_id(proj3.id, current_user.id)
-    
\ No newline at end of file
+
+
+def test_get_all_cvs_projects_keyset_pagination(client, std_headers, std_user):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project_ids = sorted(tu.seed_random_project(current_user.id).id for _ in range(3))
+    # Act
+    res_first = client.get(f'/api/cvs/project/all', headers=std_headers, params={'limit': 2})
+    after_id = res_first.json()["chunk"][-1]["id"]
+    res_next = client.get(f'/api/cvs/project/all', headers=std_headers, params={'limit': 2, 'after_id': after_id})
+    res_past = client.get(f'/api/cvs/project/all', headers=std_headers, params={'after_id': project_ids[-1]})
+    # Assert
+    assert res_first.status_code == 200  # 200 OK
+    assert [project["id"] for project in res_first.json()["chunk"]] == project_ids[:2]
+    assert [project["id"] for project in res_next.json()["chunk"]] == project_ids[2:]
+    assert res_first.json()["length_total"] == 3
+    assert res_next.json()["length_total"] == 3
+    assert res_past.json() == {"chunk": [], "length_total": 3}
+    # Cleanup
+    for project_id in project_ids:
+        tu.delete_project_by_id(project_id, current_user.id)
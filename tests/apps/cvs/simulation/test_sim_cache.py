@@ -0,0 +1,65 @@
+import os
+
+from sedbackend.apps.cvs.simulation.cache import SimulationCache, hash_inputs
+from sedbackend.apps.cvs.simulation.models import NonTechCost
+
+
+def test_hash_inputs():
+  # Act
+  first = hash_inputs('run', [{'b': 1, 'a': 2.5}], NonTechCost.LUMP_SUM)
+  second = hash_inputs('run', [{'a': 2.5, 'b': 1}], NonTechCost.LUMP_SUM)
+  third = hash_inputs('run', [{'a': 2.5, 'b': 2}], NonTechCost.LUMP_SUM)
+
+  # Assert
+  assert first == second
+  assert first != third
+
+
+def test_cache_lru():
+  # Setup
+  cache = SimulationCache(max_size=2, directory=None)
+
+  # Act
+  cache.put('a', 1)
+  cache.put('b', 2)
+  cache.get('a')
+  cache.put('c', 3)
+
+  # Assert
+  assert cache.get('a') == 1
+  assert cache.get('b') is None
+  assert cache.get('c') == 3
+
+
+def test_cache_disk(tmp_path):
+  # Setup
+  cache = SimulationCache(max_size=1, directory=str(tmp_path))
+  cache.put('a', [1.0, 2.0])
+  cache.put('b', [3.0])
+
+  # Act
+  restarted = SimulationCache(max_size=1, directory=str(tmp_path))
+  from_disk = restarted.get('a')
+
+  # Assert
+  assert from_disk == [1.0, 2.0]
+  assert restarted.get('b') == [3.0]
+  assert sorted(path.name for path in tmp_path.iterdir()) == ['a.pkl', 'b.pkl']
+
+
+def test_cache_disk_size_limit(tmp_path):
+  # Setup
+  value = list(range(1000))
+  cache = SimulationCache(max_size=1, directory=str(tmp_path))
+  cache.put('a', value)
+  cache.max_disk_size = 2 * (tmp_path / 'a.pkl').stat().st_size
+  cache.put('b', value)
+  os.utime(tmp_path / 'a.pkl', (0, 0))
+  os.utime(tmp_path / 'b.pkl', (1, 1))
+
+  # Act
+  cache.get('a')  # Read from disk, which makes b the least recently used entry
+  cache.put('c', value)
+
+  # Assert
+  assert sorted(path.name for path in tmp_path.iterdir()) == ['a.pkl', 'c.pkl']
@@ -0,0 +1,112 @@
+import asyncio
+import operator
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import sedbackend.apps.cvs.simulation.exceptions as e
+from sedbackend.apps.cvs.simulation import executor as sim_executor
+from sedbackend.apps.cvs.simulation.executor import SimulationExecutor, request_pool
+from sedbackend.apps.cvs.simulation.storage import collect_results
+
+
+def test_executor_run():
+  # Setup
+  executor = SimulationExecutor(max_workers=1, max_queue_size=1)
+
+  # Act
+  result = asyncio.run(executor.run(operator.add, 2, 3))
+  executor.shutdown()
+
+  # Assert
+  assert result == 5
+  assert executor.pending == 0
+
+
+def test_executor_queue_full():
+  # Setup
+  executor = SimulationExecutor(max_workers=1, max_queue_size=0)
+  executor.pending = 1
+
+  # Act / Assert
+  with pytest.raises(e.SimulationQueueFullException):
+    asyncio.run(executor.run(operator.add, 2, 3))
+
+
+def test_executor_stream():
+  # Setup
+  executor = SimulationExecutor(max_workers=1, max_queue_size=1)
+
+  async def stream():
+    return [item async for item in executor.stream(collect_results, ['first', 'second'], [(1, 10), (1, 11)])]
+
+  # Act
+  items = asyncio.run(stream())
+  executor.shutdown()
+
+  # Assert
+  assert items == [(1, 10, 'first'), (1, 11, 'second')]
+  assert executor.pending == 0
+
+
+def exit_worker(on_result):
+  on_result('first')
+  os._exit(1)
+
+
+def test_executor_stream_worker_dies():
+  # Setup
+  executor = SimulationExecutor(max_workers=1, max_queue_size=1)
+  items = []
+
+  async def stream():
+    async for item in executor.stream(exit_worker):
+      items.append(item)
+
+  # Act / Assert
+  with pytest.raises(BrokenProcessPool):
+    asyncio.run(asyncio.wait_for(stream(), timeout=30))
+  executor.shutdown()
+
+  assert items == [('first',)]
+  assert executor.pending == 0
+
+
+def test_request_pool_share(monkeypatch):
+  # Setup
+  monkeypatch.setattr(sim_executor.simulation_executor, 'max_workers', 2)
+  monkeypatch.setattr(sim_executor, 'MAX_PROCESSES', 6)
+
+  # Act
+  with request_pool(10) as pool:
+    workers = pool._max_workers
+  with request_pool(1) as single:
+    pass
+  monkeypatch.setattr(sim_executor, 'MAX_PROCESSES', 2)
+  with request_pool(10) as no_share:
+    pass
+
+  # Assert
+  assert workers == 3  # The share of one of the two workers
+  assert single is None
+  assert no_share is None
+
+
+def test_executor_submit_counts_toward_queue():
+  # Setup
+  executor = SimulationExecutor(max_workers=1, max_queue_size=0)
+
+  # Act
+  future = executor.submit(time.sleep, 1)
+  with pytest.raises(e.SimulationQueueFullException):
+    executor.submit(time.sleep, 1)
+  pending = executor.pending
+  future.result()
+  time.sleep(0.1)  # The place is released by a callback of the future
+  executor.shutdown()
+
+  # Assert
+  assert pending == 1
+  assert executor.pending == 0
@@ -0,0 +1,105 @@
+import os
+import time
+
+import tests.apps.cvs.testutils as tu
+import testutils as sim_tu
+import sedbackend.apps.core.users.implementation as impl_users
+import sedbackend.apps.cvs.simulation_job.implementation as impl_sim_job
+import sedbackend.apps.cvs.simulation_job.models as sim_job_models
+import sedbackend.apps.cvs.simulation_job.storage as sim_job_storage
+from sedbackend.apps.core.db import get_connection
+
+
+def test_run_simulation_job(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/job',
+                    headers=std_headers,
+                    json={
+                      "sim_settings": settings.dict(),
+                      "vcs_ids": [vcs.id],
+                      "design_group_ids": [design_group.id]
+                    })
+  job = res.json()
+
+  for _ in range(60):
+    job = client.get(f'/api/cvs/project/{project.id}/simulation/job/{job["id"]}', headers=std_headers).json()
+    if job["status"] not in ["pending", "running"]:
+      break
+    time.sleep(1)
+
+  res_results = client.get(f'/api/cvs/project/{project.id}/simulation/job/{job["id"]}/results',
+                           headers=std_headers)
+
+  #Assert
+  assert res.status_code == 200
+  assert job["status"] == "completed"
+  assert job["designs_completed"] == job["designs_total"] == 1
+  assert res_results.status_code == 200
+  assert res_results.json()["length_total"] == 1
+  assert res_results.json()["chunk"][0]["design_id"] == design[0].id
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_cancel_simulation_job_not_found(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+  project = tu.seed_random_project(current_user.id)
+
+  #Act
+  res = client.put(f'/api/cvs/project/{project.id}/simulation/job/{123456789}/cancel', headers=std_headers)
+
+  #Assert
+  assert res.status_code == 404
+
+  #Cleanup
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_fail_unfinished_simulation_jobs(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  request = sim_job_models.SimulationJobRequest(sim_settings=settings, vcs_ids=[vcs.id],
+                                                design_group_ids=[design_group.id])
+  with get_connection() as con:
+    # Never submitted to a worker
+    job = sim_job_storage.create_simulation_job(con, project.id, request, impl_sim_job.get_server_id())
+    other_job = sim_job_storage.create_simulation_job(con, project.id, request, 'other-server:1')
+    con.commit()
+
+  #Act
+  impl_sim_job.fail_unfinished_simulation_jobs()
+  with get_connection() as con:
+    sim_job_storage.finish_simulation_job(con, job.id, sim_job_models.SimulationJobStatus.COMPLETED)
+    con.commit()
+  res = client.get(f'/api/cvs/project/{project.id}/simulation/job/{job.id}', headers=std_headers)
+  res_other = client.get(f'/api/cvs/project/{project.id}/simulation/job/{other_job.id}', headers=std_headers)
+
+  #Assert
+  assert res.status_code == 200
+  assert res.json()["status"] == "failed"  # Not completed by a worker after it failed
+  assert res.json()["error"] == "SimulationJobInterruptedException"
+  assert res_other.json()["status"] == "pending"  # Owned by another server
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_orphaned_server():
+  # Assert
+  assert impl_sim_job.is_orphaned_server(None)
+  assert impl_sim_job.is_orphaned_server(impl_sim_job.get_server_id())
+  assert not impl_sim_job.is_orphaned_server(impl_sim_job.get_server_id(os.getppid()))
+  assert not impl_sim_job.is_orphaned_server('other-server:1')
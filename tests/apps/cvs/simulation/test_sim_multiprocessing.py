@@ -33,6 +33,132 @@ def test_run_single_monte_carlo_sim(client, std_headers, std_user):
   tu.delete_vd_from_user(current_user.id)
 
 
+def test_run_monte_carlo_sim_summary(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = True
+  settings.runs = 5
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/run-multiprocessing',
+                    headers=std_headers,
+                    json = {
+                      "sim_settings": settings.dict(),
+                      "vcs_ids": [vcs.id],
+                      "design_group_ids": [design_group.id],
+                      "summary": {"percentiles": [5, 50, 95], "histogram_bins": 4}
+                    })
+
+  #Assert
+  assert res.status_code == 200
+  result = res.json()[0]
+  assert result["all_npvs"] is None
+  assert set(result["statistics"]["percentiles"].keys()) == {"p5", "p50", "p95"}
+  assert len(result["statistics"]["std"]) == len(result["time"])
+  assert sum(result["statistics"]["final_npv_histogram"]["counts"]) == 5
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+  tu.delete_vd_from_user(current_user.id)
+
+
+def test_run_monte_carlo_sim_summary_invalid_percentile(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = True
+  settings.runs = 5
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/run-multiprocessing',
+                    headers=std_headers,
+                    json = {
+                      "sim_settings": settings.dict(),
+                      "vcs_ids": [vcs.id],
+                      "design_group_ids": [design_group.id],
+                      "summary": {"percentiles": [50, 150]}
+                    })
+
+  #Assert
+  assert res.status_code == 422
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+  tu.delete_vd_from_user(current_user.id)
+
+
+def test_run_monte_carlo_sim_convergence(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = True
+  settings.runs = 6
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/run-multiprocessing',
+                    headers=std_headers,
+                    json = {
+                      "sim_settings": settings.dict(),
+                      "vcs_ids": [vcs.id],
+                      "design_group_ids": [design_group.id],
+                      "summary": {"include_all_npvs": True},
+                      "convergence": {"tolerance": 1e12, "batch_size": 2}
+                    })
+
+  #Assert
+  assert res.status_code == 200
+  result = res.json()[0]
+  assert result["convergence"]["converged"]
+  assert result["convergence"]["runs"] == 2
+  assert len(result["all_npvs"]) == 2
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+  tu.delete_vd_from_user(current_user.id)
+
+
+def test_run_monte_carlo_sim_seed(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = True
+  settings.runs = 12
+
+  #Act
+  results = [client.post(f'/api/cvs/project/{project.id}/simulation/run-multiprocessing?seed={seed}',
+                         headers=std_headers,
+                         json = {
+                           "sim_settings": settings.dict(),
+                           "vcs_ids": [vcs.id],
+                           "design_group_ids": [design_group.id],
+                           "summary": {"percentiles": [50]}
+                         }) for seed in [42, 42]]
+
+  #Assert
+  assert all(res.status_code == 200 for res in results)
+  first, second = [res.json()[0] for res in results]
+  assert len(first["max_NPVs"]) == 12
+  assert first["mean_NPV"] == second["mean_NPV"]
+  assert first["statistics"] == second["statistics"]
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+  tu.delete_vd_from_user(current_user.id)
+
+
 def test_run_mc_sim_invalid_designs(client, std_headers, std_user):
       #Setup
   amount = 2
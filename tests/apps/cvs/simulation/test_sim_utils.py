@@ -1,126 +1,508 @@
-from sedbackend.apps.cvs.simulation.storage import parse_formula
-from sedbackend.libs.formula_parser.expressions import get_prefix_names, get_prefix_variables, \
-    replace_prefix_variables
-from sedbackend.libs.formula_parser.parser import NumericStringParser
-
-
-def test_parse_formula_simple():
-    # Setup
-    formula = f'(3+1)/2'
-    vd_values = []
-    mi_values = []
-    nsp = NumericStringParser()
-
-    # Act
-    new_formula = parse_formula(formula, vd_values, mi_values)
-
-    # Assert
-    assert new_formula == formula
-    assert nsp.eval(new_formula) == 2
-
-
-def test_parse_formula_values():
-    # Setup
-    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 3},
-                 {"id": 2, "name": "Weight", "unit": "kg", "value": 4}]
-    mi_values = [{"id": 1, "name": "Test", "unit": "T", "value": 5},
-                 {"id": 2, "name": "Test 2", "unit": "T2", "value": 6}]
-    formula = f'2*"VD(Speed [km/h])"+"EF(Test 2 [T2])"'
-    nsp = NumericStringParser()
-
-    # Act
-    new_formula = parse_formula(formula, vd_values, mi_values)
-
-    # Assert
-    assert new_formula == "2*3+6"
-    assert nsp.eval(new_formula) == 12
-
-
-def test_parse_formula_vd_no_exist():
-    # Setup
-    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 3},
-                 {"id": 2, "name": "Weight", "unit": "kg", "value": 4}]
-    mi_values = [{"id": 1, "name": "Test", "unit": "T", "value": 5},
-                 {"id": 2, "name": "Test 2", "unit": "T2", "value": 6}]
-    formula = f'2*"VD(DontExist [km/h])"+"EF(Dont Exist [T2])"'
-    nsp = NumericStringParser()
-
-    # Act
-    new_formula = parse_formula(formula, vd_values, mi_values)
-
-    # Assert
-    assert new_formula == "2*0+0"
-    assert nsp.eval(new_formula) == 0
-
-
-def test_parse_formula_unit_no_exist():
-    # Setup
-    vd_values = [{"id": 1, "name": "Speed", "unit": None, "value": 3}]
-    mi_values = [{"id": 2, "name": "Test 2", "unit": None, "value": 6}]
-    formula = f'2*"VD(Speed [N/A])"+"EF(Test 2 [N/A])"'
-    nsp = NumericStringParser()
-
-    # Act
-    new_formula = parse_formula(formula, vd_values, mi_values)
-
-    # Assert
-    assert new_formula == "2*3+6"
-    assert nsp.eval(new_formula) == 12
-
-
-def test_get_prefix_variables():
-    # Setup
-    text_vd = f'2*"VD(Speed [km/h])"+"VD(Test [T])"'
-    text_mi = f'2*"EF(Test (OK) [T])"+"EF(Test2 [T2])"'
-
-    # Act
-    variables_vd = get_prefix_variables("VD", text_vd)
-    variables_mi = get_prefix_variables("EF", text_mi)
-
-    # Assert
-    assert variables_vd == ["Speed [km/h]", "Test [T]"]
-    assert variables_mi == ["Test (OK) [T]", "Test2 [T2]"]
-
-
-def test_get_prefix_names():
-    # Setup
-    text_vd = f'2*"VD(Speed King [L] [km/h])"+"VD(Test(L) */&¢€ [T])"'
-    text_mi = f'2*"EF(Test (OK) [T])"+"EF(Test2 [T2])"'
-
-    # Act
-    names_vd = get_prefix_names("VD", text_vd)
-    names_mi = get_prefix_names("EF", text_mi)
-
-    # Assert
-    assert names_vd == ["Speed King [L]", "Test(L) */&¢€"]
-    assert names_mi == ["Test (OK)", "Test2"]
-
-
-def test_replace_prefix_variables():
-    # Setup
-    text_vd = f'2*"VD(Speed [km/h])"+"VD(Test [T])"'
-    text_mi = f'2*"EF(Test (OK) [T])"+"EF(Test2 [T2])"'
-
-    # Act
-    new_text_vd = replace_prefix_variables("VD", "Speed [km/h]", "2", text_vd)
-    new_text_mi = replace_prefix_variables("EF", "Test (OK) [T]", "4", text_mi)
-
-    # Assert
-    assert new_text_vd == f'2*2+"VD(Test [T])"'
-    assert new_text_mi == f'2*4+"EF(Test2 [T2])"'
-
-
-def test_value_not_found():
-    # Setup
-    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 2}]
-    mi_values = [{"id": 2, "name": "Test 2", "unit": "T", "value": 3}]
-    formula = f'2*"VD(NO [km/h])"+"EF(NOTFOUND [T])"'
-    nsp = NumericStringParser()
-
-    # Act
-    new_formula = parse_formula(formula, vd_values, mi_values)
-
-    # Assert
-    assert new_formula == "2*0+0"
-    assert nsp.eval(new_formula) == 0
-
+import io
+
+import numpy as np
+import pytest
+from desim import interface as des
+from desim.data import NonTechCost, TimeFormat
+from desim.simulation import Process
+
+from sedbackend.apps.cvs.design.models import Design
+from sedbackend.apps.cvs.simulation.cashflow import is_deterministic, rediscount, run_cash_flow_simulation
+from sedbackend.apps.cvs.simulation.dsm import create_dsm
+from sedbackend.apps.cvs.simulation.storage import create_simple_dsm, parse_formula
+from sedbackend.apps.cvs.simulation.inputs import SampledInput, SimulationInput, get_variable_bindings, \
+    get_variable_binding_columns
+from sedbackend.apps.cvs.simulation.encoding import accepts_npz, encode_npz
+from sedbackend.apps.cvs.simulation.exceptions import CashFlowLengthMismatchException, InvalidSweepException, \
+    SweepTooLargeException
+from sedbackend.apps.cvs.simulation.models import DesignSweep, MonteCarloConvergence, MonteCarloSummary, \
+    NonTechnicalProcess, SamplePlan, Simulation, ValueDriverRange
+from sedbackend.apps.cvs.simulation.statistics import NPVAccumulator, QuantileSketch, confidence_half_width
+from sedbackend.apps.cvs.simulation.sweep import create_samples, create_virtual_designs
+from sedbackend.libs.formula_parser.compiler import compile_formula
+from sedbackend.libs.formula_parser.expressions import get_prefix_names, get_prefix_variables, \
+    replace_prefix_variables
+from sedbackend.libs.formula_parser.parser import NumericStringParser
+
+
+def test_parse_formula_simple():
+    # Setup
+    formula = f'(3+1)/2'
+    vd_values = []
+    mi_values = []
+    nsp = NumericStringParser()
+
+    # Act
+    new_formula = parse_formula(formula, vd_values, mi_values)
+
+    # Assert
+    assert new_formula == formula
+    assert nsp.eval(new_formula) == 2
+
+
+def test_parse_formula_values():
+    # Setup
+    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 3},
+                 {"id": 2, "name": "Weight", "unit": "kg", "value": 4}]
+    mi_values = [{"id": 1, "name": "Test", "unit": "T", "value": 5},
+                 {"id": 2, "name": "Test 2", "unit": "T2", "value": 6}]
+    formula = f'2*"VD(Speed [km/h])"+"EF(Test 2 [T2])"'
+    nsp = NumericStringParser()
+
+    # Act
+    new_formula = parse_formula(formula, vd_values, mi_values)
+
+    # Assert
+    assert new_formula == "2*3+6"
+    assert nsp.eval(new_formula) == 12
+
+
+def test_parse_formula_vd_no_exist():
+    # Setup
+    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 3},
+                 {"id": 2, "name": "Weight", "unit": "kg", "value": 4}]
+    mi_values = [{"id": 1, "name": "Test", "unit": "T", "value": 5},
+                 {"id": 2, "name": "Test 2", "unit": "T2", "value": 6}]
+    formula = f'2*"VD(DontExist [km/h])"+"EF(Dont Exist [T2])"'
+    nsp = NumericStringParser()
+
+    # Act
+    new_formula = parse_formula(formula, vd_values, mi_values)
+
+    # Assert
+    assert new_formula == "2*0+0"
+    assert nsp.eval(new_formula) == 0
+
+
+def test_parse_formula_unit_no_exist():
+    # Setup
+    vd_values = [{"id": 1, "name": "Speed", "unit": None, "value": 3}]
+    mi_values = [{"id": 2, "name": "Test 2", "unit": None, "value": 6}]
+    formula = f'2*"VD(Speed [N/A])"+"EF(Test 2 [N/A])"'
+    nsp = NumericStringParser()
+
+    # Act
+    new_formula = parse_formula(formula, vd_values, mi_values)
+
+    # Assert
+    assert new_formula == "2*3+6"
+    assert nsp.eval(new_formula) == 12
+
+
+def test_get_prefix_variables():
+    # Setup
+    text_vd = f'2*"VD(Speed [km/h])"+"VD(Test [T])"'
+    text_mi = f'2*"EF(Test (OK) [T])"+"EF(Test2 [T2])"'
+
+    # Act
+    variables_vd = get_prefix_variables("VD", text_vd)
+    variables_mi = get_prefix_variables("EF", text_mi)
+
+    # Assert
+    assert variables_vd == ["Speed [km/h]", "Test [T]"]
+    assert variables_mi == ["Test (OK) [T]", "Test2 [T2]"]
+
+
+def test_get_prefix_names():
+    # Setup
+    text_vd = f'2*"VD(Speed King [L] [km/h])"+"VD(Test(L) */&¢€ [T])"'
+    text_mi = f'2*"EF(Test (OK) [T])"+"EF(Test2 [T2])"'
+
+    # Act
+    names_vd = get_prefix_names("VD", text_vd)
+    names_mi = get_prefix_names("EF", text_mi)
+
+    # Assert
+    assert names_vd == ["Speed King [L]", "Test(L) */&¢€"]
+    assert names_mi == ["Test (OK)", "Test2"]
+
+
+def test_replace_prefix_variables():
+    # Setup
+    text_vd = f'2*"VD(Speed [km/h])"+"VD(Test [T])"'
+    text_mi = f'2*"EF(Test (OK) [T])"+"EF(Test2 [T2])"'
+
+    # Act
+    new_text_vd = replace_prefix_variables("VD", "Speed [km/h]", "2", text_vd)
+    new_text_mi = replace_prefix_variables("EF", "Test (OK) [T]", "4", text_mi)
+
+    # Assert
+    assert new_text_vd == f'2*2+"VD(Test [T])"'
+    assert new_text_mi == f'2*4+"EF(Test2 [T2])"'
+
+
+def test_value_not_found():
+    # Setup
+    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 2}]
+    mi_values = [{"id": 2, "name": "Test 2", "unit": "T", "value": 3}]
+    formula = f'2*"VD(NO [km/h])"+"EF(NOTFOUND [T])"'
+    nsp = NumericStringParser()
+
+    # Act
+    new_formula = parse_formula(formula, vd_values, mi_values)
+
+    # Assert
+    assert new_formula == "2*0+0"
+    assert nsp.eval(new_formula) == 0
+
+
+def test_compile_formula_values():
+    # Setup
+    vd_values = [{"id": 1, "name": "Speed", "unit": "km/h", "value": 3},
+                 {"id": 2, "name": "Weight", "unit": None, "value": 4}]
+    mi_values = [{"id": 1, "name": "Test", "unit": "T", "value": 5}]
+    formula = f'2*"VD(Speed [km/h])"+"EF(Test [T])"^2-"VD(Weight [N/A])"*"EF(NOTFOUND [T])"+"junk"'
+    nsp = NumericStringParser()
+
+    # Act
+    compiled = compile_formula(formula)
+    expected = nsp.eval(parse_formula(formula, vd_values, mi_values))
+
+    # Assert
+    assert compiled.vd_names == ["Speed [km/h]", "Weight [N/A]"]
+    assert compiled.mi_names == ["Test [T]", "NOTFOUND [T]"]
+    assert compiled.evaluate(get_variable_bindings(vd_values), get_variable_bindings(mi_values)) == expected
+
+
+def test_compile_formula_reuse():
+    # Setup
+    formula = f'round("VD(Speed [km/h])")*time-sgn(-"EF(Test [T])")'
+
+    # Act
+    compiled = compile_formula(formula, ('time',))
+    first = compiled.evaluate({"Speed [km/h]": 2.6}, {"Test [T]": 5}, time=2)
+    second = compiled.evaluate({"Speed [km/h]": 1.2}, {}, time=3)
+
+    # Assert
+    assert compiled.names == ["time"]
+    assert first == 7
+    assert second == 3
+
+
+def test_compile_formula_same_as_parser():
+    # Setup
+    formulas = ['(3+1)/2', '2^3^2', '-(2+3)*-4', 'sin(PI/2)+E', 'trunc(3.7)+abs(-2)', 'foo(3)+2', '1e2/-4']
+    nsp = NumericStringParser()
+
+    # Act
+    results = [compile_formula(formula).evaluate() for formula in formulas]
+
+    # Assert
+    assert results == [nsp.eval(formula) for formula in formulas]
+
+
+def test_compile_formula_batch():
+    # Setup
+    formula = f'round("VD(Speed [km/h])")*time-sgn(-"EF(Test [T])")+"VD(Weight [N/A])"'
+    vd_values = [[{"id": 1, "name": "Speed", "unit": "km/h", "value": 2.6},
+                  {"id": 2, "name": "Weight", "unit": None, "value": 4}],
+                 [{"id": 1, "name": "Speed", "unit": "km/h", "value": 1.2}],
+                 []]
+    times = np.array([2, 3, 4])
+
+    # Act
+    compiled = compile_formula(formula, ('time',))
+    results = compiled.evaluate_batch(3, get_variable_binding_columns(vd_values), {"Test [T]": 5}, time=times)
+
+    # Assert
+    assert results.tolist() == [compiled.evaluate(get_variable_bindings(values), {"Test [T]": 5}, time=time)
+                                for values, time in zip(vd_values, times)]
+    assert results.tolist() == [11, 4, 1]
+
+
+def test_compile_formula_batch_constant():
+    # Act
+    results = compile_formula('sin(PI/2)+E').evaluate_batch(4)
+
+    # Assert
+    assert results.shape == (4,)
+    assert (results == NumericStringParser().eval('sin(PI/2)+E')).all()
+
+
+def test_encode_npz():
+    # Setup
+    results = [Simulation(time=[0, 0.25, 0.5], mean_NPV=[0, -1.5, 2], max_NPVs=[2, 3], mean_payback_time=0.5,
+                          all_npvs=[[0, -1, 2], [0, -2, 3]])]
+
+    # Act
+    arrays = np.load(io.BytesIO(encode_npz(results)))
+
+    # Assert
+    assert arrays['mean_payback_time'].tolist() == [0.5]
+    assert arrays['time_0'].tolist() == [0, 0.25, 0.5]
+    assert arrays['mean_npv_0'].tolist() == [0, -1.5, 2]
+    assert arrays['max_npvs_0'].tolist() == [2, 3]
+    assert arrays['all_npvs_0'].shape == (2, 3)
+    assert arrays['all_npvs_0'].dtype == np.float64
+
+
+def test_accepts_npz():
+    # Assert
+    assert accepts_npz('application/json, application/x-npz;q=0.9')
+    assert not accepts_npz('application/json')
+    assert not accepts_npz(None)
+
+
+def test_npv_accumulator_summarize():
+    # Setup
+    npvs = [[0, -1, 4], [0, -3, 2], [0, 1, -2], [0, -1, 0]]
+    summary = MonteCarloSummary(percentiles=[50], histogram_bins=2)
+    accumulator = NPVAccumulator(sketch_size=len(npvs))  # Exact percentiles while all runs fit in the sketch
+
+    # Act
+    accumulator.add([0, 1, 2], np.asarray(npvs, dtype=np.float64))
+    statistics = accumulator.summarize(summary)
+
+    # Assert
+    assert statistics.percentiles == {'p50': [0, -1, 1]}
+    assert statistics.std == np.std(npvs, axis=0).tolist()
+    assert statistics.negative_npv_probability == [0, 0.75, 0.25]
+    assert statistics.final_npv_histogram.bin_edges == [-2, 1, 4]
+    assert statistics.final_npv_histogram.counts == [2, 2]
+
+
+def test_confidence_half_width():
+    # Setup
+    npvs = np.arange(100, dtype=float)
+
+    # Act
+    mean, mean_half_width = confidence_half_width(npvs, MonteCarloConvergence(tolerance=1, confidence=0.95))
+    median, median_half_width = confidence_half_width(npvs, MonteCarloConvergence(tolerance=1, percentile=50))
+    _, single_half_width = confidence_half_width([5], MonteCarloConvergence(tolerance=1))
+
+    # Assert
+    assert mean == 49.5
+    assert round(mean_half_width, 4) == round(1.959964 * np.std(npvs, ddof=1) / 10, 4)
+    assert median == 49.5
+    assert median_half_width == (npvs[60] - npvs[40]) / 2
+    assert single_half_width == float('inf')
+
+
+def test_simulation_input_indexes():
+    # Setup
+    sim_data = [{'id': 1, 'vcs': 1, 'design_group': 1}, {'id': 2, 'vcs': 1, 'design_group': 2},
+                {'id': 3, 'vcs': 1, 'design_group': 1}]
+    designs = [Design(id=5, name='a', design_group_id=1), Design(id=6, name='b', design_group_id=2),
+               Design(id=7, name='c', design_group_id=1)]
+    vd_values = [{'design': 5, 'name': 'Speed', 'unit': 'km/h', 'value': 1, 'vcs_row': 1},
+                 {'design': 7, 'name': 'Speed', 'unit': 'km/h', 'value': 3, 'vcs_row': 1},
+                 {'design': 7, 'name': 'Weight', 'unit': 'kg', 'value': 4, 'vcs_row': 3},
+                 {'design': 6, 'name': 'Speed', 'unit': 'km/h', 'value': 2, 'vcs_row': 2}]
+    mi_values = [{'vcs': 1, 'name': 'Price', 'unit': '', 'value': 10}]
+
+    # Act
+    sim_input = SimulationInput(sim_data, mi_values, designs, vd_values)
+    vd_bindings = sim_input.get_vd_bindings([7, 5])
+    vd_row_bindings = sim_input.get_vd_row_bindings([7, 5], 3)
+
+    # Assert
+    assert [sd['id'] for sd in sim_input.get_sim_data(1, 1)] == [1, 3]
+    assert sim_input.get_sim_data(2, 1) == []
+    assert [design.id for design in sim_input.get_designs(1)] == [5, 7]
+    assert sim_input.get_mi_bindings(1) == {'Price [N/A]': 10}
+    assert vd_bindings['Speed [km/h]'].tolist() == [3, 1]
+    assert vd_bindings['Weight [kg]'].tolist() == [4, 0]
+    assert list(vd_row_bindings) == ['Weight [kg]']
+    assert vd_row_bindings['Weight [kg]'].tolist() == [4, 0]
+
+
+def test_sampled_input():
+    # Setup
+    designs = [Design(id=5, name='a', design_group_id=1)]
+    vd_values = [{'id': 1, 'design': 5, 'name': 'Speed', 'unit': 'km/h', 'value': 10, 'vcs_row': 1,
+                  'distribution': 'uniform', 'spread': 2},
+                 {'id': 1, 'design': 5, 'name': 'Speed', 'unit': 'km/h', 'value': 10, 'vcs_row': 2,
+                  'distribution': 'uniform', 'spread': 2},
+                 {'id': 2, 'design': 5, 'name': 'Weight', 'unit': 'kg', 'value': 4, 'vcs_row': 2,
+                  'distribution': None, 'spread': None}]
+    mi_values = [{'id': 3, 'vcs': 1, 'name': 'Price', 'unit': '', 'value': 100, 'distribution': 'gaussian',
+                  'spread': 5}]
+    sim_input = SimulationInput([], mi_values, designs, vd_values)
+
+    # Act
+    sampled = SampledInput(sim_input, 1, 5, 1000, np.random.default_rng(1))
+    speed = sampled.get_vd_bindings(list(range(1000)))['Speed [km/h]']
+    price = sampled.get_mi_bindings(1)['Price [N/A]']
+
+    # Assert
+    assert sim_input.is_uncertain(1, 5)
+    assert speed.shape == (1000,) and speed.min() >= 8 and speed.max() <= 12
+    assert abs(price.mean() - 100) < 1 and abs(price.std() - 5) < 0.5
+    # Every run uses the same value of a value driver in all vcs rows
+    assert sampled.get_vd_row_bindings([3, 4], 2)['Speed [km/h]'].tolist() == speed[[3, 4]].tolist()
+    assert sampled.get_vd_row_bindings([3, 4], 2)['Weight [kg]'] == 4
+    assert sampled.get_vd_bindings(list(range(1000)))['Speed [km/h]'].tolist() == speed.tolist()
+
+
+def test_npv_accumulator_merge():
+    # Setup
+    npvs = np.random.default_rng(0).normal(size=(30, 4)).cumsum(axis=1)
+    summary = MonteCarloSummary(percentiles=[5, 50, 95], histogram_bins=3)
+
+    # Act
+    accumulator = NPVAccumulator(keep_npvs=True)
+    for start in range(0, 30, 7):
+        chunk = NPVAccumulator(keep_npvs=True)
+        chunk.add([0, 1, 2, 3], npvs[start:start + 7])
+        accumulator.merge(chunk)
+    statistics = accumulator.summarize(summary)
+
+    # Assert
+    assert accumulator.count == 30
+    assert np.allclose(accumulator.mean_npv(), npvs.mean(axis=0))
+    assert np.allclose(statistics.std, npvs.std(axis=0))
+    for q in summary.percentiles:
+        assert np.allclose(statistics.percentiles[f'p{q:g}'], np.percentile(npvs, q, axis=0))
+    assert statistics.negative_npv_probability == (npvs < 0).mean(axis=0).tolist()
+    assert accumulator.final_npvs == npvs[:, -1].tolist()
+    assert accumulator.npvs == npvs.tolist()
+
+
+def test_quantile_sketch_bounded():
+    # Setup
+    values = np.random.default_rng(0).normal(size=(10000, 2))
+
+    # Act
+    sketch = QuantileSketch(size=100)
+    for start in range(0, 10000, 250):
+        sketch.add(values[start:start + 250])
+
+    # Assert
+    assert sketch.values.shape == (100, 2)
+    assert sketch.weights.sum() == pytest.approx(10000)
+    assert np.allclose(sketch.percentiles([5, 50, 95]), np.percentile(values, [5, 50, 95], axis=0), atol=0.1)
+
+
+def create_processes(times, non_tech_add, time_format):
+    return [Process(i, time, 10 * (i + 1), 40 * i, f'P{i}', non_tech_add, time_format)
+            for i, time in enumerate(times)]
+
+
+def test_cash_flow_simulation_matches_desim():
+    # Setup
+    scenarios = [
+        # times, flow process, flow rate, flow time, runtime, non tech add, time format
+        ([1, 2, 1], 'P1', 3, 4, 10, NonTechCost.TO_TECHNICAL_PROCESS, TimeFormat.YEAR),
+        ([0.25, 0.5, 0.25, 1], 'P0', 2.5, 2, 8, NonTechCost.LUMP_SUM, TimeFormat.YEAR),
+        ([3, 1, 6], 'P2', 20, 3, 60, NonTechCost.CONTINOUSLY, TimeFormat.MONTH),
+        ([0, 1.3, 0.7], 'P1', 1, 5.5, 9, NonTechCost.NO_ADDED_COST, TimeFormat.YEAR),
+        ([2, 5, 3, 1], 'P3', 4, 1, 52 * 6, NonTechCost.TO_TECHNICAL_PROCESS, TimeFormat.WEEK),
+    ]
+    non_tech_processes = [NonTechnicalProcess(name='Marketing', cost=30, revenue=0)]
+
+    for times, flow_process, flow_rate, flow_time, runtime, non_tech_add, time_format in scenarios:
+        args = (flow_time, flow_rate, flow_process)
+        dsm = create_simple_dsm(create_processes(times, non_tech_add, time_format))
+        desim_args = (non_tech_processes, non_tech_add, dsm, time_format, 0.08, runtime)
+
+        # Act
+        expected = des.Des().run_simulation(*args, create_processes(times, non_tech_add, time_format), *desim_args)
+        result = run_cash_flow_simulation(*args, create_processes(times, non_tech_add, time_format), *desim_args)
+
+        # Assert
+        assert result.time == expected.timesteps[0]
+        assert np.allclose(result.mean_NPV, expected.mean_npv(), rtol=1e-9)
+        assert result.max_NPVs == pytest.approx(expected.all_max_npv())
+        assert result.mean_payback_time == expected.mean_npv_payback_time()
+
+
+def test_is_deterministic():
+    # Setup
+    processes = create_processes([1, 2, 1], NonTechCost.NO_ADDED_COST, TimeFormat.YEAR)
+    branching_dsm = {'P0': [0, 0.5, 0.5], 'P1': [0, 0, 1], 'P2': [0, 0, 0]}
+
+    # Assert
+    assert is_deterministic(processes, 'P1', create_simple_dsm(processes), 10, TimeFormat.YEAR,
+                            NonTechCost.NO_ADDED_COST)
+    assert not is_deterministic(processes, 'P1', branching_dsm, 10, TimeFormat.YEAR, NonTechCost.NO_ADDED_COST)
+    assert not is_deterministic(processes, 'Missing', create_simple_dsm(processes), 10, TimeFormat.YEAR,
+                                NonTechCost.NO_ADDED_COST)
+
+
+def test_create_dsm():
+    # Setup
+    processes = create_processes([1, 1, 1, 1], NonTechCost.NO_ADDED_COST, TimeFormat.YEAR)
+    # P0 -> P1 and P0 -> (row 9, not a process) -> P2, P1 -> P3, P2 -> P3
+    edges = frozenset({(0, 1), (0, 9), (9, 2), (1, 3), (2, 3)})
+
+    # Act
+    simple_dsm = create_dsm(processes)
+    bpmn_dsm = create_dsm(processes, edges)
+
+    # Assert
+    assert simple_dsm == {'P0': [0, 1, 0, 0], 'P1': [0, 0, 1, 0], 'P2': [0, 0, 0, 1], 'P3': [0, 0, 0, 0]}
+    assert bpmn_dsm == {'P0': [0, 0.5, 0.5, 0], 'P1': [0, 0, 0, 1], 'P2': [0, 0, 0, 1], 'P3': [0, 0, 0, 0]}
+    assert create_dsm(create_processes([2, 2, 2, 2], NonTechCost.NO_ADDED_COST, TimeFormat.YEAR)) is simple_dsm
+    assert create_dsm(processes, frozenset({(5, 6)})) == simple_dsm
+
+
+def test_rediscount():
+    # Setup
+    processes = create_processes([1, 2, 1], NonTechCost.NO_ADDED_COST, TimeFormat.YEAR)
+    dsm = create_simple_dsm(processes)
+    args = (3, 2, 'P1', processes, [], NonTechCost.NO_ADDED_COST, dsm, TimeFormat.YEAR)
+    result = run_cash_flow_simulation(*args, 0.08, 10, include_cash_flows=True)
+    expected = run_cash_flow_simulation(*args, 0.2, 10)
+
+    # Act
+    discounted = rediscount(result.time, result.cash_flows, [0.08, 0.2, 0])
+
+    # Assert
+    assert [d.discount_rate for d in discounted] == [0.08, 0.2, 0]
+    assert discounted[0].mean_NPV == result.mean_NPV
+    assert discounted[1].mean_NPV == expected.mean_NPV
+    assert discounted[1].mean_payback_time == expected.mean_payback_time
+    assert discounted[2].max_NPVs == [pytest.approx(sum(result.cash_flows))]
+    with pytest.raises(CashFlowLengthMismatchException):
+        rediscount(result.time, result.cash_flows[1:], [0.08])
+
+
+def test_create_samples_grid():
+    # Setup
+    sweep = DesignSweep(design_group_id=1, ranges=[ValueDriverRange(vd_id=1, min=0, max=1, levels=3),
+                                                   ValueDriverRange(vd_id=2, min=5, max=5, levels=1)])
+
+    # Act
+    samples = create_samples(sweep)
+
+    # Assert
+    assert samples.tolist() == [[0, 5], [0.5, 5], [1, 5]]
+    with pytest.raises(InvalidSweepException):
+        create_samples(DesignSweep(design_group_id=1, ranges=[ValueDriverRange(vd_id=1, min=1, max=0)]))
+    with pytest.raises(SweepTooLargeException):
+        create_samples(DesignSweep(design_group_id=1, ranges=[ValueDriverRange(vd_id=i, min=0, max=1, levels=100)
+                                                              for i in range(3)]))
+
+
+def test_create_samples_latin_hypercube():
+    # Setup
+    sweep = DesignSweep(design_group_id=1, plan=SamplePlan.LATIN_HYPERCUBE, samples=20, seed=1,
+                        ranges=[ValueDriverRange(vd_id=1, min=0, max=1), ValueDriverRange(vd_id=2, min=10, max=30)])
+
+    # Act
+    samples = create_samples(sweep)
+
+    # Assert
+    assert samples.shape == (20, 2)
+    # One sample in each of the 20 strata of each range
+    assert sorted(np.floor(samples[:, 0] * 20).tolist()) == list(range(20))
+    assert sorted(np.floor((samples[:, 1] - 10) / 20 * 20).tolist()) == list(range(20))
+    assert np.array_equal(samples, create_samples(sweep))
+
+
+def test_create_virtual_designs():
+    # Setup
+    vd_rows = [{'id': 1, 'name': 'Speed', 'unit': 'km', 'vcs_row': 10},
+               {'id': 2, 'name': 'Weight', 'unit': 'kg', 'vcs_row': 10},
+               {'id': 1, 'name': 'Speed', 'unit': 'km', 'vcs_row': 11}]
+
+    # Act
+    designs, vd_design_values = create_virtual_designs(7, vd_rows, [1], np.array([[3.0], [4.0]]), {2: 8.0})
+    sim_input = SimulationInput([], [], designs, vd_design_values)
+
+    # Assert
+    assert [design.id for design in designs] == [-1, -2]
+    assert all(design.design_group_id == 7 for design in designs)
+    assert sim_input.get_vd_bindings([-2, -1])['Speed [km]'].tolist() == [4.0, 3.0]
+    assert sim_input.get_vd_bindings([-1])['Weight [kg]'].tolist() == [8.0]
+    assert sim_input.get_vd_row_bindings([-1, -2], 11) == {'Speed [km]': pytest.approx([3.0, 4.0])}
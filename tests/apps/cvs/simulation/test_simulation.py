@@ -1,3 +1,7 @@
+import json
+
+import pytest
+
 import tests.apps.cvs.testutils as tu
 import testutils as sim_tu
 import sedbackend.apps.core.users.implementation as impl_users
@@ -33,6 +37,279 @@ def test_run_single_simulation(client, std_headers, std_user):
 
 
 
+def test_rediscount_simulation(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/run?include_cash_flows=true',
+                    headers=std_headers,
+                    json={
+                      "sim_settings": settings.dict(),
+                      "vcs_ids": [vcs.id],
+                      "design_group_ids": [design_group.id]
+                    })
+  result = res.json()[0]
+
+  #Act
+  res_rediscount = client.post(f'/api/cvs/project/{project.id}/simulation/rediscount',
+                               headers=std_headers,
+                               json={
+                                 "time": result["time"],
+                                 "cash_flows": result["cash_flows"],
+                                 "discount_rates": [settings.discount_rate, 0]
+                               })
+
+  #Assert
+  assert res.status_code == 200
+  assert res_rediscount.status_code == 200
+  discounted = res_rediscount.json()
+  assert len(discounted) == 2
+  assert discounted[0]["mean_NPV"] == pytest.approx(result["mean_NPV"])
+  assert discounted[1]["max_NPVs"][0] == pytest.approx(sum(result["cash_flows"]))
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_run_scenarios(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  other_settings = settings.copy()
+  other_settings.discount_rate = settings.discount_rate + 0.1
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/run/scenarios',
+                    headers=std_headers,
+                    json={
+                      "scenarios": [settings.dict(), other_settings.dict()],
+                      "vcs_ids": [vcs.id],
+                      "design_group_ids": [design_group.id]
+                    })
+  res_single = client.post(f'/api/cvs/project/{project.id}/simulation/run',
+                           headers=std_headers,
+                           json={
+                             "sim_settings": other_settings.dict(),
+                             "vcs_ids": [vcs.id],
+                             "design_group_ids": [design_group.id]
+                           })
+
+  #Assert
+  assert res.status_code == 200
+  scenarios = res.json()
+  assert [scenario["scenario"] for scenario in scenarios] == [0, 1]
+  assert scenarios[1]["results"][0]["design_id"] == design[0].id
+  assert scenarios[1]["results"][0]["result"] == res_single.json()[0]
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_run_design_sweep(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  value_driver = tu.seed_random_value_driver(current_user.id)
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/sweep',
+                    headers=std_headers,
+                    json={
+                      "sim_settings": settings.dict(),
+                      "vcs_ids": [vcs.id],
+                      "sweep": {
+                        "design_group_id": design_group.id,
+                        "ranges": [{"vd_id": value_driver.id, "min": 0, "max": 10, "levels": 3}]
+                      }
+                    })
+  res_single = client.post(f'/api/cvs/project/{project.id}/simulation/run',
+                           headers=std_headers,
+                           json={
+                             "sim_settings": settings.dict(),
+                             "vcs_ids": [vcs.id],
+                             "design_group_ids": [design_group.id]
+                           })
+
+  #Assert
+  assert res.status_code == 200
+  sweep = res.json()[0]
+  assert sweep["vd_ids"] == [value_driver.id]
+  assert sweep["values"] == [[0], [5], [10]]
+  # The formulas do not use the value driver, so every virtual design is simulated as the stored design
+  assert sweep["final_NPVs"] == [res_single.json()[0]["mean_NPV"][-1]] * 3
+
+  #Cleanup
+  tu.delete_vd_by_id(value_driver.id)
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_run_parallel_simulation(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  tu.seed_random_designs(project.id, design_group.id, 3)
+  payload = {
+    "sim_settings": settings.dict(),
+    "vcs_ids": [vcs.id],
+    "design_group_ids": [design_group.id]
+  }
+
+  #Act
+  res_sequential = client.post(f'/api/cvs/project/{project.id}/simulation/run',
+                               headers=std_headers,
+                               json=payload)
+  res_parallel = client.post(f'/api/cvs/project/{project.id}/simulation/run?parallel=true',
+                             headers=std_headers,
+                             json=payload)
+
+  #Assert
+  assert res_sequential.status_code == 200
+  assert res_parallel.status_code == 200
+  assert len(res_parallel.json()) == 3
+  assert res_parallel.json() == res_sequential.json()
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_run_simulation_stream(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  payload = {
+    "sim_settings": settings.dict(),
+    "vcs_ids": [vcs.id],
+    "design_group_ids": [design_group.id]
+  }
+
+  #Act
+  res = client.post(f'/api/cvs/project/{project.id}/simulation/run', headers=std_headers, json=payload)
+  res_stream = client.post(f'/api/cvs/project/{project.id}/simulation/run/stream', headers=std_headers,
+                           json=payload)
+  lines = [json.loads(line) for line in res_stream.text.splitlines()]
+
+  #Assert
+  assert res_stream.status_code == 200
+  assert res_stream.headers['content-type'].startswith('application/x-ndjson')
+  assert [line["design_id"] for line in lines] == [d.id for d in design]
+  assert [line["result"] for line in lines] == res.json()
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+
+
+def test_run_simulation_value_driver_formula(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  row = tu.vcs_impl.get_vcs_table(project.id, vcs.id)[0]
+  vd = row.stakeholder_needs[0].value_drivers[0]
+  unit = vd.unit if vd.unit is not None and vd.unit != '' else 'N/A'
+  tu.design_impl.edit_designs(project.id, design_group.id, [tu.design_model.DesignPut(
+    id=design[0].id, name=design[0].name,
+    vd_design_values=[tu.design_model.ValueDriverDesignValue(vd_id=vd.id, value=1234)])])
+  formula = [f for f in tu.connect_impl.get_all_formulas(project.id, vcs.id, design_group.id)
+             if f.vcs_row_id == row.id][0]
+  payload = {
+    "sim_settings": settings.dict(),
+    "vcs_ids": [vcs.id],
+    "design_group_ids": [design_group.id]
+  }
+
+  #Act
+  tu.connect_impl.edit_formulas(project.id, row.id, design_group.id, tu.connect_model.FormulaPost(
+    time=formula.time, time_unit=formula.time_unit, cost=f'"VD({vd.name} [{unit}])"', revenue=formula.revenue,
+    rate=formula.rate))
+  res_vd = client.post(f'/api/cvs/project/{project.id}/simulation/run', headers=std_headers, json=payload)
+  tu.connect_impl.edit_formulas(project.id, row.id, design_group.id, tu.connect_model.FormulaPost(
+    time=formula.time, time_unit=formula.time_unit, cost='1234', revenue=formula.revenue, rate=formula.rate))
+  res_value = client.post(f'/api/cvs/project/{project.id}/simulation/run', headers=std_headers, json=payload)
+
+  #Assert
+  assert res_vd.status_code == 200
+  assert res_value.status_code == 200
+  assert res_vd.json() == res_value.json()
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+  tu.delete_vd_from_user(current_user.id)
+
+
+def test_run_simulation_value_driver_created_after_formula(client, std_headers, std_user):
+  #Setup
+  current_user = impl_users.impl_get_user_with_username(std_user.username)
+
+  project, vcs, design_group, design, settings = sim_tu.setup_single_simulation(current_user.id)
+  settings.monte_carlo = False
+  table = tu.vcs_impl.get_vcs_table(project.id, vcs.id)
+  row = table[0]
+  formula = [f for f in tu.connect_impl.get_all_formulas(project.id, vcs.id, design_group.id)
+             if f.vcs_row_id == row.id][0]
+  vd_post = tu.random_value_driver(unit='kg')
+  payload = {
+    "sim_settings": settings.dict(),
+    "vcs_ids": [vcs.id],
+    "design_group_ids": [design_group.id]
+  }
+
+  #Act
+  tu.connect_impl.edit_formulas(project.id, row.id, design_group.id, tu.connect_model.FormulaPost(
+    time=formula.time, time_unit=formula.time_unit, cost=f'"VD({vd_post.name} [kg])"', revenue=formula.revenue,
+    rate=formula.rate))
+  vd = tu.vcs_impl.create_value_driver(current_user.id, vd_post)
+  tu.vcs_impl.edit_vcs_table(project.id, vcs.id, [tu.vcs_model.VcsRowPost(
+    id=table_row.id, index=table_row.index, stakeholder=table_row.stakeholder,
+    stakeholder_expectations=table_row.stakeholder_expectations,
+    iso_process=table_row.iso_process.id if table_row.iso_process is not None else None,
+    subprocess=table_row.subprocess.id if table_row.subprocess is not None else None,
+    stakeholder_needs=[tu.vcs_model.StakeholderNeedPost(
+      id=need.id, need=need.need, value_dimension=need.value_dimension, rank_weight=need.rank_weight,
+      value_drivers=[driver.id for driver in need.value_drivers or []] + ([vd.id] if table_row.id == row.id else []))
+      for need in table_row.stakeholder_needs or []]) for table_row in table])
+  tu.design_impl.edit_designs(project.id, design_group.id, [tu.design_model.DesignPut(
+    id=design[0].id, name=design[0].name,
+    vd_design_values=[tu.design_model.ValueDriverDesignValue(vd_id=vd.id, value=1234)])])
+  res_vd = client.post(f'/api/cvs/project/{project.id}/simulation/run', headers=std_headers, json=payload)
+  tu.connect_impl.edit_formulas(project.id, row.id, design_group.id, tu.connect_model.FormulaPost(
+    time=formula.time, time_unit=formula.time_unit, cost='1234', revenue=formula.revenue, rate=formula.rate))
+  res_value = client.post(f'/api/cvs/project/{project.id}/simulation/run', headers=std_headers, json=payload)
+
+  #Assert
+  assert res_vd.status_code == 200
+  assert res_value.status_code == 200
+  assert res_vd.json() == res_value.json()
+
+  #Cleanup
+  tu.delete_design_group(project.id, design_group.id)
+  tu.delete_VCS_with_ids(project.id, [vcs.id])
+  tu.delete_project_by_id(project.id, current_user.id)
+  tu.delete_vd_from_user(current_user.id)
+
+
 def test_run_sim_invalid_designs(client, std_headers, std_user):
   #Setup
   amount = 2
@@ -685,3 +685,18 @@ def random_rate_choice():
 
 def random_non_technical_cost():
     return random.choice(list(NonTechCost)).value
+
+
+def count_loader_batches(monkeypatch, loader) -> List[List[int]]:
+    """
+    Records the sorted keys of every batch that the loader fetches from the database.
+    """
+    batches = []
+    batch_load = loader.batch_load
+
+    def counting_batch_load(db_connection, keys):
+        batches.append(sorted(keys))
+        return batch_load(db_connection, keys)
+
+    monkeypatch.setattr(loader, 'batch_load', counting_batch_load)
+    return batches
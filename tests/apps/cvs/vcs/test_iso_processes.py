@@ -0,0 +1,60 @@
+from sedbackend.apps.cvs.vcs import models
+from sedbackend.apps.cvs.vcs.catalog import ISOProcessCatalog
+
+
+def test_get_all_iso_processes(client, std_headers):
+    # Act
+    res = client.get('/api/cvs/vcs/iso-processes/all', headers=std_headers)
+    res_cached = client.get('/api/cvs/vcs/iso-processes/all',
+                            headers={**std_headers, 'If-None-Match': res.headers['ETag']})
+    # Assert
+    assert res.status_code == 200  # 200 OK
+    assert len(res.json()) == 25
+    assert 'max-age' in res.headers['Cache-Control']
+    assert res_cached.status_code == 304  # 304 Not Modified
+    assert res_cached.headers['ETag'] == res.headers['ETag']
+
+
+def test_iso_process_catalog_reload():
+    # Setup
+    table = [models.VCSISOProcess(id=1, name='Design', category='Technical processes')]
+    loads = []
+
+    def load(db_connection):
+        loads.append(db_connection)
+        return list(table)
+
+    catalog = ISOProcessCatalog(load, lambda db_connection: len(table), ttl=3600, refresh_interval=0)
+    # Act
+    first = catalog.get(None, 1)
+    _, etag = catalog.get_all_tagged(None)
+    missing = catalog.get(None, 2)
+    table.append(models.VCSISOProcess(id=2, name='Operation', category='Technical processes'))
+    added = catalog.get(None, 2)
+    iso_processes, added_etag = catalog.get_all_tagged(None)
+    # Assert
+    assert first.name == 'Design'
+    assert catalog.get_by_name(None, 'Design') == first
+    assert missing is None
+    assert added.name == 'Operation'
+    assert len(loads) == 2
+    assert [iso_process.id for iso_process in iso_processes] == [1, 2]
+    assert added_etag != etag
+
+
+def test_iso_process_catalog_unknown_id_rate_limited():
+    # Setup
+    table = [models.VCSISOProcess(id=1, name='Design', category='Technical processes')]
+    checksums = []
+
+    def checksum(db_connection):
+        checksums.append(db_connection)
+        return len(table)
+
+    catalog = ISOProcessCatalog(lambda db_connection: list(table), checksum, ttl=3600, refresh_interval=3600)
+    # Act
+    catalog.get(None, 1)
+    missing = [catalog.get(None, iso_process_id) for iso_process_id in range(2, 12)]
+    # Assert
+    assert missing == [None] * 10
+    assert len(checksums) == 1
@@ -1,6 +1,7 @@
 import tests.apps.cvs.testutils as tu
 import sedbackend.apps.core.users.implementation as impl_users
 import sedbackend.apps.cvs.vcs.implementation as impl_vcs
+import sedbackend.apps.cvs.vcs.storage as storage_vcs
 
 
 def test_get_all_value_drivers(client, std_headers, std_user):
@@ -266,3 +267,25 @@ def test_get_all_value_drivers_vcs_row(client, std_headers, std_user):
     # Cleanup
     tu.delete_project_by_id(project.id, current_user.id)
     tu.delete_vd_from_user(current_user.id)
+
+
+def test_get_all_value_drivers_vcs_row_batched(client, std_headers, std_user, monkeypatch):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    vcs = tu.seed_random_vcs(project.id)
+    vcs_row = tu.seed_vcs_table_rows(current_user.id, project.id, vcs.id, 1)[0]
+    value_drivers = sorted({vd.id for need in vcs_row.stakeholder_needs for vd in need.value_drivers})
+    vcs_batches = tu.count_loader_batches(monkeypatch, storage_vcs.vcs_loader)
+    value_driver_batches = tu.count_loader_batches(monkeypatch, storage_vcs.value_driver_loader)
+    # Act
+    res = client.get(f'/api/cvs/project/{project.id}/vcs/{vcs.id}/row/{vcs_row.id}/value-driver/all',
+                     headers=std_headers)
+    # Assert
+    assert res.status_code == 200  # 200 OK
+    assert sorted(vd["id"] for vd in res.json()) == value_drivers
+    assert vcs_batches == [[vcs.id]]
+    assert value_driver_batches == [value_drivers]  # One query for all value drivers of the row
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
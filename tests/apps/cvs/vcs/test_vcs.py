@@ -1,6 +1,8 @@
 import tests.apps.cvs.testutils as tu
 import sedbackend.apps.core.users.implementation as impl_users
 import sedbackend.apps.cvs.vcs.implementation as impl_vcs
+import sedbackend.apps.cvs.vcs.storage as storage_vcs
+import sedbackend.apps.cvs.project.storage as storage_project
 
 
 # ======================================================================================================================
@@ -69,6 +71,50 @@ def test_get_vcss(client, std_headers, std_user):
     tu.delete_vd_from_user(current_user.id)
 
 
+def test_get_vcss_keyset_pagination(client, std_headers, std_user):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    vcs_ids = sorted(tu.seed_random_vcs(project.id).id for _ in range(3))
+    # Act
+    res_first = client.get(f'/api/cvs/project/{project.id}/vcs/all', headers=std_headers, params={'limit': 2})
+    after_id = res_first.json()["chunk"][-1]["id"]
+    res_next = client.get(f'/api/cvs/project/{project.id}/vcs/all', headers=std_headers,
+                          params={'limit': 2, 'after_id': after_id})
+    res_past = client.get(f'/api/cvs/project/{project.id}/vcs/all', headers=std_headers,
+                          params={'after_id': vcs_ids[-1]})
+    # Assert
+    assert res_first.status_code == 200  # 200 OK
+    assert [vcs["id"] for vcs in res_first.json()["chunk"]] == vcs_ids[:2]
+    assert [vcs["id"] for vcs in res_next.json()["chunk"]] == vcs_ids[2:]
+    assert res_first.json()["length_total"] == 3
+    assert res_next.json()["length_total"] == 3
+    assert res_past.json() == {"chunk": [], "length_total": 3}
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
+
+
+def test_get_vcss_batched(client, std_headers, std_user, monkeypatch):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    for _ in range(3):
+        tu.seed_random_vcs(project.id)
+    project_batches = tu.count_loader_batches(monkeypatch, storage_project.project_loader)
+    vcs_batches = tu.count_loader_batches(monkeypatch, storage_vcs.vcs_loader)
+    # Act
+    res = client.get(f'/api/cvs/project/{project.id}/vcs/all', headers=std_headers)
+    # Assert
+    assert res.status_code == 200  # 200 OK
+    assert len(res.json()["chunk"]) == 3
+    assert project_batches == [[project.id]]  # The project is fetched once, not once per VCS
+    assert vcs_batches == []
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
+
+
 # ======================================================================================================================
 # Create VCS
 # ======================================================================================================================
@@ -208,3 +254,28 @@ def test_duplicate_vcs(client, std_headers, std_user):
     # Cleanup
     tu.delete_project_by_id(project.id, current_user.id)
     tu.delete_vd_from_user(current_user.id)
+
+
+def row_content(row):
+    return row.index, row.stakeholder, [(need.need, [vd.id for vd in need.value_drivers])
+                                        for need in row.stakeholder_needs]
+
+
+def test_duplicate_vcs_table(client, std_headers, std_user):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    vcs = tu.seed_random_vcs(project.id)
+    table = tu.seed_vcs_table_rows(current_user.id, project.id, vcs.id, 4)
+    # Act
+    res = client.post(f'/api/cvs/project/{project.id}/vcs/{vcs.id}/duplicate/{2}', headers=std_headers)
+    # Assert
+    assert res.status_code == 200  # 200 OK
+    assert [copy['name'] for copy in res.json()] == [f'{vcs.name} (1)', f'{vcs.name} (2)']
+    for copy in res.json():
+        copy_table = impl_vcs.get_vcs_table(project.id, copy['id'])
+        assert sorted(map(row_content, copy_table)) == sorted(map(row_content, table))
+        assert not any(row.id in [r.id for r in table] for row in copy_table)
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
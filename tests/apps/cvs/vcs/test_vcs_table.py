@@ -24,6 +24,37 @@ def test_get_vcs_table(client, std_headers, std_user):
     tu.delete_vd_from_user(current_user.id)
 
 
+def test_get_vcs_table_processes_and_needs(client, std_headers, std_user):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    vcs = tu.seed_random_vcs(project.id)
+    subprocess = tu.random_subprocess(project.id, vcs.id)
+    rows = [tu.random_table_row(current_user.id, project.id, vcs.id, index=0),
+            tu.random_table_row(current_user.id, project.id, vcs.id, index=1)]
+    rows[0].iso_process, rows[0].subprocess = 1, None
+    rows[1].iso_process, rows[1].subprocess = None, subprocess.id
+    rows[1].stakeholder_needs = rows[1].stakeholder_needs[:2]
+    tu.create_vcs_table(project.id, vcs.id, rows)
+    # Act
+    res = client.get(f'/api/cvs/project/{project.id}/vcs/{vcs.id}/table', headers=std_headers)
+    # Assert
+    assert res.status_code == 200  # 200 OK
+    table = res.json()
+    assert table[0]['iso_process']['id'] == 1
+    assert table[0]['subprocess'] is None
+    assert table[1]['iso_process'] is None
+    assert table[1]['subprocess']['id'] == subprocess.id
+    assert table[1]['subprocess']['parent_process']['id'] == subprocess.parent_process.id
+    for row, row_post in zip(table, rows):
+        assert [need['need'] for need in row['stakeholder_needs']] == [need.need for need in row_post.stakeholder_needs]
+        assert [[vd['id'] for vd in need['value_drivers']] for need in row['stakeholder_needs']] == \
+               [need.value_drivers for need in row_post.stakeholder_needs]
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
+
+
 def test_get_vcs_table_not_found(client, std_headers, std_user):
     # Setup
     current_user = impl_users.impl_get_user_with_username(std_user.username)
@@ -110,6 +141,61 @@ def test_edit_vcs_table(client, std_headers, std_user):
     tu.delete_vd_from_user(current_user.id)
 
 
+def test_edit_vcs_table_changes(client, std_headers, std_user):
+    # Setup
+    current_user = impl_users.impl_get_user_with_username(std_user.username)
+    project = tu.seed_random_project(current_user.id)
+    vcs = tu.seed_random_vcs(project.id)
+    value_driver = tu.seed_random_value_driver(current_user.id)
+    table = tu.seed_vcs_table_rows(current_user.id, project.id, vcs.id, 3)
+    kept_need = table[0].stakeholder_needs[-1]
+
+    def row_json(row, **kwargs):
+        return {
+            "id": row.id,
+            "index": row.index,
+            "iso_process": row.iso_process.id if row.iso_process is not None else None,
+            "subprocess": row.subprocess.id if row.subprocess is not None else None,
+            "stakeholder": row.stakeholder,
+            "stakeholder_expectations": row.stakeholder_expectations,
+            **kwargs
+        }
+
+    # Act
+    res = client.put(f'/api/cvs/project/{project.id}/vcs/{vcs.id}/table', headers=std_headers,
+                     json=[
+                         row_json(table[0], stakeholder_needs=[
+                             {
+                                 "id": kept_need.id,
+                                 "need": kept_need.need,
+                                 "rank_weight": kept_need.rank_weight,
+                                 "value_dimension": kept_need.value_dimension,
+                                 "value_drivers": [value_driver.id]
+                             }
+                         ]),
+                         row_json(table[2], stakeholder="new stakeholder"),
+                         {
+                             "index": 3,
+                             "iso_process": random.randint(1, 25),
+                             "stakeholder": core_tu.random_str(5, 50),
+                             "stakeholder_expectations": core_tu.random_str(5, 50)
+                         }
+                     ]
+                     )
+    # Assert
+    new_table = {row.id: row for row in impl_vcs.get_vcs_table(project.id, vcs.id)}
+    assert res.status_code == 200  # 200 OK
+    assert len(new_table) == 3
+    assert table[1].id not in new_table
+    assert [need.id for need in new_table[table[0].id].stakeholder_needs] == [kept_need.id]
+    assert [vd.id for vd in new_table[table[0].id].stakeholder_needs[0].value_drivers] == [value_driver.id]
+    assert new_table[table[2].id].stakeholder == 'new stakeholder'
+    assert new_table[table[2].id].stakeholder_needs == []
+    # Cleanup
+    tu.delete_project_by_id(project.id, current_user.id)
+    tu.delete_vd_from_user(current_user.id)
+
+
 def test_delete_vcs_table(client, std_headers, std_user):
     # Setup
     current_user = impl_users.impl_get_user_with_username(std_user.username)
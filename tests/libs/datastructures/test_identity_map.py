@@ -0,0 +1,67 @@
+from sedbackend.libs.datastructures.identity_map import Loader
+
+
+class Connection:
+    pass
+
+
+def test_loader_batches_and_maps_per_connection():
+    # Setup
+    batches = []
+
+    def batch_load(db_connection, keys):
+        batches.append(keys)
+        return {key: f'entity {key}' for key in keys if key > 0}
+
+    loader = Loader(batch_load)
+    con = Connection()
+    # Act
+    first = loader.load_many(con, [1, 2, 2, -1])
+    second = loader.load(con, 2)
+    loader.clear(con, 1)
+    third = loader.load_many(con, [1, 2, 3])
+    other = loader.load(Connection(), 2)
+    # Assert
+    assert first == {1: 'entity 1', 2: 'entity 2'}
+    assert second == 'entity 2'
+    assert third == {1: 'entity 1', 2: 'entity 2', 3: 'entity 3'}
+    assert other == 'entity 2'
+    assert batches == [[1, 2, -1], [1, 3], [2]]
+
+
+def test_loader_prime_and_clear_all():
+    # Setup
+    batches = []
+
+    def batch_load(db_connection, keys):
+        batches.append(keys)
+        return {key: f'entity {key}' for key in keys}
+
+    loader = Loader(batch_load)
+    con = Connection()
+    # Act
+    loader.prime(con, 1, 'primed 1')
+    primed = loader.load(con, 1)
+    loader.clear(con)
+    cleared = loader.load(con, 1)
+    # Assert
+    assert primed == 'primed 1'
+    assert cleared == 'entity 1'
+    assert batches == [[1]]
+
+
+def test_loader_without_map():
+    # Setup
+    batches = []
+
+    def batch_load(db_connection, keys):
+        batches.append(keys)
+        return {key: f'entity {key}' for key in keys}
+
+    loader = Loader(batch_load)
+    # Act
+    first = loader.load(None, 1)
+    second = loader.load(None, 1)
+    # Assert
+    assert first == second == 'entity 1'
+    assert batches == [[1], [1]]